@@ -34,6 +34,7 @@ __all__ = [
     "hg_dataset_feature",
     "check_fields_consistency",
     "guess_hg_features",
+    "decode_arrow_column",
 ]
 
 
@@ -47,6 +48,20 @@ class FeatureDecodeMixin(metaclass=ABCMeta):
             "Subclasses must implement decode_example method."
         )
 
+    def decode_batch(
+        self, values: pa.Array | pa.ChunkedArray, **kwargs
+    ) -> list[Any]:
+        """Decode a whole arrow column of stored values.
+
+        The default implementation converts the column to python objects
+        and calls :meth:`decode_example` for each non-null value. Subclasses
+        can override this method to decode the column at once.
+        """
+        return [
+            self.decode_example(v, **kwargs) if v is not None else None
+            for v in values.to_pylist()
+        ]
+
 
 class TypedDictFeatureDecode(FeatureDecodeMixin):
     """Helper class for decoding typed dictionary features.
@@ -76,6 +91,48 @@ class TypedDictFeatureDecode(FeatureDecodeMixin):
         )
         return self._decode_type(**ret)
 
+    def decode_batch(
+        self, values: pa.Array | pa.ChunkedArray, **kwargs
+    ) -> list[Any]:
+        """Decode a whole arrow column of stored dictionaries.
+
+        Each field of the dictionary is decoded as a whole column with
+        :func:`decode_arrow_column`, so that fields which support batch
+        decoding avoid the conversion to python objects.
+        """
+        if (
+            type(self).decode_example
+            is not TypedDictFeatureDecode.decode_example
+        ):
+            # keep the customized decoding of subclasses.
+            return super().decode_batch(values, **kwargs)
+        if not self.decode:
+            raise RuntimeError(
+                "This feature does not support decoding. "
+                "Set decode=True to enable decoding."
+            )
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        if values.null_count == len(values):
+            return [None] * len(values)
+        assert isinstance(values, pa.StructArray)
+        children = values.flatten()
+        columns = {
+            k: decode_arrow_column(
+                sub_feature,
+                children[values.type.get_field_index(k)],
+                **kwargs,
+            )
+            for k, sub_feature in self._dict.items()
+        }
+        is_valid = values.is_valid().to_pylist()
+        return [
+            self._decode_type(**{k: v[i] for k, v in columns.items()})
+            if valid
+            else None
+            for i, valid in enumerate(is_valid)
+        ]
+
 
 @dataclass
 class RODataFeature(metaclass=ABCMeta):
@@ -244,3 +301,35 @@ def guess_hg_features(
         "Hugging Face dataset features."
     )
     return hg_datasets.Features(**(feature_dict))
+
+
+def decode_arrow_column(
+    feature: Any, values: pa.Array | pa.ChunkedArray, **kwargs
+) -> list[Any]:
+    """Decode a whole arrow column with the given dataset feature.
+
+    Features that implement :class:`FeatureDecodeMixin` decode the column
+    with :meth:`FeatureDecodeMixin.decode_batch`. Other features are decoded
+    the same way as Hugging Face datasets decodes a batch.
+
+    Args:
+        feature (Any): The Hugging Face dataset feature of the column.
+        values (pa.Array | pa.ChunkedArray): The arrow column to decode.
+        **kwargs: Extra arguments passed to
+            :meth:`FeatureDecodeMixin.decode_batch`, e.g., `zero_copy` of
+            :class:`~robo_orchard_lab.dataset.datatypes.hg_features.tensor.TypedTensorFeature`.
+
+    Returns:
+        list[Any]: The decoded values.
+    """
+    if isinstance(feature, FeatureDecodeMixin) and getattr(
+        feature, "decode", True
+    ):
+        return feature.decode_batch(values, **kwargs)
+    ret = values.to_pylist()
+    if hg_datasets.features.features.require_decoding(feature):
+        ret = [
+            hg_datasets.features.features.decode_nested_example(feature, v)
+            for v in ret
+        ]
+    return ret
@@ -128,9 +128,16 @@ class TypedTensorFeature(RODictDataFeature, FeatureDecodeMixin):
 
     def decode_example(
         self,
-        value: TensorFeatureSerialized | None,
+        value: TensorFeatureSerialized | pa.StructScalar | None,
         **kwargs,
     ) -> np.ndarray | torch.Tensor | None:
+        """Decode a stored tensor.
+
+        `value` can be the python dict converted from arrow, whose data
+        can be a list or a numpy array, or a row of the arrow column as
+        a struct scalar, which is decoded without converting the data to
+        python objects.
+        """
         if not self.decode:
             raise RuntimeError(
                 "Decoding is disabled for this feature. Please use "
@@ -138,8 +145,93 @@ class TypedTensorFeature(RODictDataFeature, FeatureDecodeMixin):
             )
         if value is None:
             return None
-        decoded_tensor: np.ndarray = np.array(value["data"], dtype=self.dtype)
-        decoded_tensor = decoded_tensor.reshape(value["shape"])
+        if isinstance(value, pa.StructScalar):
+            # A row of the arrow column. Map the list values buffer
+            # directly instead of converting it to python objects.
+            if not value.is_valid:
+                return None
+            data = value["data"].values.to_numpy(zero_copy_only=False)
+            shape = value["shape"].as_py()
+        else:
+            data, shape = value["data"], value["shape"]
+        decoded_tensor: np.ndarray = np.asarray(data, dtype=self.dtype)
+        decoded_tensor = decoded_tensor.reshape(shape)
+        if not decoded_tensor.flags.writeable:
+            decoded_tensor = decoded_tensor.copy()
         if self.as_torch_tensor:
             return torch.from_numpy(decoded_tensor)
         return decoded_tensor
+
+    def decode_batch(
+        self,
+        values: pa.Array | pa.ChunkedArray,
+        zero_copy: bool = False,
+        **kwargs,
+    ) -> list[np.ndarray | torch.Tensor | None]:
+        """Decode a whole arrow column of stored tensors.
+
+        The flattened tensor data of all rows is mapped from the arrow
+        list values buffer into one numpy array without converting to
+        python objects, and each row is a reshaped view of it. If the
+        mapped data is read-only, it is copied once for the whole column,
+        so that the returned tensors are writable, the same as
+        :meth:`decode_example`.
+
+        Args:
+            values (pa.Array | pa.ChunkedArray): The arrow column.
+            zero_copy (bool, optional): If True and :attr:`as_torch_tensor`
+                is False, the returned arrays can be read-only views of the
+                arrow buffer instead. Default: False.
+        """
+        if not self.decode:
+            raise RuntimeError(
+                "Decoding is disabled for this feature. Please use "
+                "TensorFeature(decode=True) instead."
+            )
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        if values.null_count == len(values):
+            return [None] * len(values)
+        assert isinstance(values, pa.StructArray)
+        children = values.flatten()
+        data = children[values.type.get_field_index("data")]
+        shape = children[values.type.get_field_index("shape")]
+
+        flat_data, data_offsets = _list_array_to_numpy(data)
+        flat_data = flat_data.astype(self.dtype, copy=False)
+        if not flat_data.flags.writeable and (
+            self.as_torch_tensor or not zero_copy
+        ):
+            flat_data = flat_data.copy()
+        flat_shape, shape_offsets = _list_array_to_numpy(shape)
+        flat_shape = flat_shape.tolist()
+        data_offsets = data_offsets.tolist()
+        shape_offsets = shape_offsets.tolist()
+
+        ret: list[np.ndarray | torch.Tensor | None] = []
+        is_valid = values.is_valid().to_pylist()
+        for i, valid in enumerate(is_valid):
+            if not valid:
+                ret.append(None)
+                continue
+            decoded_tensor = flat_data[
+                data_offsets[i] : data_offsets[i + 1]
+            ].reshape(flat_shape[shape_offsets[i] : shape_offsets[i + 1]])
+            if self.as_torch_tensor:
+                decoded_tensor = torch.from_numpy(decoded_tensor)
+            ret.append(decoded_tensor)
+        return ret
+
+
+def _list_array_to_numpy(
+    values: pa.ListArray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Map a list array to its flattened values and offsets.
+
+    The flattened values are zero-copy if possible. The returned offsets
+    start from 0 and index into the flattened values.
+    """
+    offsets = values.offsets.to_numpy()
+    begin = offsets[0]
+    flat_values = values.values.slice(begin, offsets[-1] - begin)
+    return flat_values.to_numpy(zero_copy_only=False), offsets - begin
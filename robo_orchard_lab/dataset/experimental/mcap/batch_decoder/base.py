@@ -87,6 +87,26 @@ class McapBatchDecoder(
         """
         raise NotImplementedError()
 
+    def format_serialized_batch(
+        self, src: McapMessageBatch, msg_decoder_ctx: McapDecoderContext
+    ) -> DST_T | None:
+        """Format the batch from the serialized messages directly.
+
+        Decoders can override this method to convert the serialized
+        messages without decoding each of them, which is faster for large
+        batches. If None is returned, all required messages are decoded
+        and formatted by :meth:`format_batch`.
+
+        Args:
+            src (McapMessageBatch): The source batch of messages to format.
+            msg_decoder_ctx (McapDecoderContext): The decoder context for
+                decoding messages if needed.
+
+        Returns:
+            DST_T | None: The formatted batch, or None if not supported.
+        """
+        return None
+
     def __call__(
         self, src: McapMessageBatch, msg_decoder_ctx: McapDecoderContext
     ) -> DST_T:
@@ -97,6 +117,9 @@ class McapBatchDecoder(
             msg_decoder_ctx (McapDecoderContext): The decoder context for
                 decoding each message.
         """
+        ret = self.format_serialized_batch(src, msg_decoder_ctx)
+        if ret is not None:
+            return ret
         cached_decoded_msgs = {}
         for required_topic in self.require_topics():
             if (
@@ -159,6 +182,41 @@ class McapBatchDecoders(McapBatchDecoder[dict[str, Any]]):
             required_topics.update(decoder.require_topics())
         return required_topics
 
+    def __call__(
+        self, src: McapMessageBatch, msg_decoder_ctx: McapDecoderContext
+    ) -> dict[str, Any]:
+        """Decode the batch of messages with all decoders.
+
+        Decoders that support :meth:`format_serialized_batch` format the
+        serialized messages directly, and the messages required by the
+        other decoders are decoded once and shared by them.
+
+        Args:
+            src (McapMessageBatch): The source batch of messages to decode.
+            msg_decoder_ctx (McapDecoderContext): The decoder context for
+                decoding each message.
+        """
+        formatted = {}
+        for name, decoder in self.decoders.items():
+            ret = decoder.format_serialized_batch(src, msg_decoder_ctx)
+            if ret is not None:
+                formatted[name] = ret
+
+        cached_decoded_msgs = {}
+        for name, decoder in self.decoders.items():
+            if name in formatted:
+                continue
+            for required_topic in decoder.require_topics():
+                if (
+                    required_topic not in cached_decoded_msgs
+                    and required_topic in src.message_dict
+                ):
+                    cached_decoded_msgs[required_topic] = src.message_dict[
+                        required_topic
+                    ].decode(msg_decoder_ctx)
+            formatted[name] = decoder.format_batch(cached_decoded_msgs)
+        return {name: formatted[name] for name in self.decoders}
+
     def format_batch(self, decoded_msgs: dict[str, list]) -> dict[str, Any]:
         """Format the batch of decoded messages to target format.
 
@@ -20,11 +20,17 @@ from robo_orchard_lab.dataset.experimental.mcap.batch_decoder.base import (
     McapBatchDecoder,
     McapBatchDecoderConfig,
 )
+from robo_orchard_lab.dataset.experimental.mcap.data_record import (
+    McapMessageBatch,
+)
 from robo_orchard_lab.dataset.experimental.mcap.msg_converter import (  # noqa: E501
     BatchFrameTransform,
     TensorTargetConfigMixin,
     ToBatchFrameTransformConfig,
 )
+from robo_orchard_lab.dataset.experimental.mcap.msg_decoder import (
+    McapDecoderContext,
+)
 
 __all__ = [
     "McapBatch2BatchFrameTransform",
@@ -49,6 +55,26 @@ class McapBatch2BatchFrameTransform(McapBatchDecoder[BatchFrameTransform]):
     ) -> BatchFrameTransform:
         return self._msg_cvt.convert(decoded_msgs[self._cfg.source_topic])
 
+    def format_serialized_batch(
+        self, src: McapMessageBatch, msg_decoder_ctx: McapDecoderContext
+    ) -> BatchFrameTransform | None:
+        if (
+            not self._cfg.decode_serialized
+            or self._cfg.source_topic not in src
+        ):
+            return None
+        msgs = src[self._cfg.source_topic]
+        if msgs.channel.message_encoding != "protobuf":
+            return None
+        first = msg_decoder_ctx.decode_message(
+            message_encoding=msgs.channel.message_encoding,
+            message=msgs.messages[0],
+            schema=msgs.schema,
+        )
+        return self._msg_cvt.convert_serialized(
+            [msg.data for msg in msgs.messages], first
+        )
+
 
 class McapBatch2BatchFrameTransformConfig(
     McapBatchDecoderConfig[McapBatch2BatchFrameTransform],
@@ -60,3 +86,12 @@ class McapBatch2BatchFrameTransformConfig(
 
     source_topic: str
     """The source topic to use from batch messages."""
+
+    decode_serialized: bool = True
+    """Whether to convert the serialized protobuf messages directly.
+
+    The fixed-width fields of all messages are decoded into arrays at once
+    if the messages share the same layout, instead of decoding each message.
+    Set to False if the messages are converted by the message decoder
+    context, which is bypassed except for the first message.
+    """
@@ -314,7 +314,12 @@ class McapDataRecordChunk:
         )
 
     def read(self, mcap_reader: McapReader) -> McapMessageBatch:
-        """Read the data record from the mcap reader."""
+        """Read the data record from the mcap reader.
+
+        For random access into long recordings, enable the message index
+        of the reader with :meth:`McapReader.enable_message_index`, so
+        that only the chunks containing the messages are read.
+        """
         ret = McapMessageBatch({}, is_last_batch=True)
         for msg in mcap_reader.iter_messages(
             MakeIterMsgArgs(
@@ -342,7 +347,10 @@ class McapDataRecordChunks:
     """List of data record chunks to read messages from."""
 
     def read(self, mcap_reader: McapReader) -> McapMessageBatch:
-        """Read the data chunk record from the mcap reader."""
+        """Read the data chunk record from the mcap reader.
+
+        See :meth:`McapDataRecordChunk.read` for random access.
+        """
         ret = McapMessageBatch({}, is_last_batch=True)
         for record in self.chunks:
             batch = record.read(mcap_reader)
@@ -0,0 +1,347 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Map-style dataset reading frames directly from MCAP files."""
+
+from __future__ import annotations
+import copy
+import glob
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Any, Sequence
+
+import fsspec
+from torch.utils.data import Dataset as TorchDataset
+
+from robo_orchard_lab.dataset.experimental.mcap.batch_decoder.base import (
+    McapBatchDecoder,
+    McapBatchDecoderConfig,
+)
+from robo_orchard_lab.dataset.experimental.mcap.batch_split import (
+    BatchSplitMixin,
+    iter_messages_batch,
+)
+from robo_orchard_lab.dataset.experimental.mcap.data_record import (
+    McapDataRecordChunk,
+    McapDataRecordChunks,
+    McapMessageBatch,
+)
+from robo_orchard_lab.dataset.experimental.mcap.msg_decoder import (
+    McapDecoderContext,
+)
+from robo_orchard_lab.dataset.experimental.mcap.reader import (
+    MakeIterMsgArgs,
+    McapReader,
+)
+
+__all__ = ["McapDataset"]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _McapFile:
+    """An opened MCAP file shared by the threads of a dataset."""
+
+    file: IO[bytes]
+    reader: McapReader
+    decoder_ctx: McapDecoderContext
+    lock: threading.Lock
+    closed: bool = False
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            self.file.close()
+
+
+class McapDataset(TorchDataset):
+    """Map-style dataset over MCAP files.
+
+    Each frame of the dataset is a batch of messages split by
+    `batch_split`, e.g., :class:`SplitBatchByTopics`, exactly as
+    :func:`iter_messages_batch` splits the messages of each file. The
+    frames are found by one pass over all files without decoding, and
+    each frame is indexed by its file and the time ranges of its topics,
+    so that it can be read again by random access with
+    :class:`McapDataRecordChunks`.
+
+    The message index of :meth:`McapReader.enable_message_index` is used
+    for reading, so only the chunks of a frame are decompressed. Upcoming
+    frames can be read and decoded in background threads with `prefetch`,
+    which assumes sequential access, e.g., with a sequential sampler or
+    the contiguous indices of a batch.
+
+    Note:
+        Message decoders are shared by the frames of a file and may run
+        in multiple threads, so they must be stateless.
+
+    Args:
+        paths (str | Sequence[str]): MCAP files, or directories searched
+            recursively for `*.mcap` files.
+        batch_split (BatchSplitMixin): The batch splitting logic to define
+            frames. It is copied for each file.
+        batch_decoder (McapBatchDecoder | McapBatchDecoderConfig | None,
+            optional): The decoder of each frame. If None, frames are
+            returned as :class:`McapMessageBatch`. Default: None.
+        topics (Sequence[str] | None, optional): The topics to read. If
+            None, all topics are read. Default: None.
+        do_not_split_same_log_time (bool, optional): See
+            :func:`iter_messages_batch`. Default: True.
+        keep_last_topic_msgs (bool, optional): If True, topics missing in
+            a frame are filled with their last message before the frame,
+            e.g., static camera calibration. Default: True.
+        message_index_dir (str | None, optional): The directory to save
+            the message indexes of files as sidecar files. If None, the
+            indexes are built in memory each time a file is opened.
+            Default: None.
+        chunk_cache_size (int, optional): The maximum number of decompressed
+            chunks cached for each opened file. Default: 8.
+        max_open_files (int, optional): The maximum number of files kept
+            open. Default: 16.
+        prefetch (int, optional): The number of upcoming frames to read in
+            background. 0 to disable prefetch. Default: 0.
+        num_prefetch_threads (int, optional): The number of background
+            threads for prefetch. Default: 1.
+    """
+
+    def __init__(
+        self,
+        paths: str | Sequence[str],
+        batch_split: BatchSplitMixin,
+        batch_decoder: McapBatchDecoder | McapBatchDecoderConfig | None = None,
+        topics: Sequence[str] | None = None,
+        do_not_split_same_log_time: bool = True,
+        keep_last_topic_msgs: bool = True,
+        message_index_dir: str | None = None,
+        chunk_cache_size: int = 8,
+        max_open_files: int = 16,
+        prefetch: int = 0,
+        num_prefetch_threads: int = 1,
+    ):
+        if isinstance(paths, str):
+            paths = [paths]
+        if isinstance(batch_decoder, McapBatchDecoderConfig):
+            batch_decoder = batch_decoder()
+        self.paths = self._find_mcap_files(paths)
+        self.batch_split = batch_split
+        self.batch_decoder = batch_decoder
+        self.topics = topics
+        self.do_not_split_same_log_time = do_not_split_same_log_time
+        self.keep_last_topic_msgs = keep_last_topic_msgs
+        self.message_index_dir = message_index_dir
+        self.chunk_cache_size = chunk_cache_size
+        self.max_open_files = max_open_files
+        self.prefetch = prefetch
+        self.num_prefetch_threads = num_prefetch_threads
+
+        self.frame_index: list[tuple[int, McapDataRecordChunks]] = []
+        for file_index, path in enumerate(self.paths):
+            self.frame_index.extend(
+                (file_index, record) for record in self._index_file(path)
+            )
+        logger.info(
+            f"Found {len(self.frame_index)} frames in "
+            f"{len(self.paths)} MCAP files."
+        )
+        self._reset_runtime()
+
+    @staticmethod
+    def _find_mcap_files(paths: Sequence[str]) -> list[str]:
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    sorted(
+                        glob.glob(
+                            os.path.join(path, "**", "*.mcap"), recursive=True
+                        )
+                    )
+                )
+            else:
+                files.append(path)
+        if len(files) == 0:
+            raise ValueError(f"No MCAP files found in {paths}.")
+        return files
+
+    def _index_file(self, path: str) -> list[McapDataRecordChunks]:
+        """Find the frames of a file with one pass without decoding."""
+        batch_split = copy.deepcopy(self.batch_split)
+        batch_split.reset()
+        records = []
+        with fsspec.open(path, "rb") as f:
+            reader = McapReader.make_reader(f)  # type: ignore
+            for batch in iter_messages_batch(
+                reader,
+                batch_split=batch_split,
+                iter_config=MakeIterMsgArgs(topics=self.topics),
+                do_not_split_same_log_time=self.do_not_split_same_log_time,
+                keep_last_topic_msgs=self.keep_last_topic_msgs,
+            ):
+                if len(batch) == 0:
+                    continue
+                record = McapDataRecordChunks.from_message_batch(batch)
+                if self.keep_last_topic_msgs and batch.last_messages:
+                    for topic, msg in batch.last_messages.items():
+                        if topic in batch:
+                            continue
+                        log_time = msg.message.log_time
+                        record.chunks.append(
+                            McapDataRecordChunk(
+                                topics=[topic],
+                                log_time_start=log_time,
+                                log_time_end=log_time + 1,
+                            )
+                        )
+                records.append(record)
+        return records
+
+    def _reset_runtime(self) -> None:
+        """Reset the states that are not shared across processes."""
+        self._pid = os.getpid()
+        self._files: OrderedDict[int, _McapFile] = OrderedDict()
+        self._files_lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._prefetched: dict[int, Future] = {}
+
+    def _check_process(self) -> None:
+        """Reset the runtime states inherited by a forked process.
+
+        DataLoader workers are forked without pickling the dataset. The
+        threads of the prefetch executor do not exist in the child, and
+        the opened files share their offsets with the parent, so they are
+        dropped without closing.
+        """
+        if self._pid != os.getpid():
+            self._reset_runtime()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in (
+            "_pid",
+            "_files",
+            "_files_lock",
+            "_executor",
+            "_prefetched",
+        ):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_runtime()
+
+    def __len__(self) -> int:
+        return len(self.frame_index)
+
+    def _index_path(self, path: str) -> str | None:
+        if self.message_index_dir is None:
+            return None
+        os.makedirs(self.message_index_dir, exist_ok=True)
+        key = hashlib.md5(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.message_index_dir, f"{key}.idx.npz")
+
+    def _get_file(self, file_index: int) -> _McapFile:
+        self._check_process()
+        with self._files_lock:
+            mcap_file = self._files.get(file_index)
+            if mcap_file is not None:
+                self._files.move_to_end(file_index)
+                return mcap_file
+            path = self.paths[file_index]
+            f = fsspec.open(path, "rb").open()
+            reader = McapReader.make_reader(f)
+            reader.enable_message_index(
+                index_path=self._index_path(path),
+                chunk_cache_size=self.chunk_cache_size,
+            )
+            mcap_file = _McapFile(
+                file=f,
+                reader=reader,
+                decoder_ctx=McapDecoderContext(),
+                lock=threading.Lock(),
+            )
+            self._files[file_index] = mcap_file
+            while len(self._files) > self.max_open_files:
+                _, evicted = self._files.popitem(last=False)
+                evicted.close()
+            return mcap_file
+
+    def read_frame(self, index: int) -> McapMessageBatch:
+        """Read the messages of the frame without decoding."""
+        file_index, record = self.frame_index[index]
+        while True:
+            mcap_file = self._get_file(file_index)
+            with mcap_file.lock:
+                # the file may be closed by eviction in another thread.
+                if not mcap_file.closed:
+                    return record.read(mcap_file.reader)
+
+    def _load_frame(self, index: int) -> Any:
+        batch = self.read_frame(index)
+        if self.batch_decoder is None:
+            return batch
+        file_index = self.frame_index[index][0]
+        return self.batch_decoder(
+            batch, msg_decoder_ctx=self._get_file(file_index).decoder_ctx
+        )
+
+    def _schedule_prefetch(self, index: int) -> None:
+        upcoming = range(index + 1, min(index + 1 + self.prefetch, len(self)))
+        for i in list(self._prefetched.keys()):
+            if i not in upcoming:
+                self._prefetched.pop(i).cancel()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.num_prefetch_threads,
+                thread_name_prefix="McapDatasetPrefetch",
+            )
+        for i in upcoming:
+            if i not in self._prefetched:
+                self._prefetched[i] = self._executor.submit(
+                    self._load_frame, i
+                )
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Index {index} out of range.")
+        self._check_process()
+        if self.prefetch <= 0:
+            return self._load_frame(index)
+        future = self._prefetched.pop(index, None)
+        self._schedule_prefetch(index)
+        if future is not None:
+            return future.result()
+        return self._load_frame(index)
+
+    def close(self) -> None:
+        """Stop prefetching and close all opened files."""
+        self._check_process()
+        if self._executor is not None:
+            for future in self._prefetched.values():
+                future.cancel()
+            self._executor.shutdown(wait=True)
+        with self._files_lock:
+            for mcap_file in self._files.values():
+                mcap_file.close()
+        self._reset_runtime()
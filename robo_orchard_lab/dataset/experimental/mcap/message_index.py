@@ -0,0 +1,369 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Message index and chunk cache for random access to MCAP files.
+
+The chunk indexes in the summary of an MCAP file only locate chunks by
+time range, so every query in :meth:`mcap.reader.SeekingReader.iter_messages`
+reads and decompresses all chunks overlapping the range and then scans
+them. :class:`McapMessageIndex` maps every message, by channel and log
+time, to its chunk and to the offset of its record in the decompressed
+chunk. With a :class:`McapChunkCache` of decompressed chunks, reading a
+time range only decompresses the chunks containing matching messages,
+and only once while they stay in the cache.
+"""
+
+from __future__ import annotations
+import io
+import logging
+import os
+import struct
+from collections import OrderedDict
+from typing import IO, Iterable
+
+import numpy as np
+
+from mcap.data_stream import ReadDataStream
+from mcap.exceptions import McapError, UnsupportedCompressionError
+from mcap.opcode import Opcode
+from mcap.records import Chunk, Message
+from mcap.summary import Summary
+
+__all__ = ["MESSAGE_INDEX_DTYPE", "McapMessageIndex", "McapChunkCache"]
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_INDEX_DTYPE = np.dtype(
+    [
+        ("channel_id", "<u2"),
+        ("log_time", "<u8"),
+        ("chunk", "<u4"),
+        ("offset", "<u8"),
+    ]
+)
+"""Entry of :class:`McapMessageIndex`.
+
+`chunk` is the position of the chunk in file order, and `offset` is the
+offset of the message record in the decompressed chunk.
+"""
+
+_RECORD_HEADER = struct.Struct("<BQ")
+_MESSAGE_HEADER = struct.Struct("<BQHIQQ")
+
+
+def _chunk_start_offsets(summary: Summary | None) -> np.ndarray:
+    if summary is None or len(summary.chunk_indexes) == 0:
+        raise McapError(
+            "Message index requires an MCAP file with chunk indexes "
+            "in the summary."
+        )
+    return np.sort(
+        np.array(
+            [ci.chunk_start_offset for ci in summary.chunk_indexes],
+            dtype=np.uint64,
+        )
+    )
+
+
+def _read_chunk(
+    stream: IO[bytes], chunk_start_offset: int, validate_crc: bool = False
+) -> bytes:
+    """Read and decompress the records of the chunk at the offset."""
+    # skip the opcode and the record length.
+    stream.seek(chunk_start_offset + 1 + 8, io.SEEK_SET)
+    chunk = Chunk.read(ReadDataStream(stream))
+    if chunk.compression == "zstd":
+        import zstandard
+
+        data = zstandard.decompress(chunk.data, chunk.uncompressed_size)
+    elif chunk.compression == "lz4":
+        import lz4.frame
+
+        data = lz4.frame.decompress(chunk.data)
+    elif chunk.compression == "":
+        data = chunk.data
+    else:
+        raise UnsupportedCompressionError(chunk.compression)
+    if validate_crc and chunk.uncompressed_crc != 0:
+        import zlib
+
+        if zlib.crc32(data) != chunk.uncompressed_crc:
+            raise McapError(
+                f"CRC mismatch of the chunk at offset {chunk_start_offset}."
+            )
+    return data
+
+
+class McapMessageIndex:
+    """Index of all messages in a chunked MCAP file.
+
+    The entries are sorted by channel, log time and position in the file,
+    so that the messages of a channel in a time range are one contiguous
+    slice found by binary search.
+
+    The index can be saved as a sidecar file next to the MCAP file and
+    loaded again with :meth:`load_or_build`, which rebuilds it if it does
+    not match the file.
+
+    Args:
+        entries (np.ndarray): The sorted entries with
+            :data:`MESSAGE_INDEX_DTYPE`.
+        chunk_start_offsets (np.ndarray): The start offsets of all chunks
+            in file order.
+    """
+
+    VERSION = 1
+
+    def __init__(self, entries: np.ndarray, chunk_start_offsets: np.ndarray):
+        self.entries = entries
+        self.chunk_start_offsets = chunk_start_offsets
+        channel_ids = np.unique(entries["channel_id"])
+        starts = np.searchsorted(entries["channel_id"], channel_ids, "left")
+        ends = np.searchsorted(entries["channel_id"], channel_ids, "right")
+        self._channel_slices = {
+            int(c): slice(int(s), int(e))
+            for c, s, e in zip(channel_ids, starts, ends, strict=True)
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def build(
+        stream: IO[bytes], summary: Summary | None, validate_crc: bool = False
+    ) -> McapMessageIndex:
+        """Build the index by scanning all chunks of the file once.
+
+        Args:
+            stream (IO[bytes]): The seekable stream of the MCAP file.
+            summary (Summary | None): The summary of the MCAP file.
+            validate_crc (bool, optional): Whether to validate the CRC of
+                the chunks. Default: False.
+        """
+        chunk_start_offsets = _chunk_start_offsets(summary)
+        entries = []
+        for chunk_id, chunk_start_offset in enumerate(
+            chunk_start_offsets.tolist()
+        ):
+            data = _read_chunk(stream, chunk_start_offset, validate_crc)
+            offset = 0
+            while offset < len(data):
+                opcode, length = _RECORD_HEADER.unpack_from(data, offset)
+                if opcode == Opcode.MESSAGE:
+                    _, _, channel_id, _, log_time, _ = (
+                        _MESSAGE_HEADER.unpack_from(data, offset)
+                    )
+                    entries.append((channel_id, log_time, chunk_id, offset))
+                offset += _RECORD_HEADER.size + length
+        entries = np.array(entries, dtype=MESSAGE_INDEX_DTYPE)
+        entries = entries[
+            np.lexsort(
+                (
+                    entries["offset"],
+                    entries["chunk"],
+                    entries["log_time"],
+                    entries["channel_id"],
+                )
+            )
+        ]
+        return McapMessageIndex(entries, chunk_start_offsets)
+
+    def save(self, path: str) -> None:
+        """Save the index to a sidecar file atomically."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(self.VERSION),
+                entries=self.entries,
+                chunk_start_offsets=self.chunk_start_offsets,
+            )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> McapMessageIndex:
+        """Load the index from a sidecar file."""
+        with np.load(path) as data:
+            if int(data["version"]) != McapMessageIndex.VERSION:
+                raise ValueError(
+                    f"Message index version {int(data['version'])} of "
+                    f"{path} is not supported."
+                )
+            return McapMessageIndex(
+                data["entries"], data["chunk_start_offsets"]
+            )
+
+    @staticmethod
+    def load_or_build(
+        stream: IO[bytes],
+        summary: Summary | None,
+        path: str | None = None,
+        validate_crc: bool = False,
+    ) -> McapMessageIndex:
+        """Load the index from the sidecar file, or build and save it.
+
+        The sidecar file is rebuilt if it is from another version or its
+        chunks and message count do not match the summary of the file.
+
+        Args:
+            stream (IO[bytes]): The seekable stream of the MCAP file.
+            summary (Summary | None): The summary of the MCAP file.
+            path (str | None, optional): The path of the sidecar file. If
+                None, the index is only built in memory. Default: None.
+            validate_crc (bool, optional): Whether to validate the CRC of
+                the chunks when building. Default: False.
+        """
+        if path is not None and os.path.exists(path):
+            try:
+                index = McapMessageIndex.load(path)
+                if index.match(summary):
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Failed to load message index {path}: {e}")
+            logger.info(f"Rebuild outdated message index {path}")
+        index = McapMessageIndex.build(stream, summary, validate_crc)
+        if path is not None:
+            index.save(path)
+        return index
+
+    def match(self, summary: Summary | None) -> bool:
+        """Whether the index matches the summary of an MCAP file."""
+        chunk_start_offsets = _chunk_start_offsets(summary)
+        if not np.array_equal(chunk_start_offsets, self.chunk_start_offsets):
+            return False
+        statistics = summary.statistics  # type: ignore
+        return statistics is None or statistics.message_count == len(self)
+
+    def query(
+        self,
+        channel_ids: Iterable[int] | None = None,
+        start_time: int | None = None,
+        end_time: int | None = None,
+        log_time_order: bool = True,
+        reverse: bool = False,
+    ) -> np.ndarray:
+        """Get the entries of messages in the channels and time range.
+
+        The order is the same as
+        :meth:`mcap.reader.SeekingReader.iter_messages`: by log time and
+        then by position in the file if `log_time_order` is True, or by
+        position in the file otherwise.
+
+        Args:
+            channel_ids (Iterable[int] | None, optional): The channels to
+                query. If None, all channels are queried. Default: None.
+            start_time (int | None, optional): The start log time, included.
+                Default: None.
+            end_time (int | None, optional): The end log time, excluded.
+                Default: None.
+            log_time_order (bool, optional): Whether to order the entries by
+                log time. Default: True.
+            reverse (bool, optional): Whether to reverse the log time order.
+                Only valid with `log_time_order`. Default: False.
+        """
+        if reverse and not log_time_order:
+            raise ValueError("reverse is only valid with log_time_order=True")
+        if channel_ids is None:
+            channel_ids = self._channel_slices.keys()
+        parts = []
+        for channel_id in channel_ids:
+            if channel_id not in self._channel_slices:
+                continue
+            entries = self.entries[self._channel_slices[channel_id]]
+            begin, end = 0, len(entries)
+            if start_time is not None:
+                begin = np.searchsorted(entries["log_time"], start_time)
+            if end_time is not None:
+                end = np.searchsorted(entries["log_time"], end_time)
+            if begin < end:
+                parts.append(entries[begin:end])
+        if len(parts) == 0:
+            return self.entries[:0]
+        entries = np.concatenate(parts)
+        if log_time_order:
+            order = np.lexsort(
+                (entries["offset"], entries["chunk"], entries["log_time"])
+            )
+            if reverse:
+                order = order[::-1]
+        else:
+            order = np.lexsort((entries["offset"], entries["chunk"]))
+        return entries[order]
+
+
+class McapChunkCache:
+    """A bounded LRU cache of decompressed chunks of an MCAP file.
+
+    Args:
+        stream (IO[bytes]): The seekable stream of the MCAP file.
+        chunk_start_offsets (np.ndarray): The start offsets of all chunks
+            in file order, as in :class:`McapMessageIndex`.
+        max_size (int, optional): The maximum number of decompressed chunks
+            to keep. Default: 8.
+        validate_crc (bool, optional): Whether to validate the CRC of the
+            chunks. Default: False.
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        chunk_start_offsets: np.ndarray,
+        max_size: int = 8,
+        validate_crc: bool = False,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        self.stream = stream
+        self.chunk_start_offsets = chunk_start_offsets
+        self.max_size = max_size
+        self.validate_crc = validate_crc
+        self._cache: OrderedDict[int, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def get(self, chunk: int) -> bytes:
+        """Get the decompressed records of the chunk at the position."""
+        if chunk in self._cache:
+            self._cache.move_to_end(chunk)
+            return self._cache[chunk]
+        data = _read_chunk(
+            self.stream,
+            int(self.chunk_start_offsets[chunk]),
+            self.validate_crc,
+        )
+        self._cache[chunk] = data
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def read_message(self, chunk: int, offset: int) -> Message:
+        """Read the message record at the offset of the chunk."""
+        data = self.get(chunk)
+        _, length, channel_id, sequence, log_time, publish_time = (
+            _MESSAGE_HEADER.unpack_from(data, offset)
+        )
+        begin = offset + _MESSAGE_HEADER.size
+        return Message(
+            channel_id=channel_id,
+            sequence=sequence,
+            log_time=log_time,
+            publish_time=publish_time,
+            data=data[begin : offset + _RECORD_HEADER.size + length],
+        )
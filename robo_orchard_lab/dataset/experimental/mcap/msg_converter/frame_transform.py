@@ -15,11 +15,15 @@
 # permissions and limitations under the License.
 
 from __future__ import annotations
+from typing import Sequence
 
+import numpy as np
 import torch
 from foxglove_schemas_protobuf.FrameTransform_pb2 import (
     FrameTransform as FgFrameTransform,
 )
+from google.protobuf.descriptor import Descriptor
+from google.protobuf.message import Message as PbMessage
 from robo_orchard_core.utils.torch_utils import dtype_str2torch
 
 from robo_orchard_lab.dataset.datatypes.geometry import BatchFrameTransform
@@ -28,6 +32,10 @@ from robo_orchard_lab.dataset.experimental.mcap.msg_converter.base import (
     MessageConverterStateless,
     TensorTargetConfigMixin,
 )
+from robo_orchard_lab.dataset.experimental.mcap.msg_converter.protobuf_wire import (  # noqa: E501
+    PbFixedFieldDecoder,
+)
+from robo_orchard_lab.utils.protobuf import is_protobuf_msg_type
 
 __all__ = [
     "BatchFrameTransform",
@@ -42,7 +50,21 @@ class ToBatchFrameTransform(
         BatchFrameTransform,
     ]
 ):
-    """Convert a Foxglove FrameTransform message to a FrameTransform Type."""
+    """Convert a Foxglove FrameTransform message to a FrameTransform Type.
+
+    Serialized messages can be converted by :meth:`convert_serialized`
+    without parsing each of them.
+    """
+
+    _WIRE_FIELDS = (
+        "translation.x",
+        "translation.y",
+        "translation.z",
+        "rotation.w",
+        "rotation.x",
+        "rotation.y",
+        "rotation.z",
+    )
 
     def __init__(
         self,
@@ -50,6 +72,62 @@ class ToBatchFrameTransform(
     ):
         self._cfg = cfg
         self._dtype = dtype_str2torch(cfg.dtype)
+        self._wire_decoders: dict[Descriptor, PbFixedFieldDecoder] = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # descriptors are not picklable.
+        state["_wire_decoders"] = {}
+        return state
+
+    def convert_serialized(
+        self, data: Sequence[bytes], first: PbMessage
+    ) -> BatchFrameTransform | None:
+        """Convert serialized messages without parsing them one by one.
+
+        The translations and rotations are decoded from the serialized
+        bytes into arrays by :class:`PbFixedFieldDecoder`. The result is
+        the same as :meth:`convert` of the list of parsed messages.
+
+        Args:
+            data (Sequence[bytes]): The serialized `FrameTransform`
+                messages.
+            first (PbMessage): The first message parsed. It gives the
+                descriptor of the messages and the frame ids.
+
+        Returns:
+            BatchFrameTransform | None: The frame transforms, or None if
+            the messages are not supported, e.g., a component of the
+            rotation is zero in only some messages and is therefore not
+            serialized. Parse the messages and use :meth:`convert`
+            instead in that case.
+        """
+        if not is_protobuf_msg_type(first, FgFrameTransform):
+            return None
+        decoder = self._wire_decoders.get(first.DESCRIPTOR)
+        if decoder is None:
+            decoder = PbFixedFieldDecoder(
+                first.DESCRIPTOR,
+                fields=self._WIRE_FIELDS,
+                timestamp_field="timestamp",
+            )
+            self._wire_decoders[first.DESCRIPTOR] = decoder
+        batch = decoder.decode(data)
+        if batch is None:
+            return None
+        xyz, quat = (
+            torch.from_numpy(
+                np.stack([batch.values[name] for name in names], axis=1)
+            ).to(dtype=self._dtype, device=self._cfg.device)
+            for names in (self._WIRE_FIELDS[:3], self._WIRE_FIELDS[3:])
+        )
+        return BatchFrameTransform(
+            child_frame_id=first.child_frame_id,
+            parent_frame_id=first.parent_frame_id,
+            xyz=xyz,
+            quat=quat,
+            timestamps=batch.timestamps,  # type: ignore
+        )
 
     def convert(
         self, src: FgFrameTransform | list[FgFrameTransform]
@@ -15,8 +15,11 @@
 # permissions and limitations under the License.
 
 from __future__ import annotations
+from typing import Sequence
 
 import torch
+from google.protobuf.descriptor import Descriptor
+from google.protobuf.message import Message as PbMessage
 from robo_orchard_core.utils.torch_utils import dtype_str2torch
 from robo_orchard_schemas.sensor_msgs.JointState_pb2 import (
     JointState as PbJointState,
@@ -30,7 +33,13 @@ from robo_orchard_lab.dataset.experimental.mcap.msg_converter.base import (
     MessageConverterStateless,
     TensorTargetConfigMixin,
 )
-from robo_orchard_lab.utils.protobuf import is_list_of_protobuf_msg_type
+from robo_orchard_lab.dataset.experimental.mcap.msg_converter.protobuf_wire import (  # noqa: E501
+    PbFixedFieldDecoder,
+)
+from robo_orchard_lab.utils.protobuf import (
+    is_list_of_protobuf_msg_type,
+    is_protobuf_msg_type,
+)
 
 ___all__ = [
     "ToBatchJointsState",
@@ -58,6 +67,9 @@ class ToBatchJointsState(
     The output is a `BatchJointsState` object containing
     the joint states in a batch format.
 
+    Serialized messages can be converted by :meth:`convert_serialized`
+    without parsing each of them.
+
     """
 
     def __init__(
@@ -66,6 +78,13 @@ class ToBatchJointsState(
     ):
         self._cfg = cfg
         self._dtype = dtype_str2torch(cfg.dtype)
+        self._wire_decoders: dict[Descriptor, PbFixedFieldDecoder] = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # descriptors are not picklable.
+        state["_wire_decoders"] = {}
+        return state
 
     def _set_joint_states(
         self,
@@ -179,6 +198,74 @@ class ToBatchJointsState(
             )
         return ret.to(device=self._cfg.device)
 
+    def convert_serialized(
+        self, data: Sequence[bytes], first: PbMessage
+    ) -> BatchJointsState | None:
+        """Convert serialized messages without parsing them one by one.
+
+        The positions, velocities and efforts are decoded from the
+        serialized bytes into arrays by :class:`PbFixedFieldDecoder`, so
+        the cost does not grow with the number of joints in Python. The
+        result is the same as :meth:`convert` of the parsed messages.
+
+        Args:
+            data (Sequence[bytes]): The serialized `JointStateStamped` or
+                `MultiJointStateStamped` messages.
+            first (PbMessage): The first message parsed. It gives the
+                descriptor of the messages and the joint names.
+
+        Returns:
+            BatchJointsState | None: The joint states, or None if the
+            messages are not supported, e.g., the joints are different
+            between messages. Parse the messages and use :meth:`convert`
+            instead in that case.
+        """
+        if is_protobuf_msg_type(first, PbJointStateStamped):
+            prefix = "state."
+        elif is_protobuf_msg_type(first, PbMultiJointStateStamped):
+            if len(first.states) == 0:
+                return None
+            prefix = "states."
+        else:
+            return None
+        decoder = self._wire_decoders.get(first.DESCRIPTOR)
+        if decoder is None:
+            decoder = PbFixedFieldDecoder(
+                first.DESCRIPTOR,
+                fields=[
+                    prefix + name
+                    for name in ("position", "velocity", "effort")
+                ],
+                timestamp_field="timestamp",
+            )
+            self._wire_decoders[first.DESCRIPTOR] = decoder
+        batch = decoder.decode(data)
+        if batch is None:
+            return None
+
+        fields = {}
+        for name in ("position", "velocity", "effort"):
+            value = batch.values[prefix + name]
+            present = batch.present[prefix + name]
+            if value.ndim == 1:
+                value = value[:, None]
+                present = present[None]
+            fields[name] = (
+                torch.from_numpy(value).to(self._dtype) if present[0] else None
+            )
+        if is_protobuf_msg_type(first, PbJointStateStamped):
+            names = (
+                [first.state.name] if first.state.HasField("name") else None
+            )
+        else:
+            names = [state.name for state in first.states]
+        ret = BatchJointsState(
+            **fields,
+            names=names,
+            timestamps=batch.timestamps,  # type: ignore
+        )
+        return ret.to(device=self._cfg.device)
+
     def _format_input(
         self, data: ToBatchJointsState_SRC_TYPE
     ) -> list[PbMultiJointStateStamped] | list[PbJointStateStamped]:
@@ -0,0 +1,405 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Decode fixed-width fields of serialized protobuf messages into arrays.
+
+Converting protobuf messages field by field creates a Python object for
+every value. Messages recorded in a stream, e.g., joint states or frame
+transforms, usually share the same layout in the wire format: the same
+fields, names and repeated counts, and only the values of fixed-width
+fields (`float`, `double`, `fixed32`, ...) change. For such a batch, the
+values are at the same byte offsets of all messages, and they can be
+gathered from the serialized bytes into typed arrays with numpy at once.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+
+__all__ = [
+    "decode_varint",
+    "iter_wire_fields",
+    "decode_timestamp",
+    "PbFixedFieldBatch",
+    "PbFixedFieldDecoder",
+]
+
+WIRE_VARINT = 0
+WIRE_I64 = 1
+WIRE_LEN = 2
+WIRE_I32 = 5
+
+_FIXED_FIELD_DTYPES: dict[int, np.dtype] = {
+    FieldDescriptor.TYPE_DOUBLE: np.dtype("<f8"),
+    FieldDescriptor.TYPE_FLOAT: np.dtype("<f4"),
+    FieldDescriptor.TYPE_FIXED64: np.dtype("<u8"),
+    FieldDescriptor.TYPE_SFIXED64: np.dtype("<i8"),
+    FieldDescriptor.TYPE_FIXED32: np.dtype("<u4"),
+    FieldDescriptor.TYPE_SFIXED32: np.dtype("<i4"),
+}
+
+
+def decode_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Decode an unsigned varint.
+
+    Returns:
+        tuple[int, int]: The value and the position after the varint.
+    """
+    value = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, pos
+        shift += 7
+        if shift >= 64:
+            raise ValueError("Varint is too long.")
+
+
+def iter_wire_fields(
+    data: bytes, start: int = 0, end: int | None = None
+) -> Iterator[tuple[int, int, int, int]]:
+    """Iterate over the fields of a serialized message.
+
+    Args:
+        data (bytes): The serialized bytes.
+        start (int, optional): The start of the message in `data`.
+            Default: 0.
+        end (int | None, optional): The end of the message in `data`. If
+            None, the message ends with `data`. Default: None.
+
+    Yields:
+        tuple[int, int, int, int]: The field number, the wire type, and
+        the begin and end of the value. The value of a length-delimited
+        field is its payload without the length.
+    """
+    if end is None:
+        end = len(data)
+    pos = start
+    while pos < end:
+        tag, pos = decode_varint(data, pos)
+        field_number, wire_type = tag >> 3, tag & 0x7
+        if wire_type == WIRE_VARINT:
+            _, value_end = decode_varint(data, pos)
+        elif wire_type == WIRE_I64:
+            value_end = pos + 8
+        elif wire_type == WIRE_LEN:
+            length, pos = decode_varint(data, pos)
+            value_end = pos + length
+        elif wire_type == WIRE_I32:
+            value_end = pos + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}.")
+        if value_end > end:
+            raise ValueError("Truncated message.")
+        yield field_number, wire_type, pos, value_end
+        pos = value_end
+
+
+def decode_timestamp(data: bytes, start: int, end: int) -> int:
+    """Decode a serialized `google.protobuf.Timestamp` to nanoseconds."""
+    seconds = 0
+    nanos = 0
+    for field_number, wire_type, begin, _ in iter_wire_fields(
+        data, start, end
+    ):
+        if wire_type != WIRE_VARINT:
+            continue
+        value, _ = decode_varint(data, begin)
+        if field_number == 1:
+            seconds = value - (1 << 64) if value >= 1 << 63 else value
+        elif field_number == 2:
+            nanos = value - (1 << 64) if value >= 1 << 63 else value
+    return seconds * 1_000_000_000 + nanos
+
+
+@dataclass
+class PbFixedFieldBatch:
+    """Fields decoded from a batch of serialized messages."""
+
+    timestamps: list[int] | None
+    """The timestamps in nanoseconds, if decoded."""
+
+    values: dict[str, np.ndarray]
+    """The values of each field path.
+
+    The shape is `(batch_size, *counts)`, where `counts` are the counts of
+    the repeated fields in the path. Missing values are filled with NaN
+    for floating fields with presence, or with the default value.
+    """
+
+    present: dict[str, np.ndarray]
+    """Whether each value of a field path is present, shaped as `counts`.
+
+    It is shared by all messages in the batch.
+    """
+
+
+@dataclass
+class _Template:
+    """The layout of the template message."""
+
+    value_mask: np.ndarray
+    """Whether each byte is in the value of a fixed-width field."""
+    offsets: dict[str, dict[tuple[int, ...], int]]
+    """The offsets of values by field path and repeated indices."""
+    counts: dict[str, int]
+    """The maximum count of each repeated field path."""
+
+
+class PbFixedFieldDecoder:
+    """Decode fixed-width fields of serialized messages of the same layout.
+
+    The first message of a batch is parsed as a template with the
+    descriptor. Then all bytes of the messages except the values of
+    fixed-width fields are compared with the template. If they are equal,
+    all messages are parsed exactly as the template, and the values are
+    gathered at the offsets of the template with numpy. Otherwise the
+    batch is not supported, and :meth:`decode` returns None so that the
+    caller can parse the messages one by one instead.
+
+    The timestamp field is allowed to differ between messages if it is the
+    first field in the wire format, which is the case if it has the
+    smallest field number, because the official implementations serialize
+    fields in field number order.
+
+    Note:
+        Varint fields other than the timestamp, e.g., integers and enums,
+        are compared as layout, so batches in which they change are not
+        supported. Fields with implicit presence are not serialized with
+        the default value, so a batch in which such a field is zero in only
+        some messages is not supported either.
+
+    Args:
+        descriptor (Descriptor): The descriptor of the messages.
+        fields (Sequence[str]): The dotted paths of fixed-width fields to
+            decode, e.g., `"states.position"`. Scalar and message fields in
+            the path can be repeated, and each of them adds a dimension to
+            the decoded array.
+        timestamp_field (str | None, optional): The name of a top-level
+            `google.protobuf.Timestamp` field to decode. Default: None.
+    """
+
+    def __init__(
+        self,
+        descriptor: Descriptor,
+        fields: Sequence[str],
+        timestamp_field: str | None = None,
+    ):
+        self.descriptor = descriptor
+        self.fields = list(fields)
+        self._leaves: dict[str, FieldDescriptor] = {}
+        for path in self.fields:
+            msg_desc = descriptor
+            field = None
+            for name in path.split("."):
+                if msg_desc is None or name not in msg_desc.fields_by_name:
+                    raise ValueError(
+                        f"Field {path} is not found in {descriptor.full_name}."
+                    )
+                field = msg_desc.fields_by_name[name]
+                msg_desc = field.message_type
+            assert field is not None
+            if field.type not in _FIXED_FIELD_DTYPES:
+                raise ValueError(
+                    f"Field {path} of {descriptor.full_name} is not a "
+                    "fixed-width scalar field."
+                )
+            self._leaves[path] = field
+
+        self._timestamp_number: int | None = None
+        if timestamp_field is not None:
+            field = descriptor.fields_by_name.get(timestamp_field)
+            if (
+                field is None
+                or field.message_type is None
+                or field.message_type.full_name != "google.protobuf.Timestamp"
+            ):
+                raise ValueError(
+                    f"Field {timestamp_field} of {descriptor.full_name} is "
+                    "not a google.protobuf.Timestamp field."
+                )
+            self._timestamp_number = field.number
+
+    def _split_timestamp(self, data: bytes) -> tuple[int, int]:
+        """Get the timestamp and the start of the other fields."""
+        if self._timestamp_number is None or len(data) == 0:
+            return 0, 0
+        tag, pos = decode_varint(data, 0)
+        if tag != (self._timestamp_number << 3 | WIRE_LEN):
+            return 0, 0
+        length, pos = decode_varint(data, pos)
+        return decode_timestamp(data, pos, pos + length), pos + length
+
+    def _scan(
+        self,
+        data: bytes,
+        start: int,
+        end: int,
+        msg_desc: Descriptor,
+        prefix: str,
+        index: tuple[int, ...],
+        template: _Template,
+    ) -> None:
+        """Parse the template and find the offsets of all values."""
+        counts: dict[int, int] = {}
+        for field_number, wire_type, begin, value_end in iter_wire_fields(
+            data, start, end
+        ):
+            field = msg_desc.fields_by_number.get(field_number)
+            if field is None:
+                continue
+            path = prefix + field.name
+            repeated = field.label == FieldDescriptor.LABEL_REPEATED
+            if field.type in _FIXED_FIELD_DTYPES:
+                width = _FIXED_FIELD_DTYPES[field.type].itemsize
+                # a packed repeated field has all values in one payload.
+                if not (
+                    (repeated and wire_type == WIRE_LEN)
+                    or wire_type == (WIRE_I64 if width == 8 else WIRE_I32)
+                ):
+                    raise ValueError(f"Unexpected wire type of {path}.")
+                if (value_end - begin) % width != 0:
+                    raise ValueError(f"Invalid packed values of {path}.")
+                template.value_mask[begin:value_end] = True
+                path_offsets = template.offsets.setdefault(path, {})
+                for offset in range(begin, value_end, width):
+                    if repeated:
+                        count = counts.get(field_number, 0)
+                        counts[field_number] = count + 1
+                        path_offsets[index + (count,)] = offset
+                    else:
+                        path_offsets[index] = offset
+            elif field.type == FieldDescriptor.TYPE_MESSAGE:
+                if wire_type != WIRE_LEN:
+                    raise ValueError(f"Unexpected wire type of {path}.")
+                sub_index = index
+                if repeated:
+                    count = counts.get(field_number, 0)
+                    counts[field_number] = count + 1
+                    sub_index = index + (count,)
+                self._scan(
+                    data,
+                    begin,
+                    value_end,
+                    field.message_type,
+                    path + ".",
+                    sub_index,
+                    template,
+                )
+            if repeated:
+                template.counts[path] = max(
+                    template.counts.get(path, 0), counts[field_number]
+                )
+
+    def _repeated_prefixes(self, path: str) -> list[str]:
+        """Get the repeated fields in the path, which are dimensions."""
+        prefixes = []
+        msg_desc = self.descriptor
+        prefix = ""
+        for name in path.split("."):
+            field = msg_desc.fields_by_name[name]
+            prefix = prefix + name
+            if field.label == FieldDescriptor.LABEL_REPEATED:
+                prefixes.append(prefix)
+            msg_desc = field.message_type
+            prefix += "."
+        return prefixes
+
+    def decode(self, data: Sequence[bytes]) -> PbFixedFieldBatch | None:
+        """Decode the fields of the serialized messages.
+
+        Args:
+            data (Sequence[bytes]): The serialized messages.
+
+        Returns:
+            PbFixedFieldBatch | None: The decoded fields, or None if the
+            messages do not share the same layout.
+        """
+        if len(data) == 0:
+            return None
+        timestamps = []
+        bodies = []
+        try:
+            for item in data:
+                timestamp, body_start = self._split_timestamp(item)
+                timestamps.append(timestamp)
+                bodies.append(item[body_start:] if body_start > 0 else item)
+            length = len(bodies[0])
+            if any(len(body) != length for body in bodies):
+                return None
+            template = _Template(
+                value_mask=np.zeros(length, dtype=bool), offsets={}, counts={}
+            )
+            self._scan(bodies[0], 0, length, self.descriptor, "", (), template)
+            if self._timestamp_number is not None and any(
+                field_number == self._timestamp_number
+                for field_number, _, _, _ in iter_wire_fields(bodies[0])
+            ):
+                # the timestamp is not the first field.
+                return None
+        except (ValueError, IndexError):
+            return None
+
+        buf = np.frombuffer(b"".join(bodies), dtype=np.uint8).reshape(
+            len(bodies), length
+        )
+        layout = buf[:, ~template.value_mask]
+        if not (layout == layout[:1]).all():
+            return None
+
+        values: dict[str, np.ndarray] = {}
+        present: dict[str, np.ndarray] = {}
+        for path in self.fields:
+            field = self._leaves[path]
+            dtype = _FIXED_FIELD_DTYPES[field.type]
+            shape = tuple(
+                template.counts.get(prefix, 0)
+                for prefix in self._repeated_prefixes(path)
+            )
+            offsets = np.full(shape, -1, dtype=np.int64)
+            for index, offset in template.offsets.get(path, {}).items():
+                offsets[index] = offset
+            mask = offsets >= 0
+            columns = np.where(mask, offsets, 0)[..., None] + np.arange(
+                dtype.itemsize
+            )
+            value = (
+                np.ascontiguousarray(buf[:, columns])
+                .view(dtype)
+                .reshape((len(bodies),) + shape)
+                .astype(dtype.newbyteorder("="))
+            )
+            if not mask.all():
+                if field.has_presence and dtype.kind == "f":
+                    value[:, ~mask] = np.nan
+                else:
+                    value[:, ~mask] = field.default_value
+            values[path] = value
+            present[path] = mask
+
+        return PbFixedFieldBatch(
+            timestamps=timestamps
+            if self._timestamp_number is not None
+            else None,
+            values=values,
+            present=present,
+        )
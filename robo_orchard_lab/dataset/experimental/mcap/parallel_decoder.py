@@ -0,0 +1,336 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Decode batches of many MCAP files in parallel worker processes."""
+
+from __future__ import annotations
+import copy
+import multiprocessing as mp
+import queue
+import traceback
+from dataclasses import dataclass
+from typing import Any, Iterator, Sequence
+
+import fsspec
+
+from robo_orchard_lab.dataset.experimental.mcap.batch_decoder.base import (
+    McapBatchDecoder,
+    McapBatchDecoderConfig,
+)
+from robo_orchard_lab.dataset.experimental.mcap.batch_split import (
+    BatchSplitMixin,
+    iter_messages_batch,
+)
+from robo_orchard_lab.dataset.experimental.mcap.data_record import (
+    McapMessageBatch,
+)
+from robo_orchard_lab.dataset.experimental.mcap.msg_decoder import (
+    McapDecoderContext,
+)
+from robo_orchard_lab.dataset.experimental.mcap.reader import (
+    MakeIterMsgArgs,
+    McapReader,
+)
+
+__all__ = [
+    "McapDecodeTask",
+    "McapDecodedBatch",
+    "split_mcap_by_time",
+    "iter_decoded_batches",
+]
+
+
+@dataclass
+class McapDecodeTask:
+    """A task to decode the messages of an MCAP file in a time range."""
+
+    path: str
+    """The path or url of the MCAP file, opened with fsspec."""
+    start_time: int | None = None
+    """Start log_time of messages in nanoseconds. None for the beginning."""
+    end_time: int | None = None
+    """End log_time(excluded) of messages in nanoseconds. None for the end."""
+
+
+@dataclass
+class McapDecodedBatch:
+    """A decoded batch of messages from a task."""
+
+    task_index: int
+    """The index of the task that the batch is from."""
+    batch_index: int
+    """The index of the batch in the task."""
+    decoded: Any
+    """The output of the batch decoder, or None without batch decoder."""
+    batch: McapMessageBatch | None = None
+    """The batch of messages before decoding, if kept."""
+
+
+def split_mcap_by_time(path: str, num_parts: int) -> list[McapDecodeTask]:
+    """Split an MCAP file into tasks of disjoint time ranges.
+
+    The time range of all messages in the file is split evenly. Batches
+    are split independently in each task, so a batch never spans two
+    tasks.
+
+    Args:
+        path (str): The path or url of the MCAP file.
+        num_parts (int): The number of time ranges.
+
+    Returns:
+        list[McapDecodeTask]: The tasks in time order.
+    """
+    if num_parts < 1:
+        raise ValueError("num_parts must be at least 1.")
+    with fsspec.open(path, "rb") as f:
+        summary = McapReader.make_reader(f).get_summary()  # type: ignore
+    if summary is None or summary.statistics is None:
+        raise ValueError(f"Statistics are not available in {path}.")
+    start = summary.statistics.message_start_time
+    end = summary.statistics.message_end_time + 1
+    bounds = [start + (end - start) * i // num_parts for i in range(num_parts)]
+    bounds.append(end)
+    return [
+        McapDecodeTask(path=path, start_time=bounds[i], end_time=bounds[i + 1])
+        for i in range(num_parts)
+        if bounds[i] < bounds[i + 1]
+    ]
+
+
+def _iter_task_batches(
+    task_index: int,
+    task: McapDecodeTask,
+    batch_split: BatchSplitMixin,
+    batch_decoder: McapBatchDecoder | None,
+    topics: Sequence[str] | None,
+    keep_message_batch: bool,
+    iter_batch_kwargs: dict[str, Any],
+    worker_id: int = 0,
+    num_workers: int = 1,
+) -> Iterator[McapDecodedBatch]:
+    """Iterate over the batches of a task.
+
+    All batches of the task are read and split, but only the non-empty
+    batches whose position modulo `num_workers` is `worker_id` are decoded
+    and yielded.
+    """
+    # batch splitters are stateful, so each task starts from a fresh copy.
+    batch_split = copy.deepcopy(batch_split)
+    batch_split.reset()
+    decoder_ctx = McapDecoderContext()
+    with fsspec.open(task.path, "rb") as f:
+        reader = McapReader.make_reader(f)  # type: ignore
+        position = -1
+        for batch_index, batch in enumerate(
+            iter_messages_batch(
+                reader,
+                batch_split=batch_split,
+                iter_config=MakeIterMsgArgs(
+                    topics=topics,
+                    start_time=task.start_time,
+                    end_time=task.end_time,
+                ),
+                **iter_batch_kwargs,
+            )
+        ):
+            if len(batch) == 0:
+                continue
+            position += 1
+            if position % num_workers != worker_id:
+                continue
+            decoded = None
+            if batch_decoder is not None:
+                decoded = batch_decoder(batch, msg_decoder_ctx=decoder_ctx)
+            yield McapDecodedBatch(
+                task_index=task_index,
+                batch_index=batch_index,
+                decoded=decoded,
+                batch=batch if keep_message_batch else None,
+            )
+
+
+def _worker_main(
+    tasks: Sequence[McapDecodeTask],
+    output: mp.Queue,
+    shutdown: Any,
+    kwargs: dict[str, Any],
+) -> None:
+    """Decode the batches of the worker and put the results to the queue.
+
+    Each task ends with a `("done", None)` item. Any exception ends the
+    worker with an `("error", traceback)` item.
+    """
+    try:
+        for task_index, task in enumerate(tasks):
+            for item in _iter_task_batches(task_index, task, **kwargs):
+                output.put(("batch", item))
+            output.put(("done", None))
+    except BaseException:
+        output.put(("error", traceback.format_exc()))
+    # tensors are shared through file descriptors owned by this process,
+    # so it must stay alive until all outputs are received.
+    shutdown.wait()
+
+
+def _get_item(output: mp.Queue, worker: mp.Process) -> tuple[str, Any]:
+    while True:
+        try:
+            return output.get(timeout=1.0)
+        except queue.Empty:
+            if worker.is_alive():
+                continue
+            # drain the items put right before the worker exited.
+            try:
+                return output.get(timeout=1.0)
+            except queue.Empty:
+                raise RuntimeError(
+                    f"MCAP decode worker {worker.name} exited unexpectedly "
+                    f"with code {worker.exitcode}."
+                ) from None
+
+
+def _get_task_item(
+    task: McapDecodeTask, output: mp.Queue, worker: mp.Process
+) -> tuple[str, Any]:
+    kind, item = _get_item(output, worker)
+    if kind == "error":
+        raise RuntimeError(
+            f"Failed to decode {task} in {worker.name}:\n{item}"
+        )
+    return kind, item
+
+
+def iter_decoded_batches(
+    tasks: Sequence[McapDecodeTask],
+    batch_split: BatchSplitMixin,
+    batch_decoder: McapBatchDecoder | McapBatchDecoderConfig | None = None,
+    topics: Sequence[str] | None = None,
+    num_workers: int = 0,
+    queue_size: int = 8,
+    keep_message_batch: bool = False,
+    do_not_split_same_log_time: bool = True,
+    keep_last_topic_msgs: bool = True,
+) -> Iterator[McapDecodedBatch]:
+    """Iterate over decoded batches of many MCAP tasks in parallel.
+
+    Each task is split into batches with :func:`iter_messages_batch`, and
+    each batch is decoded by `batch_decoder` with a decoder context
+    created for the task.
+
+    Batches are assigned to `num_workers` worker processes round-robin.
+    Every worker reads and splits all tasks in order, which is cheap
+    compared to decoding, but only decodes its own batches into its own
+    queue holding at most `queue_size` batches. The batches are taken
+    from the queues in turn, so they are yielded in the same order as
+    decoding serially, while all workers decode at the same time and the
+    decoded batches held in memory stay bounded by the queues.
+
+    Note:
+        Each worker decodes only some batches of a task, so stateful
+        message decoders, e.g., video decoders, do not see all messages of
+        the task. Use `num_workers=0` for them.
+
+    Args:
+        tasks (Sequence[McapDecodeTask]): The tasks to decode, e.g., one
+            per file, or from :func:`split_mcap_by_time`.
+        batch_split (BatchSplitMixin): The batch splitting logic. It is
+            copied for each task.
+        batch_decoder (McapBatchDecoder | McapBatchDecoderConfig | None,
+            optional): The decoder of each batch. It must be picklable if
+            `num_workers` is greater than 0. If None, batches are not
+            decoded. Default: None.
+        topics (Sequence[str] | None, optional): The topics to read. If
+            None, all topics are read. Default: None.
+        num_workers (int, optional): The number of worker processes. If 0,
+            decode in the current process. Default: 0.
+        queue_size (int, optional): The maximum number of decoded batches
+            buffered for each worker. Default: 8.
+        keep_message_batch (bool, optional): Whether to return the batches
+            of messages before decoding as well. Default: False.
+        do_not_split_same_log_time (bool, optional): See
+            :func:`iter_messages_batch`. Default: True.
+        keep_last_topic_msgs (bool, optional): See
+            :func:`iter_messages_batch`. Default: True.
+
+    Yields:
+        McapDecodedBatch: The decoded batches in the order of tasks.
+    """
+    if isinstance(batch_decoder, McapBatchDecoderConfig):
+        batch_decoder = batch_decoder()
+    kwargs = dict(
+        batch_split=batch_split,
+        batch_decoder=batch_decoder,
+        topics=topics,
+        keep_message_batch=keep_message_batch,
+        iter_batch_kwargs=dict(
+            do_not_split_same_log_time=do_not_split_same_log_time,
+            keep_last_topic_msgs=keep_last_topic_msgs,
+        ),
+    )
+
+    if num_workers <= 0:
+        for task_index, task in enumerate(tasks):
+            yield from _iter_task_batches(task_index, task, **kwargs)
+        return
+
+    shutdown = mp.Event()
+    outputs: list[mp.Queue] = []
+    workers: list[mp.Process] = []
+    try:
+        for i in range(num_workers):
+            output = mp.Queue(maxsize=queue_size)
+            worker = mp.Process(
+                target=_worker_main,
+                args=(
+                    list(tasks),
+                    output,
+                    shutdown,
+                    dict(kwargs, worker_id=i, num_workers=num_workers),
+                ),
+                name=f"McapDecodeWorker-{i}",
+                daemon=True,
+            )
+            worker.start()
+            outputs.append(output)
+            workers.append(worker)
+
+        for task in tasks:
+            # the batch at position k of the task is from worker k % n. The
+            # task ends at the first worker without the next batch, and the
+            # other workers end the task right after their last batch.
+            position = 0
+            while True:
+                i = position % num_workers
+                kind, item = _get_task_item(task, outputs[i], workers[i])
+                if kind == "done":
+                    break
+                yield item
+                position += 1
+            for j in range(1, num_workers):
+                k = (i + j) % num_workers
+                kind, _ = _get_task_item(task, outputs[k], workers[k])
+                assert kind == "done", f"Unexpected {kind} item."
+    finally:
+        shutdown.set()
+        for worker in workers:
+            # workers blocked on a full queue never see the shutdown event.
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        for output in outputs:
+            output.cancel_join_thread()
+            output.close()
@@ -24,6 +24,10 @@ from mcap.reader import (
     McapReader as _McapReader,
     make_reader as mcap_make_reader,
 )
+from robo_orchard_lab.dataset.experimental.mcap.message_index import (
+    McapChunkCache,
+    McapMessageIndex,
+)
 from robo_orchard_lab.dataset.experimental.mcap.messages import (
     McapDecodedMessageTuple,
     McapMessageTuple,
@@ -84,11 +88,30 @@ class McapReader:
     New features compared to the original mcap reader:
     - Separate the decoding logic from the reader for better flexibility.
     - Provide batch reading of messages with configurable splitting.
+    - Optional message index for random access by topic and log time.
+      See :meth:`enable_message_index`.
+
+    Args:
+        reader (_McapReader): The mcap reader to wrap.
+        stream (IO[bytes] | None, optional): The seekable stream of the
+            reader. Required by :meth:`enable_message_index`.
+            Default: None.
+        validate_crcs (bool, optional): Whether to validate the CRC of
+            chunks read through the message index. Default: False.
 
     """
 
-    def __init__(self, reader: _McapReader):
+    def __init__(
+        self,
+        reader: _McapReader,
+        stream: IO[bytes] | None = None,
+        validate_crcs: bool = False,
+    ):
         self.reader = reader
+        self.stream = stream
+        self.validate_crcs = validate_crcs
+        self.message_index: McapMessageIndex | None = None
+        self.chunk_cache: McapChunkCache | None = None
 
         # Expose the reader's methods for compatibility
         self.get_header = reader.get_header
@@ -102,9 +125,54 @@ class McapReader:
         validate_crcs: bool = False,
     ) -> McapReader:
         return McapReader(
-            mcap_make_reader(stream=stream, validate_crcs=validate_crcs)
+            mcap_make_reader(stream=stream, validate_crcs=validate_crcs),
+            stream=stream,
+            validate_crcs=validate_crcs,
         )
 
+    def enable_message_index(
+        self,
+        index_path: str | None = None,
+        chunk_cache_size: int = 8,
+    ) -> McapMessageIndex:
+        """Read messages through a message index and a chunk cache.
+
+        After this call, :meth:`iter_messages` finds the messages of the
+        topics and time range with the index, and only reads the chunks
+        containing them. Decompressed chunks are kept in a LRU cache, so
+        that repeated random access, e.g., by
+        :class:`~robo_orchard_lab.dataset.experimental.mcap.data_record.McapDataRecordChunk`,
+        does not decompress the same chunks again. The order of messages
+        is the same as without the index.
+
+        Args:
+            index_path (str | None, optional): The sidecar file of the
+                index, e.g., `{mcap_path}.idx.npz`. The index is loaded from
+                it if it matches the file, otherwise built by scanning the
+                file once and saved to it. If None, the index is built in
+                memory. Default: None.
+            chunk_cache_size (int, optional): The maximum number of
+                decompressed chunks to cache. Default: 8.
+
+        Returns:
+            McapMessageIndex: The message index.
+        """
+        if self.stream is None:
+            raise McapError("Message index requires the stream of reader.")
+        self.message_index = McapMessageIndex.load_or_build(
+            self.stream,
+            self.get_summary(),
+            path=index_path,
+            validate_crc=self.validate_crcs,
+        )
+        self.chunk_cache = McapChunkCache(
+            self.stream,
+            self.message_index.chunk_start_offsets,
+            max_size=chunk_cache_size,
+            validate_crc=self.validate_crcs,
+        )
+        return self.message_index
+
     def _update_time_range(self, iter_config: MakeIterMsgArgs):
         """Update the start and end time based on the provided parameters.
 
@@ -138,6 +206,10 @@ class McapReader:
 
         self._update_time_range(iter_config)
 
+        if self.message_index is not None:
+            yield from self._iter_indexed_messages(iter_config)
+            return
+
         topics = iter_config.topics
         for schema, channel, msg in self.reader.iter_messages(
             topics=topics,
@@ -152,6 +224,43 @@ class McapReader:
                 message=msg,
             )
 
+    def _iter_indexed_messages(
+        self, iter_config: MakeIterMsgArgs
+    ) -> Iterator[McapMessageTuple]:
+        assert self.message_index is not None
+        assert self.chunk_cache is not None
+        summary = self.get_summary()
+        assert summary is not None
+        channel_ids = None
+        if iter_config.topics is not None:
+            topics = (
+                [iter_config.topics]
+                if isinstance(iter_config.topics, str)
+                else iter_config.topics
+            )
+            channel_ids = [
+                channel_id
+                for channel_id, channel in summary.channels.items()
+                if channel.topic in topics
+            ]
+        entries = self.message_index.query(
+            channel_ids=channel_ids,
+            start_time=iter_config.start_time,
+            end_time=iter_config.end_time,
+            log_time_order=iter_config.log_time_order,
+            reverse=iter_config.reverse,
+        )
+        for chunk, offset in zip(
+            entries["chunk"].tolist(), entries["offset"].tolist(), strict=True
+        ):
+            msg = self.chunk_cache.read_message(chunk, offset)
+            channel = summary.channels[msg.channel_id]
+            yield McapMessageTuple(
+                schema=summary.schemas.get(channel.schema_id),
+                channel=channel,
+                message=msg,
+            )
+
     def iter_decoded_messages(
         self,
         decoder_ctx: McapDecoderContext,
@@ -14,6 +14,9 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
+import contextlib
+import hashlib
+import json
 import logging
 import os
 from typing import Callable, List, Optional, Union
@@ -22,12 +25,15 @@ import numpy as np
 from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from torch.utils.data import Dataset
 
-from robo_orchard_lab.dataset.lmdb.lmdb_wrapper import Lmdb
+from robo_orchard_lab.dataset.lmdb.lmdb_wrapper import Lmdb, ReadWatchdog
 from robo_orchard_lab.utils.build import build
 from robo_orchard_lab.utils.misc import as_sequence
 
 logger = logging.getLogger(__name__)
 
+INDEX_CACHE_VERSION = 1
+"""Version of the index cache files, bumped when the format changes."""
+
 
 class BaseIndexData(BaseModel):
     """Base data structure for indexing simulation or task-related information."""  # noqa: E501
@@ -88,6 +94,21 @@ class BaseLmdbManipulationDataset(Dataset):
             access. Default: False.
         encoding_mode (str): Encoding mode of keys from LMDB.
             Default: "utf-8".
+        read_timeout (Optional[float]): If set, reading one sample raises
+            :class:`TimeoutError` after this number of seconds. The timer
+            is armed once per sample with :class:`ReadWatchdog` and only
+            works in the main thread of each process. Default: None.
+        zero_copy (bool): If True, arrays of records stored in the typed
+            format are read-only views on the memory maps of the LMDBs
+            instead of copies. They must not be used after the LMDBs are
+            closed, e.g. when the dataset is pickled. Default: False.
+        index_cache_dir (Optional[str]): If set, the validated index of
+            each LMDB is compiled once into a compact array file in this
+            directory, keyed by the path and the stat of the index LMDB,
+            and later constructions, e.g. in each DataLoader worker, load
+            it with mmap instead of validating all index entries again.
+            Subclasses that override :meth:`_check_valid` always validate
+            all entries. Default: None.
     """
 
     def __init__(
@@ -101,6 +122,9 @@ class BaseLmdbManipulationDataset(Dataset):
         num_episode: Optional[int] = None,
         lazy_init: bool = False,
         encoding_mode: str = "utf-8",
+        read_timeout: Optional[float] = None,
+        zero_copy: bool = False,
+        index_cache_dir: Optional[str] = None,
     ):
         if not isinstance(paths, (list, tuple)):
             paths = [paths]
@@ -112,6 +136,11 @@ class BaseLmdbManipulationDataset(Dataset):
         self.task_names = task_names
         self.num_episode_ = num_episode
         self.encoding_mode = encoding_mode
+        self.zero_copy = zero_copy
+        self.index_cache_dir = index_cache_dir
+        self.read_watchdog = (
+            ReadWatchdog(read_timeout) if read_timeout is not None else None
+        )
         self.initialized = False
         if not lazy_init:
             self._init_lmdb()
@@ -129,6 +158,7 @@ class BaseLmdbManipulationDataset(Dataset):
                 uri=os.path.join(path, "meta"),
                 writable=False,
                 encoding_mode=self.encoding_mode,
+                zero_copy=self.zero_copy,
             )
             for path in self.paths
         ]
@@ -137,6 +167,7 @@ class BaseLmdbManipulationDataset(Dataset):
                 uri=os.path.join(path, "index"),
                 writable=False,
                 encoding_mode=self.encoding_mode,
+                zero_copy=self.zero_copy,
             )
             for path in self.paths
         ]
@@ -146,6 +177,7 @@ class BaseLmdbManipulationDataset(Dataset):
                     uri=os.path.join(path, "image"),
                     writable=False,
                     encoding_mode=self.encoding_mode,
+                    zero_copy=self.zero_copy,
                 )
                 for path in self.paths
             ]
@@ -155,30 +187,40 @@ class BaseLmdbManipulationDataset(Dataset):
                     uri=os.path.join(path, "depth"),
                     writable=False,
                     encoding_mode=self.encoding_mode,
+                    zero_copy=self.zero_copy,
                 )
                 for path in self.paths
             ]
 
+        custom_check = (
+            type(self)._check_valid
+            is not BaseLmdbManipulationDataset._check_valid
+        )
         lmdb_indices = []
         episode_indices = []
         num_steps = []
-        current_num_episode = 0
-        for i, idx_lmdb in enumerate(self.idx_lmdbs):
-            for episode_idx in idx_lmdb.keys():
-                if episode_idx == "__len__":
-                    continue
-                data = BaseIndexData.model_validate(idx_lmdb.get(episode_idx))
-
-                if (self._check_valid(data)) and (
-                    self.num_episode_ is None
-                    or current_num_episode < self.num_episode_
-                ):
-                    lmdb_indices.append(i)
-                    episode_indices.append(episode_idx)
-                    num_steps.append(data.num_steps)
-                    current_num_episode += 1
-
-        self.lmdb_indices = lmdb_indices
+        for i, (path, idx_lmdb) in enumerate(
+            zip(self.paths, self.idx_lmdbs, strict=True)
+        ):
+            if custom_check:
+                index = self._compile_index(idx_lmdb, check_valid=True)
+            else:
+                index = self._load_index(path, idx_lmdb)
+                if self.task_names is not None:
+                    task_names = [
+                        x.encode(self.encoding_mode)
+                        for x in as_sequence(self.task_names)
+                    ]
+                    index = index[np.isin(index["task_name"], task_names)]
+            if self.num_episode_ is not None:
+                index = index[: self.num_episode_ - len(num_steps)]
+            lmdb_indices.append(np.full(len(index), i))
+            episode_indices.extend(
+                x.decode(self.encoding_mode) for x in index["episode"]
+            )
+            num_steps.extend(index["num_steps"].tolist())
+
+        self.lmdb_indices = np.concatenate(lmdb_indices).tolist()
         self.episode_indices = episode_indices
         self.num_steps = np.array(num_steps)
         self.cumsum_steps = np.cumsum(num_steps)
@@ -189,6 +231,78 @@ class BaseLmdbManipulationDataset(Dataset):
             f"number of episode: {self.num_episode}"
         )
 
+    def _compile_index(
+        self, idx_lmdb: Lmdb, check_valid: bool = False
+    ) -> np.ndarray:
+        """Validate all entries of an index LMDB into a structured array.
+
+        Args:
+            idx_lmdb (Lmdb): The index LMDB.
+            check_valid (bool): Whether to filter the entries by
+                :meth:`_check_valid`. Default: False.
+
+        Returns:
+            np.ndarray: The array with fields `episode`, the encoded key of
+            the entry, `task_name` and `num_steps`.
+        """
+        episodes = []
+        task_names = []
+        num_steps = []
+        for episode_idx in idx_lmdb.keys():
+            if episode_idx == "__len__":
+                continue
+            data = BaseIndexData.model_validate(idx_lmdb.get(episode_idx))
+            if check_valid and not self._check_valid(data):
+                continue
+            episodes.append(str(episode_idx).encode(self.encoding_mode))
+            task_names.append(data.task_name.encode(self.encoding_mode))
+            num_steps.append(data.num_steps)
+        dtype = [
+            ("episode", f"S{max(map(len, episodes), default=1)}"),
+            ("task_name", f"S{max(map(len, task_names), default=1)}"),
+            ("num_steps", "<i8"),
+        ]
+        return np.array(
+            list(zip(episodes, task_names, num_steps, strict=True)),
+            dtype=dtype,
+        )
+
+    def _load_index(self, path: str, idx_lmdb: Lmdb) -> np.ndarray:
+        """Load the compiled index of an LMDB from the cache if possible.
+
+        The index is compiled by :meth:`_compile_index` and saved to
+        :attr:`index_cache_dir` on cache miss.
+        """
+        if self.index_cache_dir is None:
+            return self._compile_index(idx_lmdb)
+        if idx_lmdb.txn is None:
+            idx_lmdb._create_txn()
+        cache_key = json.dumps(
+            [
+                INDEX_CACHE_VERSION,
+                os.path.abspath(path),
+                self.encoding_mode,
+                idx_lmdb.txn.stat(),
+                idx_lmdb.env.info()["last_txnid"],
+            ],
+            sort_keys=True,
+        )
+        cache_file = os.path.join(
+            self.index_cache_dir,
+            hashlib.md5(cache_key.encode()).hexdigest() + ".npy",
+        )
+        if os.path.exists(cache_file):
+            return np.load(cache_file, mmap_mode="r")
+
+        index = self._compile_index(idx_lmdb)
+        os.makedirs(self.index_cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, index)
+        os.replace(tmp_file, cache_file)
+        logger.info(f"save index cache of {path} to {cache_file}")
+        return index
+
     def __len__(self):
         if not self.initialized:
             self._init_lmdb()
@@ -214,6 +328,14 @@ class BaseLmdbManipulationDataset(Dataset):
         episode_index = self.episode_indices[episode_index]
         return lmdb_index, episode_index, step_index
 
+    def _watch_read(self, index):
+        """Return the context to read the sample of index in."""
+        if self.read_watchdog is None:
+            return contextlib.nullcontext()
+        return self.read_watchdog.watch(
+            f"reading sample {index} from {self.paths}"
+        )
+
     def __getitem__(self, index):
         """Get data dict by index.
 
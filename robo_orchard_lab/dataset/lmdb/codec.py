@@ -0,0 +1,248 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Typed value codec for LMDB records.
+
+A typed value starts with :data:`TYPED_VALUE_MAGIC`, followed by one
+encoded item. Each item is a one byte tag and its payload, with all
+integers in little endian:
+
+.. code-block:: text
+
+    N: ndarray  u8 len, dtype descr, u8 ndim, u64 * ndim shape,
+                padding to 8 bytes, raw C-order buffer
+    G: numpy scalar, same layout as N with ndim 0
+    D: dict     u32 count, (u32 len, utf-8 key, item) * count
+    L: list     u32 count, item * count
+    T: tuple    u32 count, item * count
+    S: str      u32 len, utf-8 bytes
+    B: bytes    u64 len, bytes
+    I: int      i64
+    F: float    f64
+    ?: bool     u8
+    Z: None
+    P: pickle   u64 len, pickle bytes of any other object
+
+Arrays are stored as raw buffers, so decoding them does not run pickle
+and can map them on the source buffer without copy. The magic starts with
+a zero byte, which is not a valid pickle opcode, so typed values and
+pickled values can be told apart and old pickle databases stay readable.
+"""
+
+from __future__ import annotations
+import math
+import pickle
+import struct
+from typing import Any
+
+import numpy as np
+
+__all__ = [
+    "TYPED_VALUE_MAGIC",
+    "encode_value",
+    "decode_value",
+    "is_typed_value",
+]
+
+TYPED_VALUE_MAGIC = b"\x00ROL\x01"
+"""Prefix of typed values, including the format version."""
+
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+
+_DTYPES: dict[bytes, np.dtype] = {}
+"""Cache of dtypes by their descr, as parsing a descr is slow."""
+
+
+def is_typed_value(buffer: bytes | memoryview) -> bool:
+    """Whether the buffer is encoded by :func:`encode_value`."""
+    return buffer[: len(TYPED_VALUE_MAGIC)] == TYPED_VALUE_MAGIC
+
+
+def encode_value(value: Any) -> bytes:
+    """Encode a value to the typed format.
+
+    Numpy arrays, dicts with string keys, lists, tuples, strings, bytes,
+    integers, floats, booleans and None are encoded natively. Other
+    objects, including object and structured arrays, are embedded as
+    pickle.
+
+    Args:
+        value (Any): The value to encode.
+
+    Returns:
+        bytes: The encoded value.
+    """
+    chunks = [TYPED_VALUE_MAGIC]
+    _encode_item(value, chunks, len(TYPED_VALUE_MAGIC))
+    return b"".join(chunks)
+
+
+def decode_value(buffer: bytes | memoryview, copy: bool = True) -> Any:
+    """Decode a value encoded by :func:`encode_value`.
+
+    Args:
+        buffer (bytes | memoryview): The encoded value.
+        copy (bool, optional): If False, decoded arrays are read-only views
+            on `buffer` and are only valid while `buffer` is valid.
+            Otherwise each array is copied once to a writable array.
+            Default: True.
+
+    Returns:
+        Any: The decoded value.
+    """
+    if not is_typed_value(buffer):
+        raise ValueError("Buffer is not a typed value.")
+    value, _ = _decode_item(memoryview(buffer), len(TYPED_VALUE_MAGIC), copy)
+    return value
+
+
+def _encode_item(value: Any, chunks: list, offset: int) -> int:
+    """Append the encoded item to chunks and return the new offset."""
+
+    def append(data: bytes) -> None:
+        nonlocal offset
+        chunks.append(data)
+        offset += len(data)
+
+    # numpy scalars go first, as np.float64 is a subclass of float.
+    if (
+        isinstance(value, (np.ndarray, np.generic))
+        and not value.dtype.hasobject
+        and value.dtype.fields is None
+    ):
+        if isinstance(value, np.ndarray):
+            array = np.ascontiguousarray(value)
+        else:
+            array = np.asarray(value)
+        descr = array.dtype.str.encode("ascii")
+        header = [
+            b"N" if isinstance(value, np.ndarray) else b"G",
+            _U8.pack(len(descr)),
+            descr,
+            _U8.pack(array.ndim),
+        ]
+        header.extend(_U64.pack(dim) for dim in array.shape)
+        append(b"".join(header))
+        append(b"\x00" * (-offset % 8))
+        append(array.tobytes())
+    elif value is None:
+        append(b"Z")
+    elif isinstance(value, bool):
+        append(b"?" + _U8.pack(value))
+    elif isinstance(value, int) and _INT64_MIN <= value <= _INT64_MAX:
+        append(b"I" + _I64.pack(value))
+    elif isinstance(value, float):
+        append(b"F" + _F64.pack(value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        append(b"S" + _U32.pack(len(data)))
+        append(data)
+    elif isinstance(value, bytes):
+        append(b"B" + _U64.pack(len(value)))
+        append(value)
+    elif isinstance(value, dict) and all(isinstance(k, str) for k in value):
+        append(b"D" + _U32.pack(len(value)))
+        for k, v in value.items():
+            key = k.encode("utf-8")
+            append(_U32.pack(len(key)))
+            append(key)
+            offset = _encode_item(v, chunks, offset)
+    elif isinstance(value, (list, tuple)):
+        append((b"L" if isinstance(value, list) else b"T"))
+        append(_U32.pack(len(value)))
+        for v in value:
+            offset = _encode_item(v, chunks, offset)
+    else:
+        data = pickle.dumps(value, protocol=4)
+        append(b"P" + _U64.pack(len(data)))
+        append(data)
+    return offset
+
+
+def _decode_item(
+    buffer: memoryview, offset: int, copy: bool
+) -> tuple[Any, int]:
+    """Decode the item at offset and return it with the next offset."""
+    tag = buffer[offset]
+    offset += 1
+    if tag == 0x4E or tag == 0x47:  # N, G
+        descr_len = buffer[offset]
+        descr = buffer[offset + 1 : offset + 1 + descr_len].tobytes()
+        dtype = _DTYPES.get(descr)
+        if dtype is None:
+            dtype = _DTYPES.setdefault(descr, np.dtype(descr))
+        offset += 1 + descr_len
+        ndim = buffer[offset]
+        shape = struct.unpack_from(f"<{ndim}Q", buffer, offset + 1)
+        offset += 1 + 8 * ndim
+        offset += -offset % 8
+        count = math.prod(shape)
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+        if copy:
+            array = array.copy()
+        if tag == 0x47:
+            return array[0], offset
+        return array.reshape(shape), offset
+    elif tag == 0x44:  # D
+        (count,) = _U32.unpack_from(buffer, offset)
+        offset += 4
+        ret = {}
+        for _ in range(count):
+            (length,) = _U32.unpack_from(buffer, offset)
+            offset += 4
+            key = str(buffer[offset : offset + length], "utf-8")
+            offset += length
+            ret[key], offset = _decode_item(buffer, offset, copy)
+        return ret, offset
+    elif tag == 0x4C or tag == 0x54:  # L, T
+        (count,) = _U32.unpack_from(buffer, offset)
+        offset += 4
+        items = []
+        for _ in range(count):
+            item, offset = _decode_item(buffer, offset, copy)
+            items.append(item)
+        return (items if tag == 0x4C else tuple(items)), offset
+    elif tag == 0x53:  # S
+        (length,) = _U32.unpack_from(buffer, offset)
+        offset += 4
+        data = str(buffer[offset : offset + length], "utf-8")
+        return data, offset + length
+    elif tag == 0x49:  # I
+        return _I64.unpack_from(buffer, offset)[0], offset + 8
+    elif tag == 0x46:  # F
+        return _F64.unpack_from(buffer, offset)[0], offset + 8
+    elif tag == 0x5A:  # Z
+        return None, offset
+    elif tag == 0x3F:  # ?
+        return buffer[offset] != 0, offset + 1
+    elif tag == 0x42:  # B
+        (length,) = _U64.unpack_from(buffer, offset)
+        offset += 8
+        return buffer[offset : offset + length].tobytes(), offset + length
+    elif tag == 0x50:  # P
+        (length,) = _U64.unpack_from(buffer, offset)
+        offset += 8
+        data = pickle.loads(buffer[offset : offset + length])
+        return data, offset + length
+    raise ValueError(f"Unknown typed value tag {tag!r} at {offset - 1}.")
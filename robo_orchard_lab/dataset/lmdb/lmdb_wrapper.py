@@ -16,14 +16,66 @@
 
 import logging
 import pickle
-from typing import Union
+import signal
+import threading
+from contextlib import contextmanager
+from typing import List, Sequence, Union
 
 import lmdb
-from timeout_decorator import TimeoutError, timeout
+import timeout_decorator
+
+from robo_orchard_lab.dataset.lmdb.codec import (
+    decode_value,
+    encode_value,
+    is_typed_value,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class ReadWatchdog(object):
+    """Watchdog that raises :class:`TimeoutError` if reading takes too long.
+
+    Instead of guarding every key fetch, the watchdog arms a ``SIGALRM``
+    timer once for a whole block of reads, e.g. all reads of one sample.
+    Signals can only be handled in the main thread, so the watchdog does
+    nothing when used in other threads.
+
+    Args:
+        seconds: Timeout of one block of reads in seconds.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    @contextmanager
+    def watch(self, description: str):
+        """Watch the reads in the context.
+
+        Args:
+            description: Description of the reads used in the error log.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        def _handler(signum, frame):
+            raise TimeoutError(
+                f"Time out after {self.seconds} seconds when {description}"
+            )
+
+        previous = signal.signal(signal.SIGALRM, _handler)
+        signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        try:
+            yield
+        except TimeoutError as exception:
+            logger.error(str(exception))
+            raise exception
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
 class Lmdb(object):
     """Abstact class of LMDB, which include all operators.
 
@@ -35,6 +87,14 @@ class Lmdb(object):
             Maximum size database may grow to, used to size the memory mapping.
             If map_size is None, map_size will set to 10M while reading,
             set to 1T while writing.
+        encoding_mode: Encoding mode of keys.
+        value_format: Format to write values with, either "pickle" or
+            "typed" for the typed codec in
+            :mod:`robo_orchard_lab.dataset.lmdb.codec`. Values of both
+            formats can always be read.
+        zero_copy: If True, arrays of typed values are read-only views on
+            the memory map of a read-only LMDB instead of copies. They are
+            only valid until the LMDB is closed.
         kwargs: Kwargs for open lmdb file.
     """
 
@@ -45,8 +105,11 @@ class Lmdb(object):
         commit_step: int = 1,
         map_size: int = None,
         encoding_mode: str = "utf-8",
+        value_format: str = "pickle",
+        zero_copy: bool = False,
         **kwargs,
     ):
+        assert value_format in ["pickle", "typed"]
         self.uri = uri
         self.writable = writable
         self.kwargs = kwargs
@@ -66,6 +129,8 @@ class Lmdb(object):
             # set map_size to 1T while writing.
             if self.kwargs.get("map_size") is None:
                 self.kwargs["map_size"] = 1024**4
+        self.value_format = value_format
+        self.zero_copy = zero_copy and not writable
         # LMDB env
         self.env = None
         self.txn = None
@@ -80,16 +145,8 @@ class Lmdb(object):
     def read(self, idx: Union[int, str]) -> bytes:
         """Read data by idx."""
         idx = "{}".format(idx).encode(self.encoding_mode)
-        try:
-            return self.get(idx)
-        except TimeoutError as exception:
-            logger.error(
-                f"Time out when reading data with index of "
-                f"{idx} from {self.uri}"
-            )
-            raise exception
+        return self.get(idx)
 
-    @timeout(seconds=1800)
     def get(self, idx: Union[int, str]) -> bytes:
         if not isinstance(idx, bytes):
             idx = "{}".format(idx).encode(self.encoding_mode)
@@ -97,9 +154,51 @@ class Lmdb(object):
             self._create_txn()
         data = self.txn.get(idx)
         if data is not None:
-            return pickle.loads(data)
+            return self._loads(data)
         return None
 
+    def get_multi(
+        self,
+        idxs: Sequence[Union[int, str, bytes]],
+        use_getmulti: bool = True,
+    ) -> List:
+        """Read data of multiple keys in one transaction.
+
+        Args:
+            idxs: The keys to read.
+            use_getmulti: If True, all keys are fetched by one call of
+                the cursor `getmulti`. Otherwise they are fetched one by one
+                from the same transaction.
+
+        Returns:
+            The data of each key in the same order as `idxs`, None for
+            keys that do not exist.
+        """
+        keys = [
+            idx
+            if isinstance(idx, bytes)
+            else "{}".format(idx).encode(self.encoding_mode)
+            for idx in idxs
+        ]
+        if self.txn is None:
+            self._create_txn()
+        if use_getmulti:
+            with self.txn.cursor() as cursor:
+                found = dict(cursor.getmulti(keys))
+            values = [found.get(key) for key in keys]
+        else:
+            values = [self.txn.get(key) for key in keys]
+        return [
+            self._loads(value) if value is not None else None
+            for value in values
+        ]
+
+    def _loads(self, data: Union[bytes, memoryview]):
+        """Decode a stored value of either format."""
+        if is_typed_value(data):
+            return decode_value(data, copy=not self.zero_copy)
+        return pickle.loads(data)
+
     def __getitem__(self, idx: Union[int, str]) -> bytes:
         return self.get(idx)
 
@@ -109,14 +208,17 @@ class Lmdb(object):
             self.open()
         if self.txn is None:
             self._create_txn()
-        record = pickle.dumps(record, protocol=4)
+        if self.value_format == "typed":
+            record = encode_value(record)
+        else:
+            record = pickle.dumps(record, protocol=4)
         self.txn.put("{}".format(idx).encode(self.encoding_mode), record)
         self.put_idx += 1
         if (self.put_idx % self.commit_step == 0) or commit:
             self.txn.commit()
             self.txn = self.env.begin(write=self.writable)
 
-    @timeout(seconds=1800)
+    @timeout_decorator.timeout(seconds=1800)
     def open_lmdb(self):
         return lmdb.open(self.uri, **self.kwargs)
 
@@ -125,7 +227,7 @@ class Lmdb(object):
         if self.env is None:
             try:
                 self.env = self.open_lmdb()
-            except TimeoutError as exception:
+            except timeout_decorator.TimeoutError as exception:
                 logger.error(f"Time out when opening {self.uri}")
                 raise exception
 
@@ -134,7 +236,9 @@ class Lmdb(object):
         if self.env is None:
             self.open()
         if self.txn is None:
-            self.txn = self.env.begin(write=self.writable)
+            self.txn = self.env.begin(
+                write=self.writable, buffers=self.zero_copy
+            )
 
     def close(self):
         """Close lmdb file."""
@@ -166,7 +270,7 @@ class Lmdb(object):
             # traversal may be slow while too much keys
             keys = []
             for key, _value in self.txn.cursor():
-                keys.append(key.decode(self.encoding_mode))
+                keys.append(bytes(key).decode(self.encoding_mode))
             return keys
 
     def __len__(self):
@@ -49,6 +49,7 @@ from . import db_orm
 from .columns import *
 from .dataset import *
 from .engine import *
+from .episode_sampler import *
 from .packaging import *
 from .re_packing import *
 from .row_sampler import *
@@ -15,8 +15,10 @@
 # permissions and limitations under the License.
 from __future__ import annotations
 import bisect
+import functools
 import json
 import os
+from collections import OrderedDict
 from contextlib import contextmanager
 from typing import (
     Any,
@@ -29,18 +31,24 @@ from typing import (
 )
 
 import fsspec
+import pyarrow as pa
 import torch
 from datasets import (
     Dataset as HFDataset,
     Features,
+    config as hg_datasets_config,
 )
 from datasets.arrow_dataset import Column
+from datasets.formatting import query_table
 from sqlalchemy import URL, Engine, select
 from sqlalchemy.orm import Session, make_transient
 from typing_extensions import Self
 
 # import all datatypes and features
 from robo_orchard_lab.dataset.datatypes import *  # noqa: F403,F401
+from robo_orchard_lab.dataset.datatypes.hg_features import (
+    decode_arrow_column,
+)
 from robo_orchard_lab.dataset.robot.columns import (
     PreservedIndexColumnsKeys,
 )
@@ -53,11 +61,18 @@ from robo_orchard_lab.dataset.robot.db_orm import (
 from robo_orchard_lab.dataset.robot.engine import create_engine
 from robo_orchard_lab.dataset.robot.row_sampler import (
     CachedIndexDataset,
+    EpisodeBoundaryTable,
+    EpisodeTimestampIndex,
     MultiRowSampler,
     MultiRowSamplerConfig,
 )
 
-__all__ = ["RODataset", "ROMultiRowDataset", "ConcatRODataset"]
+__all__ = [
+    "RODataset",
+    "ROMultiRowDataset",
+    "ConcatRODataset",
+    "ColumnarBatch",
+]
 
 MetaType = TypeVar("MetaType", Episode, Instruction, Robot, Task)
 """A type variable for metadata types in the RoboOrchard dataset."""
@@ -66,6 +81,191 @@ MetaIndexKeyType = Literal[
 ]
 TorchDataset: TypeAlias = torch.utils.data.Dataset
 
+_META_INDEX_KEY2TYPE: dict[str, type] = {
+    "episode_index": Episode,
+    "task_index": Task,
+    "robot_index": Robot,
+    "instruction_index": Instruction,
+}
+
+
+class MetaCache:
+    """A bounded LRU cache for metadata objects.
+
+    The cached objects are keyed by their metadata type and index. The
+    metadata tables are read-only, so the cached objects never become stale.
+
+    Args:
+        max_size (int | None): The maximum number of cached objects for
+            all metadata types. If None, the cache is unbounded. If 0,
+            nothing is cached.
+    """
+
+    def __init__(self, max_size: int | None):
+        self.max_size = max_size
+        self._cache: OrderedDict[tuple[type, int], Any] = OrderedDict()
+        self._complete_types: set[type] = set()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, meta_type: type[MetaType], index: int) -> MetaType | None:
+        """Get a cached object. Returns None on cache miss."""
+        key = (meta_type, index)
+        ret = self._cache.get(key, None)
+        if ret is not None and self.max_size is not None:
+            self._cache.move_to_end(key)
+        return ret
+
+    def put(self, meta_type: type[MetaType], index: int, meta: MetaType):
+        """Add an object to the cache, evicting the least recently used."""
+        if self.max_size == 0:
+            return
+        key = (meta_type, index)
+        self._cache[key] = meta
+        if self.max_size is not None:
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def is_complete(self, meta_type: type) -> bool:
+        """Whether all objects of the type are in the cache.
+
+        For complete types, a cache miss means that the object does not
+        exist in the database.
+        """
+        return meta_type in self._complete_types
+
+    def set_complete(self, meta_type: type):
+        self._complete_types.add(meta_type)
+
+    def clear(self):
+        self._cache.clear()
+        self._complete_types.clear()
+
+
+def _get_decoded_batch(
+    dataset: HFDataset, index: slice | list[int]
+) -> dict[str, list]:
+    """Get a batch of rows from a Hugging Face dataset as a dict of columns.
+
+    This is the same as `dataset[index]` for unformatted datasets, but
+    decodes each column as a whole with :func:`decode_arrow_column`, so
+    that features supporting batch decoding are decoded from the arrow
+    buffers directly.
+    """
+    if dataset._format_type is not None or dataset._format_columns is not None:
+        return dataset[index]
+    table = query_table(dataset._data, index, indices=dataset._indices)
+    features = dataset.features
+    return {
+        name: decode_arrow_column(features[name], table.column(name))
+        for name in table.column_names
+    }
+
+
+class ColumnarBatch:
+    """A column-major batch of rows backed by an arrow table.
+
+    Each column is decoded as a whole on first access and then cached.
+    Columns that are never accessed are never decoded, so batch transforms
+    that drop columns with `del` or :meth:`discard`, or replace them,
+    avoid the decoding cost entirely. :meth:`pop` returns the decoded
+    values, so it decodes the column.
+
+    Columns can be given as decoded lists, or as loaders that return the
+    decoded list when called.
+
+    Args:
+        columns (dict[str, list | Callable[[], list]]): The columns of the
+            batch, in the order of the rows' keys.
+        num_rows (int): The number of rows in the batch.
+        table (pa.Table | None, optional): The arrow table that the batch
+            is created from. Batch-aware transforms can read raw arrow
+            columns from it. Defaults to None.
+
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, list | Callable[[], list]],
+        num_rows: int,
+        table: pa.Table | None = None,
+    ):
+        self._columns = dict(columns)
+        self._num_rows = num_rows
+        self.table = table
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    @property
+    def num_rows(self) -> int:
+        return self._num_rows
+
+    @property
+    def column_names(self) -> list[str]:
+        return list(self._columns.keys())
+
+    def keys(self):
+        return self._columns.keys()
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._columns
+
+    def __getitem__(self, column: str) -> list:
+        """Get the decoded values of a column."""
+        ret = self._columns[column]
+        if callable(ret):
+            ret = ret()
+            self._columns[column] = ret
+        return ret
+
+    def __setitem__(self, column: str, values: list):
+        if len(values) != self._num_rows:
+            raise ValueError(
+                f"Column {column} has {len(values)} values, "
+                f"but the batch has {self._num_rows} rows."
+            )
+        self._columns[column] = values
+
+    def set_column_loader(self, column: str, loader: Callable[[], list]):
+        """Set a column that is loaded lazily on first access."""
+        self._columns[column] = loader
+
+    def __delitem__(self, column: str):
+        del self._columns[column]
+
+    def pop(self, column: str) -> list:
+        """Remove a column and return its decoded values."""
+        ret = self[column]
+        del self._columns[column]
+        return ret
+
+    def discard(self, column: str) -> None:
+        """Remove a column if present, without decoding it."""
+        self._columns.pop(column, None)
+
+    def to_dict(self) -> dict[str, list]:
+        """Decode all columns and return a dict of columns."""
+        return {k: self[k] for k in self.keys()}
+
+    def to_rows(self) -> list[dict]:
+        """Decode all columns and return a list of row dicts."""
+        columns = self.to_dict()
+        return [
+            {col: values[i] for col, values in columns.items()}
+            for i in range(self._num_rows)
+        ]
+
+
+ColumnarBatchTransform: TypeAlias = Callable[[ColumnarBatch], Any]
+"""A transform that receives a :class:`ColumnarBatch`.
+
+It can return a :class:`ColumnarBatch` or a list of row dicts. Any other
+returned object is treated as an already collated batch.
+"""
+
 
 class RODataset(TorchDataset):
     """The RoboOrchard dataset for robot data.
@@ -86,6 +286,14 @@ class RODataset(TorchDataset):
             If True, the `episode`, `task`, `robot`, and `instruction` fields
             will be added and the corresponding index fields will be removed.
             Defaults to False.
+        meta_cache_size (int, optional): The maximum number of metadata
+            objects cached by each process. The metadata objects are shared
+            by all rows that reference them, so they should not be
+            modified in place. Set to 0 to disable caching. Defaults to 4096.
+        preload_meta (bool, optional): Whether to load all episode, task,
+            robot and instruction metadata into memory on first access. This
+            removes all database round-trips afterwards but the cache is not
+            bounded by `meta_cache_size`. Defaults to False.
 
     """
 
@@ -116,6 +324,8 @@ class RODataset(TorchDataset):
         dataset_path: str,
         storage_options: dict | None = None,
         meta_index2meta: bool = False,
+        meta_cache_size: int = 4096,
+        preload_meta: bool = False,
     ):
         dataset_path = os.path.expanduser(dataset_path)
         self.frame_dataset = HFDataset.load_from_disk(
@@ -126,8 +336,6 @@ class RODataset(TorchDataset):
         )
         self.meta_index2meta = meta_index2meta
         # recover state dict
-        from datasets import config as hg_datasets_config
-
         state_file = os.path.join(
             dataset_path, hg_datasets_config.DATASET_STATE_JSON_FILENAME
         )
@@ -137,8 +345,13 @@ class RODataset(TorchDataset):
         )
         # load db
         self.db_engine = self._load_db(dataset_path)
+        self._preload_meta = preload_meta
+        self._meta_cache = MetaCache(
+            max_size=None if preload_meta else meta_cache_size
+        )
 
         self._transform: Callable[[dict], dict] | None = None
+        self._batch_transform: ColumnarBatchTransform | None = None
 
     def __repr__(self) -> str:
         # ret = "RODataset(num_rows={})".format(len(self))
@@ -172,6 +385,8 @@ class RODataset(TorchDataset):
         # remove db_engine from state to avoid pickling issues
         engine: Engine = state.pop("db_engine")
         state["db_engine_url"] = engine.url
+        # each process keeps its own metadata cache
+        state["_meta_cache"] = MetaCache(max_size=self._meta_cache.max_size)
         return state
 
     def __setstate__(self, state: dict):
@@ -189,6 +404,18 @@ class RODataset(TorchDataset):
         db_candidate = [
             f for f in file_list if os.path.basename(f).startswith("meta_db.")
         ]
+        # the old meta db kept by an append until it is committed.
+        db_backup = [f for f in db_candidate if f.endswith(".bak")]
+        db_candidate = [f for f in db_candidate if not f.endswith(".bak")]
+        state_tmp_path = os.path.join(
+            dataset_path, hg_datasets_config.DATASET_STATE_JSON_FILENAME
+        )
+        if len(db_backup) > 0 and fs.exists(state_tmp_path + ".tmp"):
+            raise ValueError(
+                f"An append to {dataset_path} was interrupted, and the meta "
+                "db does not match the frames. Please recover it with "
+                "`DatasetPackaging.recover_append` first."
+            )
         if len(db_candidate) == 0:
             raise ValueError(
                 f"No meta db file found in {dataset_path}. "
@@ -237,6 +464,27 @@ class RODataset(TorchDataset):
         finally:
             self.set_transform(old_transform)
 
+    @property
+    def batch_transform(self) -> ColumnarBatchTransform | None:
+        return self.__dict__.get("_batch_transform", None)
+
+    def set_batch_transform(self, transform: ColumnarBatchTransform | None):
+        """Set a batch transform and enable the columnar batch mode.
+
+        In columnar batch mode, :meth:`__getitems__` fetches the batch as
+        one arrow table and passes it to the batch transform as a
+        :class:`ColumnarBatch`, which decodes whole columns at once and only
+        when they are accessed. Per-row dicts are built after the batch
+        transform only if it returns a :class:`ColumnarBatch`, and the
+        row transform set by :meth:`set_transform` is then applied to each
+        row.
+
+        Args:
+            transform (ColumnarBatchTransform | None): The batch transform.
+                If None, the columnar batch mode is disabled.
+        """
+        self._batch_transform = transform
+
     def rename_columns(
         self,
         column_mapping: dict[str, str],
@@ -506,7 +754,10 @@ class RODataset(TorchDataset):
                 Otherwise, returns a dict with the frame data.
         """
 
-        ret: dict | list = self.frame_dataset[index]
+        if isinstance(index, (slice, list)):
+            ret: dict | list = _get_decoded_batch(self.frame_dataset, index)
+        else:
+            ret = self.frame_dataset[index]
         if self.meta_index2meta:
             if isinstance(ret, dict):
                 ret = self.convert_meta_index2meta(data=ret)
@@ -587,7 +838,9 @@ class RODataset(TorchDataset):
 
         This method retrieves metadata from the database using index.
         Possible metadata types include `Episode`, `Instruction`, `Robot`,
-        and `Task`.
+        and `Task`. Retrieved objects are kept in a bounded cache, and
+        only the indices missing from the cache are queried, with one
+        query for a list of indices.
 
         Args:
             meta_type (type[MetaType]): The type of metadata to retrieve.
@@ -603,31 +856,58 @@ class RODataset(TorchDataset):
         if index is None:
             return None
 
+        self._try_preload_meta()
+        cache = self._meta_cache
         if isinstance(index, (list, Column)):
             # get all not None value
             non_none_index = set([i for i in index if i is not None])
             if len(non_none_index) == 0:
                 return [None for _ in index]
-            # If index is a list, retrieve multiple metadata objects
-            stmt = select(meta_type).where(meta_type.index.in_(non_none_index))
-            with Session(self.db_engine) as session:
-                ret = session.scalars(stmt).all()
-                # make transient to avoid session issues
-                for item in ret:
-                    make_transient(item)
-                # fill None for missing indices
-                ret_dict: dict[int | None, Any] = {
-                    item.index: item for item in ret
-                }
-                ret_dict[None] = None
-                return [ret_dict.get(i, None) for i in index]
+            ret_dict: dict[int | None, Any] = {None: None}
+            missing_index = []
+            for i in non_none_index:
+                cached = cache.get(meta_type, i)
+                if cached is None:
+                    missing_index.append(i)
+                else:
+                    ret_dict[i] = cached
+            if len(missing_index) > 0 and not cache.is_complete(meta_type):
+                # retrieve all missing metadata objects in one query
+                stmt = select(meta_type).where(
+                    meta_type.index.in_(missing_index)
+                )
+                with Session(self.db_engine) as session:
+                    ret = session.scalars(stmt).all()
+                    # make transient to avoid session issues
+                    for item in ret:
+                        make_transient(item)
+                        cache.put(meta_type, item.index, item)
+                        ret_dict[item.index] = item
+            # fill None for missing indices
+            return [ret_dict.get(i, None) for i in index]
         else:
+            ret = cache.get(meta_type, index)
+            if ret is not None or cache.is_complete(meta_type):
+                return ret
             with Session(self.db_engine) as session:
                 ret = session.get(meta_type, index)
                 if ret is not None:
                     make_transient(ret)
+                    cache.put(meta_type, index, ret)
                 return ret
 
+    def _try_preload_meta(self) -> None:
+        """Load all metadata into the cache if `preload_meta` is enabled."""
+        if not self._preload_meta:
+            return
+        cache = self._meta_cache
+        for meta_type in (Episode, Task, Robot, Instruction):
+            if cache.is_complete(meta_type):
+                continue
+            for meta in self.iterate_meta(meta_type, ordered=False):
+                cache.put(meta_type, meta.index, meta)
+            cache.set_complete(meta_type)
+
     def iterate_meta(
         self,
         meta_type: type[MetaType],
@@ -668,6 +948,9 @@ class RODataset(TorchDataset):
             keys (list[int]): A list of indices to retrieve from the dataset.
 
         """
+        if self.batch_transform is not None:
+            return self._getitems_columnar(keys)
+
         batch = self.__getitem_no_transform__(keys)
         n_examples = len(batch[next(iter(batch))])
         if self._transform is not None:
@@ -684,6 +967,59 @@ class RODataset(TorchDataset):
             ]
         return ret
 
+    def get_columnar_batch(self, keys: list[int]) -> ColumnarBatch:
+        """Get a batch as a :class:`ColumnarBatch` without decoding.
+
+        The rows are fetched as one arrow table. Each column is decoded as
+        a whole when it is accessed for the first time. Tensors decoded as
+        numpy arrays are read-only views of the arrow buffers, which must
+        be copied before modifying them in place. If
+        `meta_index2meta` is True, the index-based metadata columns are
+        replaced by metadata columns which are retrieved with one query
+        per metadata type.
+
+        Args:
+            keys (list[int]): A list of indices to retrieve from the dataset.
+        """
+        table = query_table(
+            self.frame_dataset._data,
+            keys,
+            indices=self.frame_dataset._indices,
+        )
+        features = self.frame_dataset.features
+        meta_keys = _META_INDEX_KEY2TYPE if self.meta_index2meta else {}
+        columns: dict[str, list | Callable[[], list]] = {}
+        for name in table.column_names:
+            if name in meta_keys:
+                continue
+            columns[name] = functools.partial(
+                decode_arrow_column,
+                features[name],
+                table.column(name),
+                zero_copy=True,
+            )
+        # keep the same column order as `_meta_index2meta`
+        for name, meta_type in meta_keys.items():
+            if name in table.column_names:
+                columns[name[: -len("_index")]] = functools.partial(
+                    self.get_meta, meta_type, table.column(name).to_pylist()
+                )
+        return ColumnarBatch(columns, num_rows=table.num_rows, table=table)
+
+    def _getitems_columnar(self, keys: list[int]) -> Any:
+        """Get a batch in columnar batch mode."""
+        batch = self.get_columnar_batch(keys)
+        assert self.batch_transform is not None
+        ret = self.batch_transform(batch)
+        if isinstance(ret, ColumnarBatch):
+            ret = ret.to_rows()
+        elif not isinstance(ret, list):
+            # already collated by the batch transform.
+            return ret
+        if self._transform is not None:
+            ret = [self._transform(row) for row in ret]
+        return ret
+
 
 class ROMultiRowDataset(RODataset):
     """A dataset that returns multiple rows for each index.
@@ -708,6 +1044,10 @@ class ROMultiRowDataset(RODataset):
         meta_index2meta (bool, optional): Whether to convert the index-based
             metadata to actual metadata objects when accessing the dataset.
             Defaults to True.
+        meta_cache_size (int, optional): The maximum number of metadata
+            objects cached by each process. Defaults to 4096.
+        preload_meta (bool, optional): Whether to load all metadata into
+            memory on first access. Defaults to False.
     """
 
     def __init__(
@@ -716,8 +1056,16 @@ class ROMultiRowDataset(RODataset):
         row_sampler: MultiRowSamplerConfig,
         storage_options: dict | None = None,
         meta_index2meta: bool = True,
+        meta_cache_size: int = 4096,
+        preload_meta: bool = False,
     ):
-        super().__init__(dataset_path, storage_options, meta_index2meta)
+        super().__init__(
+            dataset_path,
+            storage_options,
+            meta_index2meta,
+            meta_cache_size=meta_cache_size,
+            preload_meta=preload_meta,
+        )
         self._set_row_sampler(row_sampler)
 
     def _set_row_sampler(self, row_sampler: MultiRowSamplerConfig) -> None:
@@ -728,6 +1076,43 @@ class ROMultiRowDataset(RODataset):
             for col_name in self._row_sampler.column_rows_keys
         }
 
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        # The timestamp index may be memory mapped. Do not pickle it
+        # and let each worker load it from the persisted files.
+        state.pop("_timestamp_index", None)
+        return state
+
+    @property
+    def timestamp_index(self) -> EpisodeTimestampIndex:
+        """The array-backed episode/timestamp index of the index dataset.
+
+        The index is built once and persisted next to the arrow files, then
+        memory-mapped by all processes. It is rebuilt when the index dataset
+        changes, e.g. after `select`.
+        """
+        fingerprint = self.index_dataset._fingerprint
+        cached = self.__dict__.get("_timestamp_index", None)
+        if cached is None or cached[0] != fingerprint:
+            cached = (
+                fingerprint,
+                EpisodeTimestampIndex.load_or_build(self.index_dataset),
+            )
+            self._timestamp_index = cached
+        return cached[1]
+
+    @property
+    def episode_boundaries(self) -> EpisodeBoundaryTable:
+        """The episode boundaries loaded from the meta database.
+
+        The table is loaded with one query on first access and cached.
+        """
+        ret = self.__dict__.get("_episode_boundaries", None)
+        if ret is None:
+            ret = EpisodeBoundaryTable.from_db(self.db_engine)
+            self._episode_boundaries = ret
+        return ret
+
     @staticmethod
     def from_dataset(
         dataset: RODataset,
@@ -747,29 +1132,53 @@ class ROMultiRowDataset(RODataset):
         ret._set_row_sampler(row_sampler)
         return ret
 
-    def __getitem_no_transform__(self, index: int | slice | list[int]) -> dict:
-        cached_index_dataset = CachedIndexDataset(self.index_dataset)
-
-        def fast_column_get(col_name: str, idx_rows: list[int | None]):
-            col_dataset = self._column_datasets[col_name]
-            not_none_idx_rows = []
-            not_none_idx_row_pos = []
-            non_idx_row_pos = []
-            for i, idx in enumerate(idx_rows):
-                if idx is not None:
-                    not_none_idx_rows.append(idx)
-                    not_none_idx_row_pos.append(i)
-                else:
-                    non_idx_row_pos.append(i)
+    def _get_cached_index_dataset(self) -> CachedIndexDataset:
+        return CachedIndexDataset(
+            self.index_dataset,
+            timestamp_index=self.timestamp_index,
+            episode_boundaries=self.episode_boundaries,
+        )
 
-            not_none_row = col_dataset[not_none_idx_rows][col_name]
-            tmp_dict = {
-                i: val
-                for i, val in zip(
-                    not_none_idx_row_pos, not_none_row, strict=True
-                )
-            }
-            return [tmp_dict.get(i, None) for i in range(len(idx_rows))]
+    def _fast_column_get(
+        self, col_name: str, idx_rows: list[int | None]
+    ) -> list:
+        col_dataset = self._column_datasets[col_name]
+        not_none_idx_rows = []
+        not_none_idx_row_pos = []
+        for i, idx in enumerate(idx_rows):
+            if idx is not None:
+                not_none_idx_rows.append(idx)
+                not_none_idx_row_pos.append(i)
+
+        not_none_row = _get_decoded_batch(col_dataset, not_none_idx_rows)[
+            col_name
+        ]
+        tmp_dict = {
+            i: val
+            for i, val in zip(not_none_idx_row_pos, not_none_row, strict=True)
+        }
+        return [tmp_dict.get(i, None) for i in range(len(idx_rows))]
+
+    def _fast_multi_row_column_get(
+        self, col_name: str, idx_rows: list[list[int | None]]
+    ) -> list[list]:
+        """Get the multi-row values of a column for a batch of rows.
+
+        All rows of the batch are fetched with one query.
+        """
+        flattened_rows = []
+        for row in idx_rows:
+            flattened_rows.extend(row)
+        flattened_values = self._fast_column_get(col_name, flattened_rows)
+        ret = []
+        cnt = 0
+        for row in idx_rows:
+            ret.append(flattened_values[cnt : cnt + len(row)])
+            cnt += len(row)
+        return ret
+
+    def __getitem_no_transform__(self, index: int | slice | list[int]) -> dict:
+        cached_index_dataset = self._get_cached_index_dataset()
 
         if isinstance(index, int):
             cur_row = super().__getitem_no_transform__(index)
@@ -777,7 +1186,7 @@ class ROMultiRowDataset(RODataset):
             for col_name, idx_rows in self._row_sampler.sample_row_idx(
                 cached_index_dataset, index
             ).items():
-                cur_row[col_name] = fast_column_get(col_name, idx_rows)
+                cur_row[col_name] = self._fast_column_get(col_name, idx_rows)
             return cur_row
         else:
             if isinstance(index, slice):
@@ -789,36 +1198,39 @@ class ROMultiRowDataset(RODataset):
             )
             cur_rows = super().__getitem_no_transform__(index)
             # update column that needs multi-row sampling
-            new_rows = {k: [] for k in self._row_sampler.column_rows_keys}
-
-            # for cur_idx in index:
-            #     for col_name, idx_rows in self._row_sampler.sample_row_idx(
-            #         cached_index_dataset, cur_idx
-            #     ).items():
-            #         new_rows[col_name].append(
-            #             fast_column_get(col_name, idx_rows)
-            #         )
-
-            for cur_idx in index:
-                for col_name, idx_rows in self._row_sampler.sample_row_idx(
-                    cached_index_dataset, cur_idx
-                ).items():
-                    new_rows[col_name].append(idx_rows)
-
-            for k, v in new_rows.items():
-                flattened_rows = []
-                [flattened_rows.extend(row) for row in v]
-                flattened_rows = fast_column_get(k, flattened_rows)
-                cnt = 0
-                for i in range(len(v)):
-                    v[i] = flattened_rows[cnt : cnt + len(v[i])]
-                    cnt += len(v[i])
-                new_rows[k] = v
-
+            new_rows = self._row_sampler.sample_row_idx_batch(
+                cached_index_dataset, index
+            )
             for k in cur_rows:
-                cur_rows[k] = new_rows.get(k, cur_rows[k])
+                if k in new_rows:
+                    cur_rows[k] = self._fast_multi_row_column_get(
+                        k, new_rows[k]
+                    )
             return cur_rows
 
+    def get_columnar_batch(self, keys: list[int]) -> ColumnarBatch:
+        """Get a batch as a :class:`ColumnarBatch` without decoding.
+
+        Columns that need multi-row sampling are replaced by the sampled
+        values, which are fetched and decoded only when accessed.
+
+        Args:
+            keys (list[int]): A list of indices to retrieve from the dataset.
+        """
+        batch = super().get_columnar_batch(keys)
+        new_rows = self._row_sampler.sample_row_idx_batch(
+            self._get_cached_index_dataset(), keys
+        )
+        for k, idx_rows in new_rows.items():
+            if k in batch:
+                batch.set_column_loader(
+                    k,
+                    functools.partial(
+                        self._fast_multi_row_column_get, k, idx_rows
+                    ),
+                )
+        return batch
+
     def __getitem__(self, index: int | slice | list[int]) -> dict:
         ret = self.__getitem_no_transform__(index)
         if self._transform is not None:
@@ -922,6 +1334,20 @@ class ConcatRODataset(TorchDataset):
         finally:
             self.set_transform(old_transform)
 
+    @property
+    def batch_transform(self) -> ColumnarBatchTransform | None:
+        return self.datasets[0].batch_transform
+
+    def set_batch_transform(self, transform: ColumnarBatchTransform | None):
+        """Set a batch transform for all datasets.
+
+        The batch transform is applied to the rows of each dataset
+        separately, so it must return a :class:`ColumnarBatch` or a list
+        of row dicts.
+        """
+        for ds in self.datasets:
+            ds.set_batch_transform(transform)
+
     def _map_index_to_dataset(self, idx: int) -> tuple[int, int]:
         if idx < 0:
             if -idx > len(self):
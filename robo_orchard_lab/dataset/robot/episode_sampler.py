@@ -0,0 +1,459 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Samplers of RoboOrchard datasets driven by the episode metadata."""
+
+from __future__ import annotations
+from typing import Iterator, Literal
+
+import numpy as np
+import torch
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from torch.utils.data.sampler import Sampler
+
+from robo_orchard_lab.dataset.robot.dataset import RODataset
+from robo_orchard_lab.dataset.robot.db_orm import Episode, Robot, Task
+from robo_orchard_lab.dataset.robot.row_sampler import EpisodeBoundaryTable
+from robo_orchard_lab.dataset.sampler import ResumableSamplerMixin
+
+__all__ = ["EpisodeBlockShuffleSampler", "EpisodeWeightedSampler"]
+
+
+class EpisodeBlockShuffleSampler(ResumableSamplerMixin, Sampler[int]):
+    """Sampler that shuffles blocks of consecutive frames of episodes.
+
+    Fully random sampling scatters the reads over the whole arrow file,
+    which defeats the page cache and any caching of neighbouring frames.
+    This sampler keeps the locality of the reads with a two-level shuffle:
+
+    1. Each episode is split into blocks of at most `block_size`
+       consecutive frames, and the order of all blocks is shuffled.
+    2. The frames of the concatenated blocks are shuffled within
+       consecutive windows of `buffer_size` frames.
+
+    Larger blocks and smaller buffers give more locality, while smaller
+    blocks and larger buffers give more randomness. `block_size=1` is a
+    full random shuffle, and `buffer_size=1` iterates over each block in
+    order.
+
+    The sampled indices are the frame indices of the episodes in the
+    meta database, i.e., the values of the `index` column, which are also
+    the row positions of a dataset in its packaged order.
+
+    Args:
+        boundaries (EpisodeBoundaryTable): The frame boundaries of all
+            episodes. Missing episodes are ignored.
+        block_size (int): The maximum number of consecutive frames in a
+            block.
+        buffer_size (int, optional): The number of frames in each shuffle
+            window. Default: 1.
+        shuffle (bool, optional): If False, the frames are returned in the
+            order of the episodes. Default: True.
+        generator (torch.Generator, optional): Generator used in sampling.
+            Default: None.
+        seed (int, optional): If set, the order of each epoch is generated
+            from `seed + epoch` and `generator` is ignored. Default: None.
+
+    """
+
+    def __init__(
+        self,
+        boundaries: EpisodeBoundaryTable,
+        block_size: int,
+        buffer_size: int = 1,
+        shuffle: bool = True,
+        generator: torch.Generator | None = None,
+        seed: int | None = None,
+    ) -> None:
+        if block_size < 1:
+            raise ValueError(f"block_size must be >= 1, but got {block_size}")
+        if buffer_size < 1:
+            raise ValueError(
+                f"buffer_size must be >= 1, but got {buffer_size}"
+            )
+        self._init_resumable_state(seed=seed, generator=generator)
+        self.block_size = block_size
+        self.buffer_size = buffer_size
+        self.shuffle = shuffle
+
+        valid = (boundaries.begin >= 0) & (boundaries.frame_num > 0)
+        begin = boundaries.begin[valid]
+        frame_num = boundaries.frame_num[valid]
+        order = np.argsort(begin, kind="stable")
+        begin, frame_num = begin[order], frame_num[order]
+        # split each episode into blocks of at most block_size frames.
+        block_num = -(-frame_num // block_size)
+        block_offset = np.arange(block_num.sum()) - np.repeat(
+            np.cumsum(block_num) - block_num, block_num
+        )
+        self.block_begin = np.repeat(begin, block_num) + (
+            block_offset * block_size
+        )
+        self.block_len = np.minimum(
+            np.repeat(begin + frame_num, block_num) - self.block_begin,
+            block_size,
+        )
+        self._num_frames = int(self.block_len.sum())
+
+    @classmethod
+    def from_dataset(
+        cls,
+        dataset: RODataset,
+        block_size: int,
+        buffer_size: int = 1,
+        shuffle: bool = True,
+        generator: torch.Generator | None = None,
+        seed: int | None = None,
+    ) -> EpisodeBlockShuffleSampler:
+        """Create the sampler from the meta database of a dataset.
+
+        The dataset must be in its packaged row order, i.e., not
+        reordered or filtered by :meth:`RODataset.select`.
+
+        Args:
+            dataset (RODataset): The dataset to sample from.
+            block_size (int): The maximum number of consecutive frames in
+                a block.
+            buffer_size (int, optional): The number of frames in each
+                shuffle window. Default: 1.
+            shuffle (bool, optional): Whether to shuffle. Default: True.
+            generator (torch.Generator, optional): Generator used in
+                sampling. Default: None.
+            seed (int, optional): The seed of the per-epoch order.
+                Default: None.
+        """
+        _check_packaged_order(dataset, cls.__name__)
+        boundaries = EpisodeBoundaryTable.from_db(dataset.db_engine)
+        _check_episode_end(
+            boundaries.begin + boundaries.frame_num, len(dataset)
+        )
+        return cls(
+            boundaries=boundaries,
+            block_size=block_size,
+            buffer_size=buffer_size,
+            shuffle=shuffle,
+            generator=generator,
+            seed=seed,
+        )
+
+    def __len__(self) -> int:
+        return self._num_frames
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self._iter_from_cursor(self.indices_numpy())
+
+    def indices_numpy(self) -> np.ndarray:
+        """Return the order of the current epoch as a numpy array."""
+        if not self.shuffle:
+            return _concat_ranges(self.block_begin, self.block_len)
+
+        generator = self._epoch_generator()
+        perm = torch.randperm(len(self.block_begin), generator=generator)
+        perm = perm.numpy()
+        indices = _concat_ranges(self.block_begin[perm], self.block_len[perm])
+        if self.buffer_size > 1:
+            indices = _shuffle_windows(indices, self.buffer_size, generator)
+        return indices
+
+
+WeightsType = dict[str, float] | Literal["balanced"] | None
+
+
+class EpisodeWeightedSampler(ResumableSamplerMixin, Sampler[int]):
+    """Sampler that draws frames with per-episode weights.
+
+    Each frame is drawn in two O(1) steps. First, an episode is drawn
+    from an alias table of the episode weights, which is precomputed
+    once. Then a frame is drawn uniformly from the frames of the
+    episode. The weight of an episode is therefore shared by all its
+    frames, and equal episode weights of `frame_num` sample all frames
+    uniformly.
+
+    Frames are drawn with replacement. The sampler can be sharded across
+    ranks like :class:`~robo_orchard_lab.dataset.sampler.ShardedIndiceSampler`:
+    the `num_samples` of an epoch are split into `num_shards` parts, and
+    each shard draws its part from its own random stream.
+
+    Args:
+        episode_begin (np.ndarray): The first frame index of each episode.
+        episode_frame_num (np.ndarray): The number of frames of each
+            episode.
+        episode_weights (np.ndarray): The non-negative weight of each
+            episode. Episodes with zero weight or no frames are never
+            sampled.
+        num_samples (int | None, optional): The number of frames to draw
+            in each epoch over all shards. If None, it is the number of
+            frames of all sampled episodes. Default: None.
+        num_shards (int, optional): Number of shards. Default: 1.
+        shard_id (int, optional): Index of the current shard. Default: 0.
+        generator (torch.Generator, optional): Generator used in sampling.
+            Default: None.
+        seed (int, optional): If set, the samples of each epoch and shard
+            are generated from `seed`, the epoch and the shard id, and
+            `generator` is ignored. Default: None.
+
+    """
+
+    def __init__(
+        self,
+        episode_begin: np.ndarray,
+        episode_frame_num: np.ndarray,
+        episode_weights: np.ndarray,
+        num_samples: int | None = None,
+        num_shards: int = 1,
+        shard_id: int = 0,
+        generator: torch.Generator | None = None,
+        seed: int | None = None,
+    ) -> None:
+        if not 0 <= shard_id < num_shards:
+            raise ValueError("shard_id should be in [0, num_shards-1]")
+        episode_weights = np.asarray(episode_weights, dtype=np.float64)
+        if np.any(episode_weights < 0) or not np.all(
+            np.isfinite(episode_weights)
+        ):
+            raise ValueError("episode_weights must be finite and >= 0.")
+        self._init_resumable_state(seed=seed, generator=generator)
+        valid = (episode_frame_num > 0) & (episode_weights > 0)
+        if not np.any(valid):
+            raise ValueError("No episode can be sampled.")
+        self.episode_begin = np.asarray(episode_begin, dtype=np.int64)[valid]
+        self.episode_frame_num = np.asarray(episode_frame_num, dtype=np.int64)[
+            valid
+        ]
+        self.alias_prob, self.alias_index = _build_alias_table(
+            episode_weights[valid]
+        )
+        if num_samples is None:
+            num_samples = int(self.episode_frame_num.sum())
+        self.num_samples = num_samples
+        self.num_shards = num_shards
+        self.shard_id = shard_id
+        div, mod = divmod(num_samples, num_shards)
+        self._shard_num_samples = div + (1 if shard_id < mod else 0)
+
+    @classmethod
+    def from_dataset(
+        cls,
+        dataset: RODataset,
+        task_weights: WeightsType = None,
+        robot_weights: WeightsType = None,
+        frame_num_power: float = 1.0,
+        num_samples: int | None = None,
+        num_shards: int = 1,
+        shard_id: int = 0,
+        generator: torch.Generator | None = None,
+        seed: int | None = None,
+    ) -> EpisodeWeightedSampler:
+        """Create the sampler from the meta database of a dataset.
+
+        The weight of an episode is `frame_num ** frame_num_power`
+        multiplied by the weights of its task and robot. The dataset must
+        be in its packaged row order, i.e., not reordered or filtered by
+        :meth:`RODataset.select`.
+
+        Args:
+            dataset (RODataset): The dataset to sample from.
+            task_weights (dict[str, float] | "balanced" | None, optional):
+                The weights by task name. Tasks not in the dict, including
+                episodes without task, have weight 1. If "balanced", the
+                weights are set so that all tasks are sampled equally.
+                Default: None.
+            robot_weights (dict[str, float] | "balanced" | None, optional):
+                The weights by robot name, in the same way as
+                `task_weights`. Robots are balanced after tasks.
+                Default: None.
+            frame_num_power (float, optional): The power of the episode
+                length in the episode weight. 1 samples all frames
+                equally, and 0 samples all episodes equally.
+                Default: 1.0.
+            num_samples (int | None, optional): The number of frames to
+                draw in each epoch. Default: None.
+            num_shards (int, optional): Number of shards. Default: 1.
+            shard_id (int, optional): Index of the current shard.
+                Default: 0.
+            generator (torch.Generator, optional): Generator used in
+                sampling. Default: None.
+            seed (int, optional): The seed of the per-epoch samples.
+                Default: None.
+        """
+        _check_packaged_order(dataset, cls.__name__)
+        stmt = (
+            select(
+                Episode.dataset_begin_index,
+                Episode.frame_num,
+                Task.name,
+                Robot.name,
+            )
+            .outerjoin(Task, Episode.task_index == Task.index)
+            .outerjoin(Robot, Episode.robot_index == Robot.index)
+            .where(Episode.dataset_begin_index.is_not(None))
+            .order_by(Episode.index)
+        )
+        with Session(dataset.db_engine) as session:
+            rows = session.execute(stmt).all()
+        begin = np.array([row[0] for row in rows], dtype=np.int64)
+        frame_num = np.array([row[1] or 0 for row in rows], dtype=np.int64)
+        _check_episode_end(begin + frame_num, len(dataset))
+        weights = frame_num.astype(np.float64) ** frame_num_power
+        weights = weights * _group_weights(
+            [row[2] for row in rows], task_weights, weights
+        )
+        weights = weights * _group_weights(
+            [row[3] for row in rows], robot_weights, weights
+        )
+        return cls(
+            episode_begin=begin,
+            episode_frame_num=frame_num,
+            episode_weights=weights,
+            num_samples=num_samples,
+            num_shards=num_shards,
+            shard_id=shard_id,
+            generator=generator,
+            seed=seed,
+        )
+
+    def __len__(self) -> int:
+        return self._shard_num_samples
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self._iter_from_cursor(self.indices_numpy())
+
+    def _epoch_generator(self) -> torch.Generator:
+        if self.seed is None:
+            return super()._epoch_generator()
+        generator = torch.Generator()
+        generator.manual_seed(
+            (self.seed + self.epoch) * self.num_shards + self.shard_id
+        )
+        return generator
+
+    def indices_numpy(self) -> np.ndarray:
+        """Return the samples of the current epoch as a numpy array."""
+        n = len(self)
+        generator = self._epoch_generator()
+        column = torch.randint(
+            len(self.alias_prob), (n,), generator=generator
+        ).numpy()
+        u = torch.rand(n, generator=generator, dtype=torch.float64).numpy()
+        episode = np.where(
+            u < self.alias_prob[column], column, self.alias_index[column]
+        )
+        v = torch.rand(n, generator=generator, dtype=torch.float64).numpy()
+        offset = (v * self.episode_frame_num[episode]).astype(np.int64)
+        return self.episode_begin[episode] + offset
+
+
+def _build_alias_table(weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Build the alias table of a discrete distribution with Vose's method.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The probability to keep each column
+        and the alias of each column. Column `i` is drawn uniformly and
+        kept with probability `prob[i]`, otherwise `alias[i]` is taken.
+    """
+    n = len(weights)
+    scaled = (weights * (n / weights.sum())).tolist()
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        g = large.pop()
+        alias[s] = g
+        scaled[g] -= 1.0 - scaled[s]
+        (small if scaled[g] < 1.0 else large).append(g)
+    # the rest are 1 up to rounding errors.
+    for i in small + large:
+        scaled[i] = 1.0
+    return np.array(scaled), np.array(alias, dtype=np.int64)
+
+
+def _group_weights(
+    names: list[str | None], weights: WeightsType, base: np.ndarray
+) -> np.ndarray:
+    """Get the weight factor of each episode from the weights by name.
+
+    For "balanced", the factor is the inverse of the total `base` weight
+    of the group, so that all groups have the same total weight.
+    """
+    if weights is None:
+        return np.ones(len(names))
+    if weights == "balanced":
+        codes: dict[str | None, int] = {}
+        group = np.array(
+            [codes.setdefault(name, len(codes)) for name in names],
+            dtype=np.int64,
+        )
+        total = np.bincount(group, weights=base, minlength=len(codes))
+        return np.divide(
+            1.0,
+            total[group],
+            out=np.zeros(len(names)),
+            where=total[group] > 0,
+        )
+    if isinstance(weights, dict):
+        return np.array(
+            [
+                weights.get(name, 1.0) if name is not None else 1.0
+                for name in names
+            ],
+            dtype=np.float64,
+        )
+    raise ValueError(f"Invalid weights: {weights}")
+
+
+def _check_packaged_order(dataset: RODataset, sampler_name: str) -> None:
+    if dataset.frame_dataset._indices is not None:
+        raise ValueError(
+            f"{sampler_name} requires a dataset in its packaged row order, "
+            "but the dataset has an indices mapping."
+        )
+
+
+def _check_episode_end(end: np.ndarray, dataset_len: int) -> None:
+    if len(end) > 0 and end.max() > dataset_len:
+        raise ValueError(
+            "The episodes in the meta database exceed the dataset "
+            f"length {dataset_len}."
+        )
+
+
+def _concat_ranges(begin: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """Concatenate the ranges `[begin[i], begin[i] + length[i])`."""
+    total = int(length.sum())
+    range_begin = np.cumsum(length) - length
+    return np.repeat(begin - range_begin, length) + np.arange(
+        total, dtype=np.int64
+    )
+
+
+def _shuffle_windows(
+    indices: np.ndarray, window_size: int, generator: torch.Generator
+) -> np.ndarray:
+    """Shuffle an array within consecutive windows of `window_size`.
+
+    The full windows are shuffled together as the rows of a 2D array,
+    which sorts random keys of each row instead of the whole array.
+    """
+    num_full = len(indices) // window_size * window_size
+    keys = torch.rand(len(indices), generator=generator).numpy()
+    full = indices[:num_full].reshape(-1, window_size)
+    order = np.argsort(keys[:num_full].reshape(-1, window_size), axis=1)
+    tail = indices[num_full:][np.argsort(keys[num_full:])]
+    return np.concatenate(
+        [np.take_along_axis(full, order, axis=1).reshape(-1), tail]
+    )
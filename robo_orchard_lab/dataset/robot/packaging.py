@@ -17,18 +17,26 @@
 """Packaging a RoboOrchard Dataset."""
 
 from __future__ import annotations
+import dataclasses
+import glob
 import json
 import os
-import pickle
+import shutil
 import warnings
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Generator, Iterable
 
 import datasets as hg_datasets
 import fsspec
-from sqlalchemy import URL
-from sqlalchemy.engine import Engine
+import pyarrow as pa
+import pyarrow.compute as pc
+from datasets import config as hg_datasets_config
+from datasets.arrow_writer import ArrowWriter
+from datasets.fingerprint import Hasher
+from datasets.utils.py_utils import convert_file_size_to_int
+from sqlalchemy import URL, func, select
 from sqlalchemy.orm import Session, make_transient
 
 from robo_orchard_lab.dataset.robot.columns import (
@@ -72,23 +80,43 @@ class EpisodeMeta:
     task: TaskData | None = None
 
     def get_transient_orm(
-        self, index_state: DatasetIndexState, session: Session
+        self,
+        index_state: DatasetIndexState,
+        session: Session | None = None,
+        registry: MetaRegistry | None = None,
     ) -> EpisodeMetaORM:
-        """Get the transient ORM instance of the episode metadata."""
+        """Get the transient ORM instance of the episode metadata.
+
+        If `registry` is provided, the robot and task are looked up and
+        registered in the registry instead of querying the database with
+        `session`.
+        """
         episode = Episode(
             index=index_state.last_episode_idx + 1,
             **self.episode.__dict__,
         )
-        robot = (
-            self.robot.make_transient_orm(index_state, session=session)
-            if self.robot
-            else None
-        )
-        task = (
-            self.task.make_transient_orm(index_state, session=session)
-            if self.task
-            else None
-        )
+        if registry is not None:
+            robot = (
+                registry.get_or_create(self.robot, index_state)
+                if self.robot
+                else None
+            )
+            task = (
+                registry.get_or_create(self.task, index_state)
+                if self.task
+                else None
+            )
+        else:
+            robot = (
+                self.robot.make_transient_orm(index_state, session=session)
+                if self.robot
+                else None
+            )
+            task = (
+                self.task.make_transient_orm(index_state, session=session)
+                if self.task
+                else None
+            )
 
         episode.task_index = task.index if task else None
         episode.robot_index = robot.index if robot else None
@@ -153,7 +181,7 @@ class DatasetPackaging:
         self._features = self._check_and_update_features(features)
         self._database_driver = database_driver
         self._index_state: DatasetIndexState = DatasetIndexState()
-        self._instruction_cache: InstructionCache = InstructionCache()
+        self._meta_registry: MetaRegistry = MetaRegistry()
         self._check_timestamp = check_timestamp
 
     @property
@@ -208,26 +236,6 @@ class DatasetPackaging:
 
         features.update(index_columns.__dict__)
 
-    def _add_instruction(
-        self, instruction_data: InstructionData, engine: Engine
-    ) -> Instruction:
-        """Add an instruction to the database and update the index state."""
-        cached_instruction = self._instruction_cache.get(instruction_data)
-        if cached_instruction is not None:
-            # If the instruction is already cached, return it
-            return cached_instruction
-
-        with Session(engine, expire_on_commit=False) as session:
-            instruction = instruction_data.make_transient_orm(
-                self._index_state, session=session
-            )
-            if instruction.index > self._index_state.last_instruction_idx:
-                session.add(instruction)
-                session.commit()
-                make_transient(instruction)
-                self._instruction_cache.add(instruction)
-            return instruction
-
     def _make_packaging_generator(
         self, episodes: Iterable[EpisodePackaging], db_path: str
     ):
@@ -241,6 +249,8 @@ class DatasetPackaging:
         )
         engine = create_engine(url=url, echo=False)
         create_tables(engine=engine, base=DatasetORMBase)
+        with Session(engine) as session:
+            self._meta_registry.load(session)
 
         def frame_generator(episode: EpisodePackaging):
             try:
@@ -284,17 +294,18 @@ class DatasetPackaging:
                 traceback.print_exception(e)
                 continue
 
-            with Session(engine) as session:
-                episode_meta_orm = episode_meta.get_transient_orm(
-                    self._index_state, session
-                )
+            episode_meta_orm = episode_meta.get_transient_orm(
+                self._index_state, registry=self._meta_registry
+            )
             self._index_state.last_episode_frame_idx = -1
             episode_meta_orm.episode.dataset_begin_index = (
                 self._index_state.last_frame_idx + 1
             )
             for frame in frame_generator(episode):
                 instruction_orm = (
-                    self._add_instruction(frame.instruction, engine=engine)
+                    self._meta_registry.get_or_create(
+                        frame.instruction, self._index_state
+                    )
                     if frame.instruction
                     else None
                 )
@@ -305,36 +316,14 @@ class DatasetPackaging:
                 # yield self._features.encode_example(frame.features)
                 yield frame.features
                 # update status
-                if instruction_orm is not None:
-                    self._index_state.last_instruction_idx = max(
-                        self._index_state.last_instruction_idx,
-                        instruction_orm.index,
-                    )
                 self._index_state.last_episode_frame_idx += 1
                 self._index_state.last_frame_idx += 1
 
             # Update the index state with the episode metadata
             with Session(engine, expire_on_commit=False) as session:
-                if episode_meta_orm.robot:
-                    if (
-                        episode_meta_orm.robot.index
-                        > self._index_state.last_robot_idx
-                    ):
-                        session.add(episode_meta_orm.robot)
-                    self._index_state.last_robot_idx = max(
-                        self._index_state.last_robot_idx,
-                        episode_meta_orm.robot.index,
-                    )
-                if episode_meta_orm.task:
-                    if (
-                        episode_meta_orm.task.index
-                        > self._index_state.last_task_idx
-                    ):
-                        session.add(episode_meta_orm.task)
-                    self._index_state.last_task_idx = max(
-                        self._index_state.last_task_idx,
-                        episode_meta_orm.task.index,
-                    )
+                # insert all new robots, tasks and instructions of the
+                # episode at once.
+                self._meta_registry.flush(session)
                 self._index_state.last_episode_idx = max(
                     self._index_state.last_episode_idx,
                     episode_meta_orm.episode.index,
@@ -433,8 +422,6 @@ class DatasetPackaging:
                     str(e) + f"\nThe format kwargs must be JSON serializable, "
                     f"but key '{k}' isn't."
                 ) from None
-        from datasets import config as hg_datasets_config
-
         with fs.open(
             os.path.join(
                 dataset_path, hg_datasets_config.DATASET_STATE_JSON_FILENAME
@@ -453,6 +440,7 @@ class DatasetPackaging:
         max_shard_size: str | int = "8GB",
         split: hg_datasets.Split | None = None,
         force_overwrite: bool = False,
+        num_proc: int | None = None,
     ):
         """Package the dataset and save it to the specified path.
 
@@ -475,6 +463,16 @@ class DatasetPackaging:
             force_overwrite (bool): If True, overwrite the existing dataset
                 at the specified path. If False, raise an error if the path
                 already exists. Default is False.
+            num_proc (int | None): The number of processes to package the
+                episodes. If greater than 1, the episodes are split into
+                `num_proc` contiguous chunks, and each chunk is packaged
+                into a temporary shard dataset with its own meta database
+                in a separate process. The shards are then merged in order
+                with indices re-based, so the result is the same as
+                packaging serially. Each shard is copied to the dataset
+                once, in parallel, with only its index columns replaced.
+                In this mode, all episodes must be picklable. If None or
+                1, package serially. Default is None.
         """
 
         if os.path.exists(dataset_path):
@@ -494,7 +492,19 @@ class DatasetPackaging:
                 shutil.rmtree(dataset_path, ignore_errors=True)
 
         self._index_state: DatasetIndexState = DatasetIndexState()
-        self._instruction_cache.clear()
+        self._meta_registry.clear()
+
+        if num_proc is not None and num_proc > 1:
+            self._packaging_parallel(
+                episodes=list(episodes),
+                dataset_path=dataset_path,
+                dataset_info=dataset_info,
+                writer_batch_size=writer_batch_size,
+                max_shard_size=max_shard_size,
+                split=split,
+                num_proc=num_proc,
+            )
+            return
 
         # We cannot use the dataset_path directly because
         # datasets will clean the folder before packaging
@@ -551,6 +561,625 @@ class DatasetPackaging:
             if os.path.exists(db_path):
                 os.remove(db_path)
 
+    def _packaging_parallel(
+        self,
+        episodes: list[EpisodePackaging],
+        dataset_path: str,
+        dataset_info: hg_datasets.DatasetInfo | None,
+        writer_batch_size: int,
+        max_shard_size: str | int,
+        split: hg_datasets.Split | None,
+        num_proc: int,
+    ):
+        """Package episodes into shards in parallel and merge them."""
+        shard_folder = dataset_path + "_shards"
+        db_path = dataset_path + f"_meta.{self._database_driver}"
+        try:
+            shards = self._package_shards(
+                episodes=episodes,
+                shard_folder=shard_folder,
+                num_proc=num_proc,
+                packaging_kwargs=dict(
+                    dataset_info=dataset_info,
+                    writer_batch_size=writer_batch_size,
+                    max_shard_size=max_shard_size,
+                ),
+            )
+            engine = create_engine(
+                url=URL.create(
+                    drivername=self._database_driver, database=db_path
+                ),
+                echo=False,
+            )
+            create_tables(engine=engine, base=DatasetORMBase)
+            rebases = []
+            with Session(engine, expire_on_commit=False) as session:
+                for shard_path, prev_episode_indices in shards:
+                    rebases.append(
+                        self._rebase_shard(
+                            shard_path, prev_episode_indices, session
+                        )
+                    )
+                    session.commit()
+            engine.dispose()
+
+            data_files = self._write_rebased_shards(
+                rebases,
+                target_path=dataset_path,
+                writer_batch_size=writer_batch_size,
+                max_shard_size=max_shard_size,
+                num_proc=num_proc,
+            )
+            os.rename(
+                db_path,
+                os.path.join(dataset_path, f"meta_db.{self._database_driver}"),
+            )
+            if dataset_info is None:
+                info = hg_datasets.DatasetInfo.from_merge(
+                    [
+                        hg_datasets.DatasetInfo.from_directory(shard_path)
+                        for shard_path, _ in shards
+                    ]
+                )
+            else:
+                info = dataset_info.copy()
+            info.features = self._features
+            # the same files as `Dataset.save_to_disk`.
+            state = {
+                "_data_files": [{"filename": f} for f in data_files],
+                "_fingerprint": Hasher.hash(
+                    [rebase.fingerprint for rebase in rebases]
+                ),
+                "_format_columns": None,
+                "_format_kwargs": {},
+                "_format_type": None,
+                "_output_all_columns": False,
+                "_split": str(
+                    split if split is not None else hg_datasets.Split.TRAIN
+                ),
+                "robo_orchard_state": {
+                    "dataset_format_version": dataset_format_version
+                },
+            }
+            with open(
+                os.path.join(
+                    dataset_path,
+                    hg_datasets_config.DATASET_STATE_JSON_FILENAME,
+                ),
+                "w",
+                encoding="utf-8",
+            ) as state_file:
+                json.dump(state, state_file, indent=2, sort_keys=True)
+            info.write_to_directory(dataset_path)
+        finally:
+            shutil.rmtree(shard_folder, ignore_errors=True)
+            if os.path.exists(db_path):
+                os.remove(db_path)
+
+    def _package_shards(
+        self,
+        episodes: list[EpisodePackaging],
+        shard_folder: str,
+        num_proc: int | None,
+        packaging_kwargs: dict[str, Any],
+    ) -> list[tuple[str, list[int | None]]]:
+        """Package episodes into shard datasets with indices from 0.
+
+        The episodes are split into `num_proc` contiguous chunks to keep
+        the order of episodes, and each chunk is packaged in a separate
+        process.
+
+        Returns:
+            list[tuple[str, list[int | None]]]: The path of each shard and
+            the previous episode index of each episode in the shard.
+        """
+        num_proc = max(1, min(num_proc or 1, len(episodes)))
+        chunk_sizes = [
+            len(episodes) // num_proc
+            + (1 if i < len(episodes) % num_proc else 0)
+            for i in range(num_proc)
+        ]
+        shard_features = hg_datasets.Features(
+            {
+                k: v
+                for k, v in self._features.items()
+                if k not in PreservedIndexColumnsKeys
+            }
+        )
+        shutil.rmtree(shard_folder, ignore_errors=True)
+        os.makedirs(shard_folder)
+        shard_paths = [
+            os.path.join(shard_folder, f"shard-{i:05d}")
+            for i in range(num_proc)
+        ]
+        args_list = []
+        begin = 0
+        for shard_path, chunk_size in zip(
+            shard_paths, chunk_sizes, strict=True
+        ):
+            args_list.append(
+                (
+                    DatasetPackaging(
+                        features=shard_features,
+                        database_driver=self._database_driver,
+                        check_timestamp=self._check_timestamp,
+                    ),
+                    episodes[begin : begin + chunk_size],
+                    shard_path,
+                    packaging_kwargs,
+                )
+            )
+            begin += chunk_size
+        if num_proc == 1:
+            prev_episode_indices = [_packaging_shard(*args_list[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=num_proc) as executor:
+                futures = [
+                    executor.submit(_packaging_shard, *args)
+                    for args in args_list
+                ]
+                prev_episode_indices = [f.result() for f in futures]
+        return list(zip(shard_paths, prev_episode_indices, strict=True))
+
+    def _rebase_shard(
+        self,
+        shard_path: str,
+        prev_episode_indices: list[int | None],
+        session: Session,
+    ) -> _ShardRebase:
+        """Merge the meta of a shard and re-base its index columns.
+
+        The robots, tasks and instructions of the shard are de-duplicated
+        with the meta registry, and the episodes are added to `session`
+        after all previous episodes of the index state. The frames of the
+        shard are not read. Their index columns are re-based when the shard
+        is written by :func:`_write_rebased_shard`.
+
+        Args:
+            shard_path (str): The path of the shard dataset.
+            prev_episode_indices (list[int | None]): The previous episode
+                index of each episode in the shard.
+            session (Session): The session of the merged meta database.
+
+        Returns:
+            _ShardRebase: The re-based indices of the shard.
+        """
+        index_state = self._index_state
+        shard_engine = create_engine(
+            url=URL.create(
+                drivername=self._database_driver,
+                database=os.path.join(
+                    shard_path, f"meta_db.{self._database_driver}"
+                ),
+            ),
+            readonly=True,
+        )
+        with Session(shard_engine) as shard_session:
+            index_maps = {
+                index_key: self._merge_meta_table(
+                    orm_type=orm_type,
+                    data_type=data_type,
+                    shard_session=shard_session,
+                )
+                for index_key, orm_type, data_type in [
+                    ("robot_index", Robot, RobotData),
+                    ("task_index", Task, TaskData),
+                    ("instruction_index", Instruction, InstructionData),
+                ]
+            }
+            self._meta_registry.flush(session)
+            episode_offset = index_state.last_episode_idx + 1
+            frame_offset = index_state.last_frame_idx + 1
+            shard_episodes = (
+                shard_session.execute(select(Episode).order_by(Episode.index))
+                .scalars()
+                .all()
+            )
+            for episode in shard_episodes:
+                session.add(
+                    Episode(
+                        index=episode.index + episode_offset,
+                        dataset_begin_index=episode.dataset_begin_index
+                        + frame_offset,
+                        frame_num=episode.frame_num,
+                        robot_index=index_maps["robot_index"][
+                            episode.robot_index
+                        ]
+                        if episode.robot_index is not None
+                        else None,
+                        task_index=index_maps["task_index"][episode.task_index]
+                        if episode.task_index is not None
+                        else None,
+                        prev_episode_index=prev_episode_indices[episode.index],
+                    )
+                )
+                # the previous episode may be in the same shard and
+                # must be inserted before the foreign key is checked.
+                session.flush()
+                index_state.last_episode_idx = episode.index + episode_offset
+                index_state.last_episode_frame_idx = episode.frame_num - 1
+        shard_engine.dispose()
+
+        shard_dataset = hg_datasets.Dataset.load_from_disk(shard_path)
+        index_state.last_frame_idx += len(shard_dataset)
+        return _ShardRebase(
+            shard_path=shard_path,
+            fingerprint=shard_dataset._fingerprint,
+            frame_offset=frame_offset,
+            episode_offset=episode_offset,
+            index_maps=index_maps,
+        )
+
+    def _write_rebased_shards(
+        self,
+        rebases: list[_ShardRebase],
+        target_path: str,
+        writer_batch_size: int,
+        max_shard_size: str | int,
+        num_proc: int | None,
+    ) -> list[str]:
+        """Write the re-based shards to arrow files in `target_path`.
+
+        Each shard is written in a separate process, and the frames are
+        written once without concatenating the shards.
+
+        Returns:
+            list[str]: The arrow file names in `target_path`, in order.
+        """
+        os.makedirs(target_path, exist_ok=True)
+        args_list = [
+            (
+                rebase,
+                os.path.join(target_path, f"shard-{i:05d}"),
+                writer_batch_size,
+                convert_file_size_to_int(max_shard_size),
+            )
+            for i, rebase in enumerate(rebases)
+        ]
+        num_proc = max(1, min(num_proc or 1, len(rebases)))
+        if num_proc == 1:
+            shard_files = [_write_rebased_shard(*args) for args in args_list]
+        else:
+            with ProcessPoolExecutor(max_workers=num_proc) as executor:
+                futures = [
+                    executor.submit(_write_rebased_shard, *args)
+                    for args in args_list
+                ]
+                shard_files = [f.result() for f in futures]
+        tmp_files = sum(shard_files, [])
+        num_shards = len(tmp_files)
+        digits = max(5, len(str(num_shards)))
+        ret = []
+        for i, tmp_file in enumerate(tmp_files):
+            file_name = f"data-{i:0{digits}d}-of-{num_shards:0{digits}d}.arrow"
+            os.rename(tmp_file, os.path.join(target_path, file_name))
+            ret.append(file_name)
+        return ret
+
+    def append(
+        self,
+        episodes: Iterable[EpisodePackaging],
+        dataset_path: str,
+        writer_batch_size: int = 1024,
+        max_shard_size: str | int = "8GB",
+        num_proc: int | None = None,
+    ):
+        """Append episodes to an existing packaged dataset.
+
+        Only the new episodes are packaged. They are written as new arrow
+        files in the dataset folder, and their metadata are added to the
+        meta database, continuing from the index state stored in it.
+        Existing frames are not decoded or rewritten.
+
+        The new arrow files and meta database are prepared beside the
+        dataset, and only moved into the dataset folder after all
+        episodes are packaged. The append is committed by replacing the
+        meta database and then the `state.json` of the dataset. The old
+        meta database is kept as `meta_db.*.bak` until `state.json` is
+        replaced, so that an interrupted append can be rolled back by
+        :meth:`recover_append`, which is called before appending.
+
+        Args:
+            episodes (Iterable[EpisodePackaging]): An iterable of episode
+                packaging instances to append.
+            dataset_path (str): The path of the existing dataset.
+            writer_batch_size (int): The batch size for writing the arrow
+                file. Default is 1024.
+            max_shard_size (str | int): The maximum size of each new arrow
+                file. Default is "8GB".
+            num_proc (int | None): The number of processes to package the
+                episodes. See :meth:`packaging` for details. Default is
+                None.
+        """
+        episodes = list(episodes)
+        if len(episodes) == 0:
+            return
+        if self.recover_append(dataset_path):
+            warnings.warn(
+                f"Rolled back an interrupted append to {dataset_path}."
+            )
+        dataset = hg_datasets.Dataset.load_from_disk(dataset_path)
+        if dataset.features != self._features:
+            raise ValueError(
+                "The features of the appended episodes do not match the "
+                f"features of the dataset. Expected {dataset.features}, "
+                f"but got {self._features}."
+            )
+        db_path = os.path.join(
+            dataset_path, f"meta_db.{self._database_driver}"
+        )
+        new_db_path = dataset_path + f"_meta.{self._database_driver}"
+        append_folder = dataset_path + "_append"
+        shard_folder = os.path.join(append_folder, "shards")
+        rebased_folder = os.path.join(append_folder, "rebased")
+
+        shutil.copyfile(db_path, new_db_path)
+        try:
+            engine = create_engine(
+                url=URL.create(
+                    drivername=self._database_driver, database=new_db_path
+                ),
+                echo=False,
+            )
+            with Session(engine, expire_on_commit=False) as session:
+                self._index_state = DatasetIndexState.from_db(session)
+                self._meta_registry.load(session)
+            if self._index_state.last_frame_idx + 1 != len(dataset):
+                raise ValueError(
+                    f"The dataset has {len(dataset)} frames, but the meta "
+                    "database records "
+                    f"{self._index_state.last_frame_idx + 1} frames."
+                )
+            shards = self._package_shards(
+                episodes=episodes,
+                shard_folder=shard_folder,
+                num_proc=num_proc,
+                packaging_kwargs=dict(
+                    writer_batch_size=writer_batch_size,
+                    max_shard_size=max_shard_size,
+                ),
+            )
+            rebases = []
+            with Session(engine, expire_on_commit=False) as session:
+                for shard_path, prev_episode_indices in shards:
+                    rebases.append(
+                        self._rebase_shard(
+                            shard_path, prev_episode_indices, session
+                        )
+                    )
+                    session.commit()
+            engine.dispose()
+            data_files = self._write_rebased_shards(
+                rebases,
+                target_path=rebased_folder,
+                writer_batch_size=writer_batch_size,
+                max_shard_size=max_shard_size,
+                num_proc=num_proc,
+            )
+
+            state_path = os.path.join(
+                dataset_path, hg_datasets_config.DATASET_STATE_JSON_FILENAME
+            )
+            with open(state_path, "r", encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            fingerprint = Hasher.hash(
+                [state["_fingerprint"]]
+                + [rebase.fingerprint for rebase in rebases]
+            )
+            for data_file in data_files:
+                filename = f"append-{fingerprint}-{data_file}"
+                shutil.move(
+                    os.path.join(rebased_folder, data_file),
+                    os.path.join(dataset_path, filename),
+                )
+                state["_data_files"].append({"filename": filename})
+            state["_fingerprint"] = fingerprint
+            with open(
+                state_path + ".tmp", "w", encoding="utf-8"
+            ) as state_file:
+                json.dump(state, state_file, indent=2, sort_keys=True)
+            os.replace(db_path, db_path + ".bak")
+            os.replace(new_db_path, db_path)
+            os.replace(state_path + ".tmp", state_path)
+            os.remove(db_path + ".bak")
+        finally:
+            self.recover_append(dataset_path)
+
+    @staticmethod
+    def recover_append(dataset_path: str) -> bool:
+        """Recover a dataset from an interrupted :meth:`append`.
+
+        If the append is interrupted before `state.json` of the dataset is
+        replaced, the old meta database is restored from `meta_db.*.bak`.
+        The files left by the append are removed, which are:
+
+        - `state.json.tmp` and `meta_db.*.bak` in the dataset folder.
+        - `append-*.arrow` files in the dataset folder that are not listed
+          in `state.json`.
+        - `{dataset_path}_append` and `{dataset_path}_meta.*` beside the
+          dataset folder.
+
+        Args:
+            dataset_path (str): The path of the dataset.
+
+        Returns:
+            bool: Whether the old meta database is restored.
+        """
+        state_path = os.path.join(
+            dataset_path, hg_datasets_config.DATASET_STATE_JSON_FILENAME
+        )
+        restored = False
+        for filename in os.listdir(dataset_path):
+            if filename.startswith("meta_db.") and filename.endswith(".bak"):
+                backup_path = os.path.join(dataset_path, filename)
+                if os.path.exists(state_path + ".tmp"):
+                    os.replace(backup_path, backup_path[: -len(".bak")])
+                    restored = True
+                else:
+                    os.remove(backup_path)
+        if os.path.exists(state_path + ".tmp"):
+            os.remove(state_path + ".tmp")
+
+        with open(state_path, "r", encoding="utf-8") as state_file:
+            state = json.load(state_file)
+        data_files = set(f["filename"] for f in state["_data_files"])
+        for filename in os.listdir(dataset_path):
+            if (
+                filename.startswith("append-")
+                and filename.endswith(".arrow")
+                and filename not in data_files
+            ):
+                os.remove(os.path.join(dataset_path, filename))
+
+        shutil.rmtree(dataset_path + "_append", ignore_errors=True)
+        for path in glob.glob(glob.escape(dataset_path) + "_meta.*"):
+            os.remove(path)
+        return restored
+
+    def _merge_meta_table(
+        self,
+        orm_type: type[Robot | Task | Instruction],
+        data_type: type[RobotData | TaskData | InstructionData],
+        shard_session: Session,
+    ) -> list[int | None]:
+        """Register a meta table of a shard in the meta registry.
+
+        Returns:
+            list[int | None]: The merged index of each shard index.
+        """
+        shard_rows = (
+            shard_session.execute(select(orm_type).order_by(orm_type.index))
+            .scalars()
+            .all()
+        )
+        index_map: list[int | None] = [None] * (
+            (shard_rows[-1].index + 1) if shard_rows else 0
+        )
+        data_fields = [f.name for f in dataclasses.fields(data_type)]
+        for row in shard_rows:
+            data = data_type(**{k: getattr(row, k) for k in data_fields})
+            orm = self._meta_registry.get_or_create(data, self._index_state)
+            index_map[row.index] = orm.index
+        return index_map
+
+
+class _ShardEpisodePackaging(EpisodePackaging):
+    """An episode packaged in a shard of parallel packaging.
+
+    The previous episode index refers to an episode in the whole dataset,
+    which may not be in the same shard. It is removed from the meta of the
+    shard, and restored when merging shards.
+    """
+
+    def __init__(self, episode: EpisodePackaging):
+        self.episode = episode
+        self.meta_generated = False
+        self.prev_episode_index: int | None = None
+
+    def __repr__(self) -> str:
+        return repr(self.episode)
+
+    def generate_episode_meta(self) -> EpisodeMeta:
+        meta = self.episode.generate_episode_meta()
+        self.prev_episode_index = meta.episode.prev_episode_index
+        meta.episode = dataclasses.replace(
+            meta.episode, prev_episode_index=None
+        )
+        self.meta_generated = True
+        return meta
+
+    def generate_frames(self) -> Generator[DataFrame, None, None]:
+        return self.episode.generate_frames()
+
+
+@dataclass
+class _ShardRebase:
+    """The re-based indices of a shard in parallel packaging."""
+
+    shard_path: str
+    fingerprint: str
+    frame_offset: int
+    episode_offset: int
+    index_maps: dict[str, list[int | None]]
+    """The merged index of each shard index of the meta index columns."""
+
+
+def _write_rebased_shard(
+    rebase: _ShardRebase,
+    file_prefix: str,
+    writer_batch_size: int,
+    max_shard_size: int,
+) -> list[str]:
+    """Write a shard with re-based index columns in a worker process.
+
+    The record batches of the shard are copied to arrow files with only
+    the index columns replaced.
+
+    Returns:
+        list[str]: The paths of the written arrow files, in order.
+    """
+    shard_dataset = hg_datasets.Dataset.load_from_disk(rebase.shard_path)
+    table = shard_dataset.data.table
+    index_maps = {
+        k: pa.array(v, type=pa.int64()) for k, v in rebase.index_maps.items()
+    }
+    files: list[str] = []
+    writer: ArrowWriter | None = None
+    shard_size = 0
+    for begin in range(0, max(len(table), 1), writer_batch_size):
+        batch = table.slice(begin, writer_batch_size)
+        rebased_columns = {
+            "index": pc.add(batch.column("index"), rebase.frame_offset),
+            "episode_index": pc.add(
+                batch.column("episode_index"), rebase.episode_offset
+            ),
+        }
+        for index_key, index_map in index_maps.items():
+            rebased_columns[index_key] = pc.take(
+                index_map, batch.column(index_key)
+            )
+        for name, column in rebased_columns.items():
+            batch = batch.set_column(
+                batch.column_names.index(name), name, column
+            )
+        if writer is None:
+            files.append(f"{file_prefix}-{len(files):05d}.arrow.tmp")
+            writer = ArrowWriter(
+                features=shard_dataset.features,
+                path=files[-1],
+                writer_batch_size=writer_batch_size,
+            )
+            shard_size = 0
+        writer.write_table(batch)
+        shard_size += batch.nbytes
+        if shard_size >= max_shard_size:
+            writer.finalize()
+            writer = None
+    if writer is not None:
+        writer.finalize()
+    return files
+
+
+def _packaging_shard(
+    packaging: DatasetPackaging,
+    episodes: list[EpisodePackaging],
+    dataset_path: str,
+    kwargs: dict[str, Any],
+) -> list[int | None]:
+    """Package a shard of episodes in a worker process.
+
+    Returns:
+        list[int | None]: The previous episode index of each packaged
+        episode in the shard, in order.
+    """
+    shard_episodes = [_ShardEpisodePackaging(ep) for ep in episodes]
+    packaging.packaging(
+        episodes=shard_episodes, dataset_path=dataset_path, **kwargs
+    )
+    return [
+        ep.prev_episode_index for ep in shard_episodes if ep.meta_generated
+    ]
+
 
 @dataclass
 class EpisodeData:
@@ -708,33 +1337,66 @@ class InstructionData:
             return make_new()
 
 
-class InstructionCache:
+class MetaRegistry:
+    """An in-memory registry of robots, tasks and instructions.
+
+    The registry is keyed by the MD5 hash of the content, so that looking
+    up the metadata of each frame does not query the database. New
+    metadata are assigned the next index from the index state, and are
+    kept as pending until :meth:`flush` inserts them into the database
+    at once.
+    """
+
+    _last_idx_keys: dict[type, str] = {
+        Robot: "last_robot_idx",
+        Task: "last_task_idx",
+        Instruction: "last_instruction_idx",
+    }
+
     def __init__(self):
-        self._cache: dict[bytes, Instruction] = {}
-
-    def _get_key(self, instruction: InstructionData) -> bytes:
-        """Generate a unique key for the instruction data."""
-        data = instruction.__dict__.copy()
-        data["json_content"] = json.dumps(data["json_content"], sort_keys=True)
-        return pickle.dumps(data)
-
-    def get(self, instruction_data: InstructionData) -> Instruction | None:
-        """Get an instruction from the cache using its packing data."""
-        return self._cache.get(self._get_key(instruction_data), None)
-
-    def add(self, instruction: Instruction):
-        """Add an instruction to the cache."""
-        self._cache[
-            self._get_key(
-                InstructionData(
-                    name=instruction.name,
-                    json_content=instruction.json_content,
-                )
-            )
-        ] = instruction
+        self._registry: dict[type, dict[bytes, list[Any]]] = {
+            orm_type: {} for orm_type in self._last_idx_keys
+        }
+        self._pending: list[Robot | Task | Instruction] = []
+
+    def load(self, session: Session):
+        """Load all robots, tasks and instructions from the database."""
+        self.clear()
+        for orm_type in self._last_idx_keys:
+            for row in session.execute(select(orm_type)).scalars():
+                self._registry[orm_type].setdefault(row.md5, []).append(row)
+
+    def get_or_create(
+        self,
+        data: RobotData | TaskData | InstructionData,
+        index_state: DatasetIndexState,
+    ) -> Robot | Task | Instruction:
+        """Get the registered ORM instance with the same content as `data`.
+
+        If not registered, a new transient instance is created with the
+        next index, and the index state is updated.
+        """
+        new_orm = data.make_transient_orm(index_state, session=None)
+        orm_type = type(new_orm)
+        candidates = self._registry[orm_type].setdefault(new_orm.md5, [])
+        data_fields = [f.name for f in dataclasses.fields(data)]
+        for orm in candidates:
+            if all(getattr(orm, k) == getattr(data, k) for k in data_fields):
+                return orm
+        candidates.append(new_orm)
+        self._pending.append(new_orm)
+        setattr(index_state, self._last_idx_keys[orm_type], new_orm.index)
+        return new_orm
+
+    def flush(self, session: Session):
+        """Add all pending instances to the session."""
+        session.add_all(self._pending)
+        self._pending.clear()
 
     def clear(self):
-        self._cache.clear()
+        for registry in self._registry.values():
+            registry.clear()
+        self._pending.clear()
 
 
 @dataclass
@@ -753,3 +1415,30 @@ class DatasetIndexState:
     """The index of the last frame in the dataset."""
     last_episode_frame_idx: int = -1
     """The index of the last frame in the last episode in the dataset."""
+
+    @classmethod
+    def from_db(cls, session: Session) -> DatasetIndexState:
+        """Get the index state of a packaged dataset from its meta database.
+
+        Args:
+            session (Session): The session of the meta database.
+        """
+
+        def max_index(orm_type: type[DatasetORMBase]) -> int:
+            ret = session.scalar(select(func.max(orm_type.index)))  # type: ignore
+            return ret if ret is not None else -1
+
+        ret = cls(
+            last_episode_idx=max_index(Episode),
+            last_robot_idx=max_index(Robot),
+            last_task_idx=max_index(Task),
+            last_instruction_idx=max_index(Instruction),
+        )
+        if ret.last_episode_idx >= 0:
+            last_episode = session.get(Episode, ret.last_episode_idx)
+            assert last_episode is not None
+            ret.last_frame_idx = (
+                last_episode.dataset_begin_index + last_episode.frame_num - 1
+            )
+            ret.last_episode_frame_idx = last_episode.frame_num - 1
+        return ret
@@ -14,26 +14,50 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
-from typing import Generator, Iterable
+from __future__ import annotations
+import json
+import os
+import shutil
+import warnings
+from typing import Generator, Iterable, Literal
 
 import datasets as hg_datasets
-
-from robo_orchard_lab.dataset.robot.columns import PreservedColumnsKeys
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from datasets import config as hg_datasets_config
+from datasets.arrow_writer import ArrowWriter
+from datasets.fingerprint import Hasher
+from datasets.formatting import query_table
+from datasets.utils.py_utils import convert_file_size_to_int
+from sqlalchemy import URL
+from sqlalchemy.orm import Session
+
+from robo_orchard_lab.dataset.robot.columns import (
+    PreservedColumnsKeys,
+    PreservedIndexColumnsKeys,
+)
 from robo_orchard_lab.dataset.robot.dataset import RODataset
 from robo_orchard_lab.dataset.robot.db_orm import (
+    DatasetORMBase,
+    Episode,
     Instruction,
     Robot,
     Task,
 )
+from robo_orchard_lab.dataset.robot.engine import create_engine, create_tables
 from robo_orchard_lab.dataset.robot.packaging import (
     DataFrame,
+    DatasetIndexState,
     DatasetPackaging,
     EpisodeData,
     EpisodeMeta,
     EpisodePackaging,
     InstructionData,
+    MetaRegistry,
     RobotData,
     TaskData,
+    dataset_format_version,
 )
 
 __all__ = ["repack_dataset"]
@@ -65,17 +89,25 @@ class RePackingEpisodeHelper(EpisodePackaging):
     def generate_episode_meta(self) -> EpisodeMeta:
         frame_start = self.frame_index_list[0]
         row = self.dataset.index_dataset[frame_start]
-        orm_robot: Robot = self.dataset.get_meta(Robot, row["robot_index"])
-        assert orm_robot is not None
-        orm_task: Task = self.dataset.get_meta(Task, row["task_index"])
-        assert orm_task is not None
-        robot: RobotData = RobotData(
-            name=orm_robot.name,
-            urdf_content=orm_robot.urdf_content,
+        orm_robot: Robot | None = self.dataset.get_meta(
+            Robot, row["robot_index"]
         )
-        task = TaskData(
-            name=orm_task.name,
-            description=orm_task.description,
+        orm_task: Task | None = self.dataset.get_meta(Task, row["task_index"])
+        robot = (
+            RobotData(
+                name=orm_robot.name,
+                urdf_content=orm_robot.urdf_content,
+            )
+            if orm_robot is not None
+            else None
+        )
+        task = (
+            TaskData(
+                name=orm_task.name,
+                description=orm_task.description,
+            )
+            if orm_task is not None
+            else None
         )
         return EpisodeMeta(episode=EpisodeData(), robot=robot, task=task)
 
@@ -100,7 +132,7 @@ class RePackingEpisodeHelper(EpisodePackaging):
             row = self.dataset.frame_dataset[idx]
             instruction_index = row["instruction_index"]
             orm_instruction = all_instruction[i]
-            if orm_instruction is None:
+            if orm_instruction is None and instruction_index is not None:
                 raise RuntimeError(
                     f"Instruction not found for frame index {idx} "
                     f"with instruction_index {instruction_index}"
@@ -111,7 +143,9 @@ class RePackingEpisodeHelper(EpisodePackaging):
                 instruction=InstructionData(
                     name=orm_instruction.name,
                     json_content=orm_instruction.json_content,
-                ),
+                )
+                if orm_instruction is not None
+                else None,
                 timestamp_ns_min=row["timestamp_min"],
                 timestamp_ns_max=row["timestamp_max"],
             )
@@ -169,6 +203,7 @@ def repack_dataset(
     writer_batch_size: int = 1024,
     max_shard_size: str | int = "8GB",
     force_overwrite: bool = False,
+    mode: Literal["decode", "arrow"] = "decode",
 ):
     """Re-package a RoboOrchard dataset with selected frames for each episode.
 
@@ -187,6 +222,12 @@ def repack_dataset(
             Default is '8GB'.
         force_overwrite (bool): Whether to overwrite the target path if it
             already exists. Default is False.
+        mode (Literal["decode", "arrow"]): How to re-package the frames.
+            "decode" decodes each frame and packages it again with
+            :class:`DatasetPackaging`. "arrow" copies the selected
+            arrow rows as they are and only remaps the index columns
+            and meta rows, which is much faster for large payloads such
+            as images. Default is "decode".
 
     """
     if columns is not None:
@@ -194,6 +235,19 @@ def repack_dataset(
     else:
         dataset = source_dataset
 
+    if mode == "arrow":
+        _repack_dataset_arrow(
+            dataset=dataset,
+            target_path=target_path,
+            frame_indices=frame_indices,
+            writer_batch_size=writer_batch_size,
+            max_shard_size=max_shard_size,
+            force_overwrite=force_overwrite,
+        )
+        return
+    elif mode != "decode":
+        raise ValueError(f"Unknown repack mode: {mode}")
+
     features = dataset.features
 
     preserved_columns = set(PreservedColumnsKeys)
@@ -210,3 +264,252 @@ def repack_dataset(
         max_shard_size=max_shard_size,
         force_overwrite=force_overwrite,
     )
+
+
+def _repack_dataset_arrow(
+    dataset: RODataset,
+    target_path: str,
+    frame_indices: Iterable[int],
+    writer_batch_size: int,
+    max_shard_size: str | int,
+    force_overwrite: bool,
+    database_driver: str = "duckdb",
+):
+    """Re-package a RoboOrchard dataset at the arrow level.
+
+    The selected rows are copied in arrow record batches without decoding.
+    Frames are grouped into episodes and the index columns and meta rows
+    are remapped in the same way as re-packaging with
+    :class:`DatasetPackaging`.
+    """
+    if os.path.exists(target_path):
+        if not force_overwrite:
+            raise FileExistsError(
+                f"The dataset path '{target_path}' already exists. "
+                "Please remove it or set force_overwrite=True to overwrite."
+            )
+        warnings.warn(
+            f"The dataset path '{target_path}' already exists. "
+            "It will be overwritten."
+        )
+        shutil.rmtree(target_path, ignore_errors=True)
+
+    frame_dataset = dataset.frame_dataset
+    frames = np.asarray(list(frame_indices), dtype=np.int64)
+    index_table = query_table(
+        dataset.index_dataset._data,
+        frames.tolist(),
+        indices=dataset.index_dataset._indices,
+    )
+    # group consecutive frames of the same episode, and sort frames
+    # within each episode.
+    src_episode = index_table.column("episode_index").to_numpy()
+    is_new_episode = np.ones(len(frames), dtype=bool)
+    is_new_episode[1:] = src_episode[1:] != src_episode[:-1]
+    frame_episode = np.cumsum(is_new_episode) - 1
+    order = np.lexsort((frames, frame_episode))
+    frames = frames[order]
+    index_table = index_table.take(pa.array(order))
+
+    episode_begin = np.flatnonzero(is_new_episode)
+    episode_frame_num = np.diff(np.append(episode_begin, len(frames)))
+
+    # register meta rows in the order of first use.
+    index_state = DatasetIndexState()
+    registry = MetaRegistry()
+    first_rows = index_table.take(pa.array(episode_begin))
+    src_robot = first_rows.column("robot_index").to_pylist()
+    src_task = first_rows.column("task_index").to_pylist()
+    robots = dict(
+        zip(src_robot, dataset.get_meta(Robot, src_robot), strict=True)
+    )
+    tasks = dict(zip(src_task, dataset.get_meta(Task, src_task), strict=True))
+    robot_map: dict[int | None, int | None] = {None: None}
+    task_map: dict[int | None, int | None] = {None: None}
+    for robot_index, task_index in zip(src_robot, src_task, strict=True):
+        if robot_index not in robot_map:
+            robot = robots[robot_index]
+            robot_map[robot_index] = registry.get_or_create(
+                RobotData(name=robot.name, urdf_content=robot.urdf_content),
+                index_state,
+            ).index
+        if task_index not in task_map:
+            task = tasks[task_index]
+            task_map[task_index] = registry.get_or_create(
+                TaskData(name=task.name, description=task.description),
+                index_state,
+            ).index
+    src_instruction = index_table.column("instruction_index")
+    unique_instruction = pc.unique(src_instruction.drop_null())
+    first_use = pc.index_in(unique_instruction, src_instruction)
+    unique_instruction = unique_instruction.take(pc.sort_indices(first_use))
+    src_instruction_indices = unique_instruction.to_pylist()
+    instruction_map: dict[int, int] = {}
+    for instruction_index, instruction in zip(
+        src_instruction_indices,
+        dataset.get_meta(Instruction, src_instruction_indices),
+        strict=True,
+    ):
+        instruction_map[instruction_index] = registry.get_or_create(
+            InstructionData(
+                name=instruction.name, json_content=instruction.json_content
+            ),
+            index_state,
+        ).index
+
+    episode_robot = [robot_map[i] for i in src_robot]
+    episode_task = [task_map[i] for i in src_task]
+    # map the frames to the new meta indices by table lookups. Null indices
+    # in `take` keep the frames without meta as null.
+    frame_episode_indices = pa.array(frame_episode)
+    new_instruction = pa.array(list(instruction_map.values()), type=pa.int64())
+    new_index_columns = {
+        "index": pa.array(np.arange(len(frames), dtype=np.int64)),
+        "episode_index": pa.array(frame_episode.astype(np.int64)),
+        "frame_index": pa.array(
+            np.arange(len(frames), dtype=np.int64)
+            - np.repeat(episode_begin, episode_frame_num)
+        ),
+        "robot_index": pa.array(episode_robot, type=pa.int64()).take(
+            frame_episode_indices
+        ),
+        "task_index": pa.array(episode_task, type=pa.int64()).take(
+            frame_episode_indices
+        ),
+        "instruction_index": new_instruction.take(
+            pc.index_in(
+                src_instruction.combine_chunks(),
+                value_set=unique_instruction,
+            )
+        ),
+    }
+
+    os.makedirs(target_path)
+    engine = create_engine(
+        url=URL.create(
+            drivername=database_driver,
+            database=os.path.join(target_path, f"meta_db.{database_driver}"),
+        ),
+        echo=False,
+    )
+    create_tables(engine=engine, base=DatasetORMBase)
+    with Session(engine) as session:
+        registry.flush(session)
+        session.add_all(
+            Episode(
+                index=i,
+                dataset_begin_index=int(begin),
+                frame_num=int(frame_num),
+                robot_index=episode_robot[i],
+                task_index=episode_task[i],
+            )
+            for i, (begin, frame_num) in enumerate(
+                zip(episode_begin, episode_frame_num, strict=True)
+            )
+        )
+        session.commit()
+    engine.dispose()
+
+    # keep the same column order as packaging.
+    features = hg_datasets.Features(
+        {
+            k: v
+            for k, v in frame_dataset.features.items()
+            if k not in PreservedIndexColumnsKeys
+        }
+    )
+    for k in PreservedIndexColumnsKeys:
+        features[k] = frame_dataset.features[k]
+    arrow_files = _write_arrow_shards(
+        frame_dataset=frame_dataset,
+        frames=frames,
+        new_index_columns=new_index_columns,
+        features=features,
+        target_path=target_path,
+        writer_batch_size=writer_batch_size,
+        max_shard_size=convert_file_size_to_int(max_shard_size),
+    )
+
+    info = frame_dataset.info.copy()
+    info.features = features
+    info.write_to_directory(target_path)
+    state = {
+        "_data_files": [{"filename": f} for f in arrow_files],
+        "_fingerprint": Hasher.hash(
+            [frame_dataset._fingerprint, frames, list(features.keys())]
+        ),
+        "_format_columns": None,
+        "_format_kwargs": {},
+        "_format_type": None,
+        "_output_all_columns": False,
+        "_split": str(frame_dataset.split)
+        if frame_dataset.split is not None
+        else None,
+        "robo_orchard_state": {
+            "dataset_format_version": dataset_format_version
+        },
+    }
+    with open(
+        os.path.join(
+            target_path, hg_datasets_config.DATASET_STATE_JSON_FILENAME
+        ),
+        "w",
+        encoding="utf-8",
+    ) as state_file:
+        json.dump(state, state_file, indent=2, sort_keys=True)
+
+
+def _write_arrow_shards(
+    frame_dataset: hg_datasets.Dataset,
+    frames: np.ndarray,
+    new_index_columns: dict[str, pa.Array],
+    features: hg_datasets.Features,
+    target_path: str,
+    writer_batch_size: int,
+    max_shard_size: int,
+) -> list[str]:
+    """Copy the rows of `frames` to arrow files with new index columns.
+
+    Returns:
+        list[str]: The arrow file names in `target_path`.
+    """
+    tmp_files: list[str] = []
+    writer: ArrowWriter | None = None
+    shard_size = 0
+    for begin in range(0, max(len(frames), 1), writer_batch_size):
+        end = min(begin + writer_batch_size, len(frames))
+        table = query_table(
+            frame_dataset._data,
+            frames[begin:end].tolist(),
+            indices=frame_dataset._indices,
+        ).select(list(features.keys()))
+        for name, column in new_index_columns.items():
+            table = table.set_column(
+                table.column_names.index(name), name, column[begin:end]
+            )
+        if writer is None:
+            tmp_files.append(
+                os.path.join(target_path, f"data-{len(tmp_files)}.arrow.tmp")
+            )
+            writer = ArrowWriter(
+                features=features,
+                path=tmp_files[-1],
+                writer_batch_size=writer_batch_size,
+            )
+            shard_size = 0
+        writer.write_table(table)
+        shard_size += table.nbytes
+        if shard_size >= max_shard_size:
+            writer.finalize()
+            writer = None
+    if writer is not None:
+        writer.finalize()
+
+    num_shards = len(tmp_files)
+    digits = max(5, len(str(num_shards)))
+    ret = []
+    for i, tmp_file in enumerate(tmp_files):
+        file_name = f"data-{i:0{digits}d}-of-{num_shards:0{digits}d}.arrow"
+        os.rename(tmp_file, os.path.join(target_path, file_name))
+        ret.append(file_name)
+    return ret
@@ -15,17 +15,30 @@
 # permissions and limitations under the License.
 
 from __future__ import annotations
+import hashlib
+import os
+import shutil
+import tempfile
+import warnings
 from abc import ABCMeta, abstractmethod
-from typing import Type, TypeVar
+from typing import Literal, Sequence, Type, TypeVar
 
+import numpy as np
+import pyarrow.compute as pc
 from datasets import Dataset as HFDataset
 from robo_orchard_core.utils.config import (
     ClassConfig,
     ClassInitFromConfigMixin,
 )
 from sortedcontainers import SortedList
+from sqlalchemy import Engine, select
+from sqlalchemy.orm import Session
+
+from robo_orchard_lab.dataset.robot.db_orm import Episode
 
 __all__ = [
+    "EpisodeBoundaryTable",
+    "EpisodeTimestampIndex",
     "DeltaTimestampSampler",
     "DeltaTimestampSamplerConfig",
     "MultiRowSampler",
@@ -33,14 +46,379 @@ __all__ = [
 ]
 
 
+class EpisodeTimestampIndex:
+    """Array-backed index of episode and timestamp columns.
+
+    The index keeps the `episode_index`, `timestamp_min` and
+    `timestamp_max` columns of an index dataset as contiguous numpy arrays,
+    together with the row boundaries of each episode block. It allows
+    samplers to locate episode boundaries and frames in a timestamp range
+    with vectorized lookups instead of walking rows one by one.
+
+    The index can be persisted as a folder of `.npy` files and loaded with
+    memory mapping, so that all dataloader workers share the same pages.
+
+    Note:
+        The index relies on the assumption that the index dataset is
+        ordered by episode_index and timestamp, which is guaranteed by
+        :class:`~robo_orchard_lab.dataset.robot.packaging.DatasetPackaging`.
+
+    Args:
+        episode_index (np.ndarray): The episode index of each row.
+        timestamp_min (np.ndarray): The minimum timestamp of each row
+            in nanoseconds. Null timestamps are stored as 0.
+        timestamp_max (np.ndarray): The maximum timestamp of each row
+            in nanoseconds. Null timestamps are stored as 0.
+        block_begin (np.ndarray): The first row of each episode block,
+            followed by the total number of rows.
+        block_has_null (np.ndarray): Whether each episode block contains
+            rows with null timestamps.
+    """
+
+    cache_folder_name: str = "index_cache"
+    """The folder name to persist the index next to the arrow files."""
+
+    _array_names: tuple[str, ...] = (
+        "episode_index",
+        "timestamp_min",
+        "timestamp_max",
+        "block_begin",
+        "block_has_null",
+    )
+
+    def __init__(
+        self,
+        episode_index: np.ndarray,
+        timestamp_min: np.ndarray,
+        timestamp_max: np.ndarray,
+        block_begin: np.ndarray,
+        block_has_null: np.ndarray,
+    ):
+        self.episode_index = episode_index
+        self.timestamp_min = timestamp_min
+        self.timestamp_max = timestamp_max
+        self.block_begin = block_begin
+        self.block_has_null = block_has_null
+
+    def __len__(self) -> int:
+        return len(self.episode_index)
+
+    @classmethod
+    def from_index_dataset(cls, dataset: HFDataset) -> EpisodeTimestampIndex:
+        """Build the index from a dataset with preserved index columns.
+
+        All columns are converted with arrow compute functions, so no
+        python object is created for each row.
+        """
+        table = dataset.select_columns(
+            ["episode_index", "timestamp_min", "timestamp_max"]
+        ).with_format("arrow")[:]
+
+        def to_int64(name: str) -> tuple[np.ndarray, np.ndarray]:
+            col = table.column(name)
+            is_null = col.is_null().to_numpy(zero_copy_only=False)
+            values = pc.fill_null(col, 0).to_numpy().astype(np.int64)
+            return values, is_null
+
+        episode_index, _ = to_int64("episode_index")
+        ts_min, ts_min_null = to_int64("timestamp_min")
+        ts_max, ts_max_null = to_int64("timestamp_max")
+
+        num_rows = len(episode_index)
+        block_begin = np.concatenate(
+            [
+                np.zeros(1 if num_rows > 0 else 0, dtype=np.int64),
+                np.flatnonzero(np.diff(episode_index) != 0) + 1,
+                np.array([num_rows], dtype=np.int64),
+            ]
+        ).astype(np.int64)
+        row_null = ts_min_null | ts_max_null
+        if num_rows > 0:
+            block_has_null = np.logical_or.reduceat(row_null, block_begin[:-1])
+        else:
+            block_has_null = np.zeros(0, dtype=bool)
+        return cls(
+            episode_index=episode_index,
+            timestamp_min=ts_min,
+            timestamp_max=ts_max,
+            block_begin=block_begin,
+            block_has_null=block_has_null.astype(bool),
+        )
+
+    def save(self, path: str) -> None:
+        """Save the index to a folder.
+
+        The folder is written to a temporary location first and then
+        renamed, so concurrent writers never expose a partial index.
+        If the folder already exists, it is left untouched.
+        """
+        if os.path.exists(path):
+            return
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=".tmp_", dir=parent)
+        try:
+            for name in self._array_names:
+                np.save(
+                    os.path.join(tmp_path, f"{name}.npy"),
+                    np.ascontiguousarray(getattr(self, name)),
+                )
+            os.rename(tmp_path, path)
+        except OSError:
+            if not os.path.exists(path):
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> EpisodeTimestampIndex:
+        """Load the index from a folder created by :meth:`save`.
+
+        Args:
+            path (str): The folder of the index.
+            mmap (bool, optional): Whether to memory-map the arrays
+                instead of reading them into memory. Defaults to True.
+        """
+        mmap_mode = "r" if mmap else None
+        return cls(
+            **{
+                name: np.load(
+                    os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode
+                )
+                for name in cls._array_names
+            }
+        )
+
+    @staticmethod
+    def get_cache_path(dataset: HFDataset) -> str | None:
+        """Get the folder to persist the index of the dataset.
+
+        The folder is located next to the arrow files and is keyed by the
+        fingerprint of the dataset and the name, size and modification time
+        of all arrow files. Returns None if the dataset is not backed by
+        arrow files or has an indices mapping (e.g. after `select` with
+        non-contiguous indices), in
+        which case the index should be kept in memory only.
+        """
+        cache_files = dataset.cache_files
+        if len(cache_files) == 0 or dataset._indices is not None:
+            return None
+        md5 = hashlib.md5(str(dataset._fingerprint).encode("utf-8"))
+        for f in cache_files:
+            stat = os.stat(f["filename"])
+            md5.update(
+                f"{os.path.basename(f['filename'])}:{stat.st_size}:"
+                f"{stat.st_mtime_ns}".encode("utf-8")
+            )
+        return os.path.join(
+            os.path.dirname(cache_files[0]["filename"]),
+            EpisodeTimestampIndex.cache_folder_name,
+            md5.hexdigest(),
+        )
+
+    @classmethod
+    def load_or_build(cls, dataset: HFDataset) -> EpisodeTimestampIndex:
+        """Load the persisted index of the dataset, or build it.
+
+        If the index is not persisted yet, it is built once and saved
+        next to the arrow files. Failures to save the index (e.g. read-only
+        file system) are reported as warnings and the in-memory index is
+        returned.
+        """
+        cache_path = cls.get_cache_path(dataset)
+        if cache_path is not None and os.path.exists(cache_path):
+            return cls.load(cache_path, mmap=True)
+        ret = cls.from_index_dataset(dataset)
+        if cache_path is not None:
+            try:
+                ret.save(cache_path)
+            except OSError as e:
+                warnings.warn(
+                    f"Failed to persist episode timestamp index to "
+                    f"{cache_path}: {e}"
+                )
+        return ret
+
+    def episode_range(
+        self, rows: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the episode block of each row.
+
+        Args:
+            rows (np.ndarray): The row indices.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The block id, the
+            first row (included) and the last row (excluded) of the episode
+            block for each row.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        block = np.searchsorted(self.block_begin, rows, side="right") - 1
+        return block, self.block_begin[block], self.block_begin[block + 1]
+
+    def search_frames(
+        self,
+        rows: np.ndarray,
+        ts_min: np.ndarray,
+        ts_max: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find frames in the same episode that overlap a timestamp range.
+
+        Args:
+            rows (np.ndarray): The row indices which define the episode to
+                search in.
+            ts_min (np.ndarray): The minimum timestamp in nanoseconds for
+                each row.
+            ts_max (np.ndarray): The maximum timestamp in nanoseconds
+                (included) for each row.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The first and the last row that
+            overlap the range. -1 is filled if there is no such row.
+        """
+        block, begin, end = self.episode_range(rows)
+        if np.any(self.block_has_null[block]):
+            raise ValueError(
+                "Frame must have both timestamp_min and timestamp_max defined."
+            )
+        # any row after first has candidate_ts_max >= ts_min
+        first = _range_searchsorted(
+            self.timestamp_max, ts_min, begin, end, side="left"
+        )
+        # any row before last has candidate_ts_min <= ts_max
+        last = (
+            _range_searchsorted(
+                self.timestamp_min, ts_max, begin, end, side="right"
+            )
+            - 1
+        )
+        not_found = first > last
+        first[not_found] = -1
+        last[not_found] = -1
+        return first, last
+
+
+def _range_searchsorted(
+    arr: np.ndarray,
+    values: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    side: Literal["left", "right"] = "left",
+) -> np.ndarray:
+    """Vectorized `np.searchsorted` in a different sub-range for each value.
+
+    `arr[lo[i]:hi[i]]` should be sorted for each `i`. The binary search is
+    performed for all values at once, so the number of iterations only
+    depends on the length of the longest sub-range.
+    """
+    lo = np.array(lo, dtype=np.int64, copy=True)
+    hi = np.array(hi, dtype=np.int64, copy=True)
+    values = np.asarray(values)
+    active = lo < hi
+    while np.any(active):
+        mid = (lo + hi) // 2
+        mid_values = arr[np.where(active, mid, 0)]
+        if side == "left":
+            go_right = mid_values < values
+        else:
+            go_right = mid_values <= values
+        go_right &= active
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+        active = lo < hi
+    return lo
+
+
+class EpisodeBoundaryTable:
+    """Precomputed row boundaries of all episodes in a dataset.
+
+    The table is built from the `dataset_begin_index` and `frame_num`
+    columns of the episode table in the meta database, and is indexed
+    by episode index. The boundaries are absolute frame indices, i.e.,
+    the values of the `index` column.
+
+    Args:
+        begin (np.ndarray): The first frame index of each episode. -1 is
+            filled for missing episodes.
+        frame_num (np.ndarray): The number of frames of each episode.
+    """
+
+    def __init__(self, begin: np.ndarray, frame_num: np.ndarray):
+        self.begin = begin
+        self.frame_num = frame_num
+
+    def __len__(self) -> int:
+        return len(self.begin)
+
+    @classmethod
+    def from_db(cls, engine: Engine) -> EpisodeBoundaryTable:
+        """Build the table with one query to the meta database."""
+        stmt = select(
+            Episode.index, Episode.dataset_begin_index, Episode.frame_num
+        )
+        with Session(engine) as session:
+            rows = session.execute(stmt).all()
+        size = max((row[0] for row in rows), default=-1) + 1
+        begin = np.full(size, -1, dtype=np.int64)
+        frame_num = np.zeros(size, dtype=np.int64)
+        for episode_index, dataset_begin_index, num in rows:
+            if dataset_begin_index is None or num is None:
+                continue
+            begin[episode_index] = dataset_begin_index
+            frame_num[episode_index] = num
+        return cls(begin=begin, frame_num=frame_num)
+
+    def get_range(self, episode_index: int) -> tuple[int, int] | None:
+        """Get the first and the last (included) frame index of an episode.
+
+        Returns None if the episode is not found.
+        """
+        if episode_index < 0 or episode_index >= len(self.begin):
+            return None
+        begin = int(self.begin[episode_index])
+        if begin < 0:
+            return None
+        return begin, begin + int(self.frame_num[episode_index]) - 1
+
+
 class CachedIndexDataset:
-    def __init__(self, dataset: HFDataset):
+    """A row cache over the index dataset.
+
+    Args:
+        dataset (HFDataset): The index dataset.
+        timestamp_index (EpisodeTimestampIndex | None, optional): The
+            array-backed index of the same dataset. Samplers that support
+            vectorized lookups use it instead of reading rows. Defaults
+            to None.
+        episode_boundaries (EpisodeBoundaryTable | None, optional): The
+            episode boundaries from the meta database. Samplers use it to
+            find the rows of an episode without scanning. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        dataset: HFDataset,
+        timestamp_index: EpisodeTimestampIndex | None = None,
+        episode_boundaries: EpisodeBoundaryTable | None = None,
+    ):
         self._dataset = dataset
         self._cache = {}
+        self.timestamp_index = timestamp_index
+        self.episode_boundaries = episode_boundaries
 
     def __len__(self) -> int:
         return len(self._dataset)
 
+    @property
+    def is_contiguous(self) -> bool:
+        """Whether the rows are a contiguous slice of the dataset table.
+
+        Rows of a dataset after a non-contiguous `select`, `shuffle` or
+        `filter` are mapped through an indices table, so row positions are
+        not frame indices shifted by a constant.
+        """
+        return getattr(self._dataset, "_indices", None) is None
+
     def _cache_chunk(self, index: int) -> None:
         """Cache a chunk of the dataset at the given index."""
         min_idx = max(0, index - 100)
@@ -130,6 +508,37 @@ class MultiRowSampler(ClassInitFromConfigMixin, metaclass=ABCMeta):
             "This method should be implemented by subclasses."
         )
 
+    def sample_row_idx_batch(
+        self,
+        index_dataset: HFDataset | CachedIndexDataset,
+        indices: Sequence[int],
+    ) -> dict[str, list[list[int | None]]]:
+        """Sample lists of row indices for a batch of indices.
+
+        The default implementation calls :meth:`sample_row_idx` for each
+        index. Subclasses should override this method if the sampling can
+        be computed for the whole batch at once.
+
+        Args:
+            index_dataset (HFDataset): The dataset from which to sample rows.
+            indices (Sequence[int]): The indices to sample.
+
+        Returns:
+            dict[str, list[list[int | None]]]: A dictionary where keys are
+            column names and values are lists of row indices for each
+            index in `indices`.
+
+        """
+        ret: dict[str, list[list[int | None]]] = {
+            k: [] for k in self.column_rows_keys
+        }
+        for index in indices:
+            for column, rows in self.sample_row_idx(
+                index_dataset, index
+            ).items():
+                ret[column].append(rows)
+        return ret
+
     @property
     @abstractmethod
     def column_rows_keys(self) -> dict[str, list]:
@@ -259,6 +668,17 @@ class DeltaTimestampSampler(MultiRowSampler):
     def sample_row_idx(
         self, index_dataset: HFDataset | CachedIndexDataset, index: int
     ) -> dict[str, list[int | None]]:
+        if (
+            isinstance(index_dataset, CachedIndexDataset)
+            and index_dataset.timestamp_index is not None
+        ):
+            return {
+                column: rows[0]
+                for column, rows in self.sample_row_idx_batch(
+                    index_dataset, [index]
+                ).items()
+            }
+
         cur_row = index_dataset[index]
         cache = self._prepare_cache(index_dataset, index)
         ret: dict[str, list[int | None]] = {}
@@ -291,6 +711,74 @@ class DeltaTimestampSampler(MultiRowSampler):
             ret[column] = sampled_rows
         return ret
 
+    def sample_row_idx_batch(
+        self,
+        index_dataset: HFDataset | CachedIndexDataset,
+        indices: Sequence[int],
+    ) -> dict[str, list[list[int | None]]]:
+        if isinstance(index_dataset, CachedIndexDataset):
+            timestamp_index = index_dataset.timestamp_index
+        else:
+            timestamp_index = None
+        if timestamp_index is None:
+            return super().sample_row_idx_batch(index_dataset, indices)
+
+        sampled = self._sample_with_timestamp_index(
+            timestamp_index, np.asarray(indices, dtype=np.int64)
+        )
+        ret: dict[str, list[list[int | None]]] = {}
+        for column, rows in sampled.items():
+            rows_list: list = rows.tolist()
+            if np.any(rows < 0):
+                rows_list = [
+                    [None if i < 0 else i for i in row] for row in rows_list
+                ]
+            ret[column] = rows_list
+        return ret
+
+    def _sample_with_timestamp_index(
+        self, timestamp_index: EpisodeTimestampIndex, indices: np.ndarray
+    ) -> dict[str, np.ndarray]:
+        """Sample row indices for all indices with vectorized lookups.
+
+        Args:
+            timestamp_index (EpisodeTimestampIndex): The array-backed index
+                of the index dataset.
+            indices (np.ndarray): The row indices to sample.
+
+        Returns:
+            dict[str, np.ndarray]: A dictionary where keys are column names
+            and values are arrays of shape (len(indices), num_delta_ts).
+            -1 is filled for rows that are not found.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        tolerance = self.cfg.tolerance
+        ret: dict[str, np.ndarray] = {}
+        for column, delta_ts_list in self.cfg.column_delta_ts.items():
+            sampled_rows = np.empty(
+                (len(indices), len(delta_ts_list)), dtype=np.int64
+            )
+            for j, delta_ts in enumerate(delta_ts_list):
+                if delta_ts == 0:
+                    # if delta_ts is 0, we just return the current row
+                    sampled_rows[:, j] = indices
+                    continue
+                ts_min = timestamp_index.timestamp_min[indices] + sec2nanosec(
+                    delta_ts - tolerance
+                )
+                ts_max = timestamp_index.timestamp_max[indices] + sec2nanosec(
+                    delta_ts + tolerance
+                )
+                first, last = timestamp_index.search_frames(
+                    indices, ts_min, ts_max
+                )
+                # return the nearest row. If look ahead, return the first
+                # row that matches the delta timestamp. If look behind,
+                # return the last row that matches the delta timestamp.
+                sampled_rows[:, j] = first if delta_ts > 0 else last
+            ret[column] = sampled_rows
+        return ret
+
     def _prepare_cache(
         self,
         index_dataset: HFDataset | CachedIndexDataset,
@@ -0,0 +1,305 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Convert RoboTwin LMDB datasets to the RoboOrchard dataset format."""
+
+from __future__ import annotations
+from typing import Generator
+
+import datasets as hg_datasets
+import numpy as np
+import torch
+from scipy.spatial.transform import Rotation
+
+from robo_orchard_lab.dataset.datatypes import (
+    BatchCameraDataEncoded,
+    BatchFrameTransform,
+    BatchJointsState,
+)
+from robo_orchard_lab.dataset.lmdb.base_lmdb_dataset import BaseIndexData
+from robo_orchard_lab.dataset.robot.packaging import (
+    DataFrame,
+    DatasetPackaging,
+    EpisodeData,
+    EpisodeMeta,
+    EpisodePackaging,
+    InstructionData,
+    RobotData,
+    TaskData,
+)
+from robo_orchard_lab.dataset.robotwin.robotwin_lmdb_dataset import (
+    RoboTwinLmdbDataset,
+)
+
+__all__ = [
+    "RoboTwinLmdbEpisodePackaging",
+    "robotwin_lmdb_features",
+    "convert_robotwin_lmdb_to_rodataset",
+]
+
+
+def robotwin_lmdb_features(cam_names: list[str]) -> hg_datasets.Features:
+    """Get the features of a RoboOrchard dataset converted from LMDB.
+
+    The columns follow the layout read by
+    :class:`~robo_orchard_lab.dataset.robotwin.transforms.ArrowDataParse`:
+
+    - `{cam_name}`: The encoded image, intrinsic and pose of each camera.
+    - `{cam_name}_depth`: The encoded depth image of each camera, in
+      millimeters.
+    - `joints` and `actions`: The joint positions. RoboTwin LMDBs only
+      store the joint action vector, which is used for both.
+    - `ee_state`: The flattened end-effector poses.
+
+    Args:
+        cam_names (list[str]): The camera names.
+
+    Returns:
+        hg_datasets.Features: The features of the dataset.
+    """
+    features = {}
+    for cam_name in cam_names:
+        features[cam_name] = BatchCameraDataEncoded.dataset_feature(
+            dtype="float64"
+        )
+        features[f"{cam_name}_depth"] = BatchCameraDataEncoded.dataset_feature(
+            dtype="float64"
+        )
+    features["joints"] = BatchJointsState.dataset_feature(dtype="float64")
+    features["actions"] = BatchJointsState.dataset_feature(dtype="float64")
+    features["ee_state"] = hg_datasets.Sequence(hg_datasets.Value("float64"))
+    return hg_datasets.Features(features)
+
+
+class RoboTwinLmdbEpisodePackaging(EpisodePackaging):
+    """Package an episode of a RoboTwin LMDB dataset.
+
+    Encoded images and depths are carried over as they are stored in the
+    LMDB, without decoding and re-encoding.
+
+    The instances are picklable, so that they can be packaged in parallel
+    with `num_proc` of :meth:`DatasetPackaging.packaging`. The LMDBs of the
+    dataset are reopened in each process.
+
+    Args:
+        dataset (RoboTwinLmdbDataset): The dataset to convert from.
+        episode (int): The position of the episode in the dataset.
+    """
+
+    def __init__(self, dataset: RoboTwinLmdbDataset, episode: int):
+        self.dataset = dataset
+        self.episode = episode
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(paths={self.dataset.paths}, "
+            f"episode={self.episode})"
+        )
+
+    def _episode_keys(self) -> tuple[int, str]:
+        return (
+            self.dataset.lmdb_indices[self.episode],
+            self.dataset.episode_indices[self.episode],
+        )
+
+    def generate_episode_meta(self) -> EpisodeMeta:
+        lmdb_index, episode_index = self._episode_keys()
+        idx_data = BaseIndexData.model_validate(
+            self.dataset.idx_lmdbs[lmdb_index][episode_index]
+        )
+        robot = (
+            RobotData(name=idx_data.embodiment, urdf_content="")
+            if idx_data.embodiment is not None
+            else None
+        )
+        return EpisodeMeta(
+            episode=EpisodeData(),
+            robot=robot,
+            task=TaskData(name=idx_data.task_name),
+        )
+
+    def generate_frames(self) -> Generator[DataFrame, None, None]:
+        lmdb_index, episode_index = self._episode_keys()
+        dataset = self.dataset
+        episode = dataset._get_episode(lmdb_index, episode_index)
+        uuid = episode["uuid"]
+        cam_names = episode["cam_names"]
+
+        instructions = episode["instructions"]
+        if isinstance(instructions, str):
+            instructions = [instructions]
+        instruction = InstructionData(
+            name=uuid,
+            json_content={
+                "description": instructions[0] if instructions else "",
+                "instructions": instructions,
+            },
+        )
+
+        num_steps = len(episode["joint_state"])
+        for step_index in range(num_steps):
+            frame_keys = [
+                f"{uuid}/{cam_name}/{step_index}" for cam_name in cam_names
+            ]
+            images = dataset.img_lmdbs[lmdb_index].get_multi(frame_keys)
+            depths = dataset.depth_lmdbs[lmdb_index].get_multi(frame_keys)
+            features = {}
+            for i, cam_name in enumerate(cam_names):
+                T_world2cam = episode["T_world2cam"][i]  # noqa: N806
+                if T_world2cam.ndim == 3:  # for dynamic camera
+                    T_world2cam = T_world2cam[step_index]  # noqa: N806
+                features[cam_name] = BatchCameraDataEncoded(
+                    frame_id=cam_name,
+                    sensor_data=[_to_bytes(images[i])],
+                    format=_image_format(images[i]),
+                    intrinsic_matrices=torch.from_numpy(
+                        episode["intrinsic"][i][None, :3, :3].copy()
+                    ),
+                    pose=_camera_pose(T_world2cam, cam_name),
+                )
+                features[f"{cam_name}_depth"] = BatchCameraDataEncoded(
+                    frame_id=cam_name,
+                    sensor_data=[_to_bytes(depths[i])],
+                    format=_image_format(depths[i]),
+                )
+            joints = BatchJointsState(
+                position=torch.from_numpy(
+                    episode["joint_state"][step_index][None].astype(np.float64)
+                )
+            )
+            features["joints"] = joints
+            features["actions"] = joints
+            features["ee_state"] = episode["ee_state"][step_index].astype(
+                np.float64
+            )
+            yield DataFrame(features=features, instruction=instruction)
+
+
+def convert_robotwin_lmdb_to_rodataset(
+    dataset: RoboTwinLmdbDataset,
+    dataset_path: str,
+    num_proc: int | None = None,
+    **kwargs,
+) -> None:
+    """Convert a RoboTwin LMDB dataset to a RoboOrchard dataset.
+
+    All episodes of the dataset are converted, so the episodes can be
+    selected with `task_names` and `num_episode` of the dataset. Images
+    and depths must be loaded by the dataset.
+
+    Args:
+        dataset (RoboTwinLmdbDataset): The dataset to convert from.
+        dataset_path (str): The path to save the RoboOrchard dataset.
+        num_proc (int | None, optional): The number of processes to convert
+            the episodes with. Default: None.
+        **kwargs: Other arguments of :meth:`DatasetPackaging.packaging`.
+    """
+    if not (dataset.load_image and dataset.load_depth):
+        raise ValueError("Images and depths must be loaded by the dataset.")
+    if dataset.num_episode == 0:
+        raise ValueError("The dataset has no episodes to convert.")
+    cam_names = dataset.cam_names
+    if cam_names is None:
+        cam_names = dataset._get_episode(
+            dataset.lmdb_indices[0], dataset.episode_indices[0]
+        )["cam_names"]
+    if num_proc is not None and num_proc > 1:
+        # lmdb refuses to open an environment that is already open in the
+        # process, which includes the ones inherited by forked workers.
+        # They are reopened on the next read.
+        for lmdbs in (
+            dataset.idx_lmdbs,
+            dataset.meta_lmdbs,
+            dataset.img_lmdbs,
+            dataset.depth_lmdbs,
+        ):
+            for lmdb in lmdbs:
+                lmdb.close()
+    DatasetPackaging(features=robotwin_lmdb_features(cam_names)).packaging(
+        episodes=[
+            RoboTwinLmdbEpisodePackaging(dataset, i)
+            for i in range(dataset.num_episode)
+        ],
+        dataset_path=dataset_path,
+        num_proc=num_proc,
+        **kwargs,
+    )
+
+
+def _to_bytes(buffer: bytes | np.ndarray) -> bytes:
+    if isinstance(buffer, np.ndarray):
+        return buffer.tobytes()
+    return bytes(buffer)
+
+
+def _image_format(buffer: bytes | np.ndarray) -> str:
+    header = _to_bytes(buffer[:8])
+    if header.startswith(b"\x89PNG"):
+        return "png"
+    if header.startswith(b"\xff\xd8"):
+        return "jpeg"
+    raise ValueError(f"Unknown image format with header {header!r}")
+
+
+def _camera_pose(
+    T_world2cam: np.ndarray,  # noqa: N803
+    cam_name: str,
+) -> BatchFrameTransform:
+    """Get the pose of the camera in world frame."""
+    T_cam2world = np.linalg.inv(T_world2cam)  # noqa: N806
+    quat = Rotation.from_matrix(T_cam2world[:3, :3]).as_quat(scalar_first=True)
+    return BatchFrameTransform(
+        xyz=torch.from_numpy(T_cam2world[None, :3, 3].copy()),
+        quat=torch.from_numpy(quat[None].copy()),
+        parent_frame_id="world",
+        child_frame_id=cam_name,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    from robo_orchard_lab.utils import log_basic_config
+
+    log_basic_config(
+        format="%(asctime)s %(levelname)s:%(lineno)d %(message)s",
+        level=logging.INFO,
+    )
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_path", type=str)
+    parser.add_argument("--output_path", type=str)
+    parser.add_argument("--task_names", type=str, default=None)
+    parser.add_argument("--cam_names", type=str, default=None)
+    parser.add_argument("--num_proc", type=int, default=None)
+    parser.add_argument("--force_overwrite", action="store_true")
+    args = parser.parse_args()
+
+    dataset = RoboTwinLmdbDataset(
+        paths=args.input_path.split(","),
+        task_names=(
+            None if args.task_names is None else args.task_names.split(",")
+        ),
+        cam_names=(
+            None if args.cam_names is None else args.cam_names.split(",")
+        ),
+    )
+    convert_robotwin_lmdb_to_rodataset(
+        dataset,
+        args.output_path,
+        num_proc=args.num_proc,
+        force_overwrite=args.force_overwrite,
+    )
@@ -18,6 +18,7 @@ import copy
 import json
 import logging
 import os
+from collections import OrderedDict
 from typing import List
 
 import cv2
@@ -69,6 +70,11 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
     .. code-block:: text
 
         {uuid}/{cam_name}/{step_idx}
+
+    The index and meta data of the most recently used episodes are cached
+    after decoding, so that reading the consecutive samples of an episode
+    only reads the images and depths. Each process keeps its own cache of
+    at most `episode_cache_size` episodes.
     """
 
     DEFAULT_INSTRUCTIONS = {
@@ -111,6 +117,10 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
         default_space="base",
         instructions=None,
         instruction_keys=("seen", "unseen"),
+        read_timeout=None,
+        zero_copy=False,
+        episode_cache_size=8,
+        index_cache_dir=None,
     ):
         super().__init__(
             paths=paths,
@@ -121,6 +131,9 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
             task_names=task_names,
             lazy_init=lazy_init,
             num_episode=num_episode,
+            read_timeout=read_timeout,
+            zero_copy=zero_copy,
+            index_cache_dir=index_cache_dir,
         )
         self.cam_names = cam_names
         if T_base2world is None:
@@ -141,6 +154,14 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
         self.default_space = default_space
         self.load_instructions(instructions)
         self.instruction_keys = instruction_keys
+        self.episode_cache_size = episode_cache_size
+        self._episode_cache = OrderedDict()
+
+    def __getstate__(self):
+        # the lmdbs are closed when pickled, which invalidates zero-copy
+        # arrays in the cache. Each process keeps its own episode cache.
+        self._episode_cache = OrderedDict()
+        return self.__dict__
 
     def load_instructions(self, instructions):
         if instructions is None:
@@ -153,41 +174,34 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
             self.instructions = instructions
 
     def __getitem__(self, index):
-        lmdb_index, episode_index, step_index = self._get_indices(index)
-
-        idx_data = BaseIndexData.model_validate(
-            self.idx_lmdbs[lmdb_index][episode_index]
-        )
-        uuid = idx_data.uuid
-        task_name = idx_data.task_name
-        if self.cam_names is not None:
-            cam_names = self.cam_names
-        else:
-            cam_names = self.meta_lmdbs[lmdb_index][f"{uuid}/camera_names"]
+        with self._watch_read(index):
+            data = self._read_data(index)
+        for transform in self.transforms:
+            if transform is None:
+                continue
+            data = transform(data)
+        return data
 
-        _T_world2cam = self.meta_lmdbs[lmdb_index][f"{uuid}/extrinsic"]  # noqa: N806
-        _intrinsic = self.meta_lmdbs[lmdb_index][f"{uuid}/intrinsic"]
+    def _read_data(self, index):
+        lmdb_index, episode_index, step_index = self._get_indices(index)
+        episode = self._get_episode(lmdb_index, episode_index)
+        uuid = episode["uuid"]
+        cam_names = episode["cam_names"]
 
+        frame_keys = [
+            f"{uuid}/{cam_name}/{step_index}" for cam_name in cam_names
+        ]
         if self.load_image:
             images = []
-        if self.load_depth:
-            depths = []
-
-        T_world2cam = []  # noqa: N806
-        intrinsic = []
-        for cam_name in cam_names:
-            if self.load_image:
-                image = self.img_lmdbs[lmdb_index][
-                    f"{uuid}/{cam_name}/{step_index}"
-                ]
+            for image in self.img_lmdbs[lmdb_index].get_multi(frame_keys):
                 if isinstance(image, bytes):
                     image = np.frombuffer(image, np.uint8)
                 image = cv2.imdecode(image, cv2.IMREAD_UNCHANGED)
                 images.append(image)
-            if self.load_depth:
-                depth = self.depth_lmdbs[lmdb_index][
-                    f"{uuid}/{cam_name}/{step_index}"
-                ]
+            images = np.stack(images)
+        if self.load_depth:
+            depths = []
+            for depth in self.depth_lmdbs[lmdb_index].get_multi(frame_keys):
                 if isinstance(depth, bytes):
                     depth = np.frombuffer(depth, np.uint8)
                 depth = (
@@ -198,42 +212,23 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
                     / 1000
                 )
                 depths.append(depth)
-
-            _tmp = np.eye(4)
-            if _T_world2cam[cam_name].ndim == 3:  # for dynamic camera
-                _tmp[:3] = _T_world2cam[cam_name][step_index][:3]
-            else:  # ndim == 2, for fixed camera
-                _tmp[:3] = _T_world2cam[cam_name][:3]
-            T_world2cam.append(_tmp)
-
-            _tmp = np.eye(4)
-            _tmp[:3, :3] = _intrinsic[cam_name][:3, :3]
-            intrinsic.append(_tmp)
-
-        if self.load_image:
-            images = np.stack(images)
-        if self.load_depth:
             depths = np.stack(depths)
-        T_world2cam = np.stack(T_world2cam)  # noqa: N806
-        intrinsic = np.stack(intrinsic)
 
-        joint_state = self.meta_lmdbs[lmdb_index][
-            f"{uuid}/observation/robot_state/joint_positions"
-        ]
-        ee_state = self.meta_lmdbs[lmdb_index][
-            f"{uuid}/observation/robot_state/cartesian_position"
-        ]
-        if ee_state.ndim == 3:
-            ee_state = ee_state.reshape(ee_state.shape[0], -1)
+        T_world2cam = np.stack(  # noqa: N806
+            [
+                x[step_index] if x.ndim == 3 else x  # dynamic or fixed
+                for x in episode["T_world2cam"]
+            ]
+        )
 
         data = dict(
             uuid=uuid,
             step_index=step_index,
-            intrinsic=intrinsic,
+            intrinsic=episode["intrinsic"].copy(),
             T_world2cam=T_world2cam,
-            T_base2world=copy.deepcopy(self.T_base2world),
-            joint_state=joint_state,
-            ee_state=ee_state,
+            T_base2world=self.T_base2world.copy(),
+            joint_state=episode["joint_state"].copy(),
+            ee_state=episode["ee_state"].copy(),
         )
         if self.T_base2ego is not None:
             data["T_base2ego"] = copy.deepcopy(self.T_base2ego)
@@ -242,14 +237,88 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
         if self.load_depth:
             data["depths"] = depths
 
-        instructions = self.meta_lmdbs[lmdb_index][f"{uuid}/instructions"]
+        instructions = episode["instructions"]
+        if isinstance(instructions, str):
+            text = instructions
+        elif len(instructions) == 0:
+            text = ""
+        else:
+            idx = np.random.randint(len(instructions))
+            text = instructions[idx]
+        data["text"] = text
+        return data
+
+    def _get_episode(self, lmdb_index, episode_index):
+        """Get the decoded index and meta data of an episode.
+
+        The episode is read from the cache if possible, otherwise it is
+        read from the LMDBs and put into the cache.
+        """
+        key = (lmdb_index, episode_index)
+        episode = self._episode_cache.get(key)
+        if episode is not None:
+            self._episode_cache.move_to_end(key)
+            return episode
+        episode = self._read_episode(lmdb_index, episode_index)
+        if self.episode_cache_size > 0:
+            self._episode_cache[key] = episode
+            while len(self._episode_cache) > self.episode_cache_size:
+                self._episode_cache.popitem(last=False)
+        return episode
+
+    def _read_episode(self, lmdb_index, episode_index):
+        idx_data = BaseIndexData.model_validate(
+            self.idx_lmdbs[lmdb_index][episode_index]
+        )
+        uuid = idx_data.uuid
+
+        # read all meta data of the episode in one transaction.
+        (
+            cam_names,
+            extrinsic,
+            _intrinsic,
+            joint_state,
+            ee_state,
+            instructions,
+        ) = self.meta_lmdbs[lmdb_index].get_multi(
+            [
+                f"{uuid}/camera_names",
+                f"{uuid}/extrinsic",
+                f"{uuid}/intrinsic",
+                f"{uuid}/observation/robot_state/joint_positions",
+                f"{uuid}/observation/robot_state/cartesian_position",
+                f"{uuid}/instructions",
+            ]
+        )
+        if self.cam_names is not None:
+            cam_names = self.cam_names
+
+        T_world2cam = []  # noqa: N806
+        intrinsic = []
+        for cam_name in cam_names:
+            _extrinsic = extrinsic[cam_name]
+            if _extrinsic.ndim == 3:  # for dynamic camera
+                _tmp = np.tile(np.eye(4), (_extrinsic.shape[0], 1, 1))
+                _tmp[:, :3] = _extrinsic[:, :3]
+            else:  # ndim == 2, for fixed camera
+                _tmp = np.eye(4)
+                _tmp[:3] = _extrinsic[:3]
+            T_world2cam.append(_tmp)
+
+            _tmp = np.eye(4)
+            _tmp[:3, :3] = _intrinsic[cam_name][:3, :3]
+            intrinsic.append(_tmp)
+
+        if ee_state.ndim == 3:
+            ee_state = ee_state.reshape(ee_state.shape[0], -1)
+
         if instructions is None:
             meta_data = self.meta_lmdbs[lmdb_index][f"{uuid}/meta_data"]
             instructions = meta_data.get("instruction")
 
         if instructions is None:
             instructions = self.instructions.get(
-                task_name,
+                idx_data.task_name,
                 self.DEFAULT_INSTRUCTIONS["others"],
             )
         elif isinstance(instructions, dict):
@@ -261,19 +330,15 @@ class RoboTwinLmdbDataset(BaseLmdbManipulationDataset):
                     _tmp.extend(instructions[k])
             instructions = _tmp
 
-        if isinstance(instructions, str):
-            text = instructions
-        elif len(instructions) == 0:
-            text = ""
-        else:
-            idx = np.random.randint(len(instructions))
-            text = instructions[idx]
-        data["text"] = text
-        for transform in self.transforms:
-            if transform is None:
-                continue
-            data = transform(data)
-        return data
+        return dict(
+            uuid=uuid,
+            cam_names=cam_names,
+            T_world2cam=T_world2cam,
+            intrinsic=np.stack(intrinsic),
+            joint_state=joint_state,
+            ee_state=ee_state,
+            instructions=instructions,
+        )
 
     def visualize(
         self,
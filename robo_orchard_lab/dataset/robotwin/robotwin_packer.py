@@ -14,9 +14,12 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
+import collections
+import itertools
 import json
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import cv2
 import h5py
@@ -50,9 +53,11 @@ class RobotwinDataPacker(BaseLmdbManipulationDataPacker):
         camera_name=None,
         config_name=None,
         simulation=True,
+        num_proc=1,
         **kwargs,
     ):
         super().__init__(input_path, output_path, **kwargs)
+        self.num_proc = num_proc
         self.task_names = task_names
         self.embodiment = embodiment
         self.robotwin_aug = robotwin_aug
@@ -132,87 +137,70 @@ class RobotwinDataPacker(BaseLmdbManipulationDataPacker):
         return episodes
 
     def _pack(self):
+        num_proc = max(1, min(self.num_proc, len(self.episodes)))
+        if num_proc == 1:
+            results = map(_load_episode, self.episodes)
+            self._write_episodes(results)
+            return
+
+        # keep a bounded number of loaded episodes in flight, so that
+        # memory does not grow if writing is slower than loading.
+        with ProcessPoolExecutor(max_workers=num_proc) as executor:
+            episodes = iter(self.episodes)
+            futures = collections.deque(
+                executor.submit(_load_episode, ep)
+                for ep in itertools.islice(episodes, 2 * num_proc)
+            )
+
+            def results():
+                while futures:
+                    result = futures.popleft().result()
+                    for ep in itertools.islice(episodes, 1):
+                        futures.append(executor.submit(_load_episode, ep))
+                    yield result
+
+            self._write_episodes(results())
+
+    def _write_episodes(self, results):
         num_valid_ep = 0
-        for ep_id, ep in enumerate(self.episodes):
+        for ep_id, (ep, episode) in enumerate(
+            zip(self.episodes, results, strict=True)
+        ):
             task_name, config_name, ep_path, seed = ep
-            uuid = f"{task_name}_{config_name}_seed{seed}"
-            logger.info(
-                f"start process [{ep_id + 1}/{len(self.episodes)}] {uuid}"
-            )
-            num_steps = 0
-            joint_positions = []
-            cartesian_positions = []
-            extrinsics = {}
-            intrinsics = {}
-            rgbs = {}
-            depths = {}
-
-            with h5py.File(ep_path, "r") as ep_file:
-                # read cartesian positions
-                cartesian_positions = ep_file["endpose"][:]
-
-                # read joint positions
-                joint_positions = ep_file["joint_action"]["vector"][:]
-
-                # read camera data
-                camera_names = []
-                for camera_name, camera_data in ep_file["observation"].items():
-                    camera_names.append(camera_name)
-                    intrinsics[camera_name] = camera_data["intrinsic_cv"][0]
-                    extrinsics[camera_name] = camera_data["extrinsic_cv"][:]
-
-                    rgbs_encode = camera_data["rgb"][:]
-
-                    depths_raw = camera_data["depth"][:]
-                    depths_encode = []
-                    for depth in depths_raw:
-                        assert len(depth.shape) == 2
-                        depth = depth.astype(np.uint16)
-                        ret, depth = cv2.imencode(".PNG", depth)
-                        assert ret
-                        depths_encode.append(depth)
-
-                    rgbs[camera_name] = rgbs_encode
-                    depths[camera_name] = depths_encode
-
-            num_steps = len(cartesian_positions)
-
-            for camera in camera_names:
-                assert len(rgbs[camera]) == num_steps
-                assert len(depths[camera]) == num_steps
+            uuid = episode["uuid"]
+            num_steps = episode["num_steps"]
+            for camera in episode["camera_names"]:
                 for i, (rgb, depth) in enumerate(
-                    zip(rgbs[camera], depths[camera], strict=False)
+                    zip(
+                        episode["rgbs"][camera],
+                        episode["depths"][camera],
+                        strict=False,
+                    )
                 ):
                     self.image_pack_file.write(f"{uuid}/{camera}/{i}", rgb)
                     self.depth_pack_file.write(f"{uuid}/{camera}/{i}", depth)
 
-            assert len(joint_positions) == num_steps
-            assert len(cartesian_positions) == num_steps
-            joint_positions = np.stack(joint_positions)
-            cartesian_positions = np.stack(cartesian_positions)
-
-            self.meta_pack_file.write(f"{uuid}/extrinsic", extrinsics)
-            self.meta_pack_file.write(f"{uuid}/intrinsic", intrinsics)
+            self.meta_pack_file.write(
+                f"{uuid}/extrinsic", episode["extrinsics"]
+            )
+            self.meta_pack_file.write(
+                f"{uuid}/intrinsic", episode["intrinsics"]
+            )
             self.meta_pack_file.write(
                 f"{uuid}/observation/robot_state/joint_positions",
-                joint_positions,
+                episode["joint_positions"],
             )
             self.meta_pack_file.write(
                 f"{uuid}/observation/robot_state/cartesian_position",
-                cartesian_positions,
+                episode["cartesian_positions"],
             )
-            self.meta_pack_file.write(f"{uuid}/camera_names", camera_names)
-
-            instruction_file = os.path.join(
-                os.path.dirname(os.path.dirname(ep_path)),
-                "instructions",
-                os.path.basename(ep_path).replace("hdf5", "json"),
+            self.meta_pack_file.write(
+                f"{uuid}/camera_names", episode["camera_names"]
             )
-            if os.path.exists(instruction_file):
-                instructions = json.load(open(instruction_file))
+            if episode["instructions"] is not None:
                 self.meta_pack_file.write(
                     f"{uuid}/instructions",
-                    instructions,
+                    episode["instructions"],
                 )
 
             index_data = dict(
@@ -238,6 +226,78 @@ class RobotwinDataPacker(BaseLmdbManipulationDataPacker):
         self.close()
 
 
+def _load_episode(ep):
+    """Read an episode from its hdf5 file and encode the depth frames.
+
+    This function is run in the worker processes of the packer, so it
+    only returns the data to write without touching the LMDBs.
+    """
+    task_name, config_name, ep_path, seed = ep
+    uuid = f"{task_name}_{config_name}_seed{seed}"
+    logger.info(f"start process {uuid}")
+    extrinsics = {}
+    intrinsics = {}
+    rgbs = {}
+    depths = {}
+
+    with h5py.File(ep_path, "r") as ep_file:
+        # read cartesian positions
+        cartesian_positions = ep_file["endpose"][:]
+
+        # read joint positions
+        joint_positions = ep_file["joint_action"]["vector"][:]
+
+        # read camera data
+        camera_names = []
+        for camera_name, camera_data in ep_file["observation"].items():
+            camera_names.append(camera_name)
+            intrinsics[camera_name] = camera_data["intrinsic_cv"][0]
+            extrinsics[camera_name] = camera_data["extrinsic_cv"][:]
+
+            rgbs_encode = camera_data["rgb"][:]
+
+            depths_raw = camera_data["depth"][:]
+            depths_encode = []
+            for depth in depths_raw:
+                assert len(depth.shape) == 2
+                depth = depth.astype(np.uint16)
+                ret, depth = cv2.imencode(".PNG", depth)
+                assert ret
+                depths_encode.append(depth)
+
+            rgbs[camera_name] = rgbs_encode
+            depths[camera_name] = depths_encode
+
+    num_steps = len(cartesian_positions)
+    for camera in camera_names:
+        assert len(rgbs[camera]) == num_steps
+        assert len(depths[camera]) == num_steps
+    assert len(joint_positions) == num_steps
+    assert len(cartesian_positions) == num_steps
+
+    instruction_file = os.path.join(
+        os.path.dirname(os.path.dirname(ep_path)),
+        "instructions",
+        os.path.basename(ep_path).replace("hdf5", "json"),
+    )
+    instructions = None
+    if os.path.exists(instruction_file):
+        instructions = json.load(open(instruction_file))
+
+    return dict(
+        uuid=uuid,
+        num_steps=num_steps,
+        camera_names=camera_names,
+        rgbs=rgbs,
+        depths=depths,
+        extrinsics=extrinsics,
+        intrinsics=intrinsics,
+        joint_positions=np.stack(joint_positions),
+        cartesian_positions=np.stack(cartesian_positions),
+        instructions=instructions,
+    )
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -255,6 +315,13 @@ if __name__ == "__main__":
     parser.add_argument("--robotwin_aug", type=str, default=None)
     parser.add_argument("--camera_name", type=str, default=None)
     parser.add_argument("--config_name", type=str, default=None)
+    parser.add_argument("--num_proc", type=int, default=1)
+    parser.add_argument(
+        "--value_format",
+        type=str,
+        default="pickle",
+        choices=["pickle", "typed"],
+    )
     args = parser.parse_args()
 
     if args.task_names is None:
@@ -270,5 +337,7 @@ if __name__ == "__main__":
         robotwin_aug=args.robotwin_aug,
         camera_name=args.camera_name,
         config_name=args.config_name,
+        value_format=args.value_format,
+        num_proc=args.num_proc,
     )
     packer()
@@ -15,7 +15,7 @@
 # permissions and limitations under the License.
 
 import copy
-from typing import Type
+from typing import Sequence, Type
 
 import cv2
 import numpy as np
@@ -26,6 +26,7 @@ from pytorch3d.transforms import matrix_to_quaternion
 from scipy.spatial.transform import Rotation
 
 from robo_orchard_lab.dataset.robot.row_sampler import (
+    CachedIndexDataset,
     MultiRowSampler,
     MultiRowSamplerConfig,
 )
@@ -105,14 +106,15 @@ class EpisodeSampler(MultiRowSampler):
 
     def sample_row_idx(
         self,
-        index_dataset: HFDataset,
+        index_dataset: HFDataset | CachedIndexDataset,
         index: int,
     ) -> dict[str, list[int | None]]:
         """Sample all row indices of the episode containing the given index.
 
-        This method starts from `index` and scans forward and backward through
-        the dataset until it finds the boundaries where `episode_index`
-        changes, thus determining the range of the complete episode.
+        The range of the complete episode is looked up in the episode
+        boundaries of the meta database if available. Otherwise, this method
+        starts from `index` and scans forward and backward through the
+        dataset until it finds the boundaries where `episode_index` changes.
 
         Args:
             index_dataset (HFDataset): Dataset used for indexing, must contain
@@ -124,9 +126,93 @@ class EpisodeSampler(MultiRowSampler):
             the target column name and the value is a list containing all row
             indices of that episode.
         """
+        start_idx, end_idx = self._find_episode_range(index_dataset, index)
+
+        # Generate all row indices for this episode
+        episode_indices: list[int | None] = list(range(start_idx, end_idx + 1))
+
+        ret = {}
+        for column in self.cfg.target_columns:
+            ret[column] = episode_indices
+        return ret
+
+    def sample_row_idx_batch(
+        self,
+        index_dataset: HFDataset | CachedIndexDataset,
+        indices: Sequence[int],
+    ) -> dict[str, list[list[int | None]]]:
+        """Sample all row indices of the episodes for a batch of indices.
+
+        Indices in the same episode share the same boundaries, so the
+        episode boundaries are only searched once for each episode in
+        the batch.
+
+        Args:
+            index_dataset (HFDataset): Dataset used for indexing, must contain
+                'episode_index' column.
+            indices (Sequence[int]): Data row indices to process.
+
+        Returns:
+            dict[str, list[list[int | None]]]: Returns a dictionary where the
+            key is the target column name and the value is a list containing
+            all row indices of the episode for each index.
+        """
+        # map from (start_idx, end_idx) to all row indices of the episode
+        found_episodes: dict[tuple[int, int], list[int | None]] = {}
+        batch_episode_indices: list[list[int | None]] = []
+        for index in indices:
+            episode_indices = None
+            for (start_idx, end_idx), rows in found_episodes.items():
+                if start_idx <= index <= end_idx:
+                    episode_indices = rows
+                    break
+            if episode_indices is None:
+                start_idx, end_idx = self._find_episode_range(
+                    index_dataset, index
+                )
+                episode_indices = list(range(start_idx, end_idx + 1))
+                found_episodes[(start_idx, end_idx)] = episode_indices
+            batch_episode_indices.append(episode_indices)
+
+        return {
+            column: batch_episode_indices for column in self.cfg.target_columns
+        }
+
+    def _find_episode_range(
+        self, index_dataset: HFDataset | CachedIndexDataset, index: int
+    ) -> tuple[int, int]:
+        """Find the first and the last (included) row of the episode.
+
+        If the index dataset carries the episode boundaries from the meta
+        database, the boundaries are looked up directly. Otherwise, or if
+        the looked up range does not match the rows of a dataset that is
+        not a contiguous slice, the dataset is scanned row by row until the
+        episode changes.
+        """
         cur_row = index_dataset[index]
         cur_episode_idx = cur_row["episode_index"]
 
+        if (
+            isinstance(index_dataset, CachedIndexDataset)
+            and index_dataset.episode_boundaries is not None
+        ):
+            frame_range = index_dataset.episode_boundaries.get_range(
+                cur_episode_idx
+            )
+            if frame_range is not None:
+                # The boundaries are frame indices. Shift them to row
+                # positions in case the index dataset is a slice.
+                offset = index - cur_row["index"]
+                start_idx = max(frame_range[0] + offset, 0)
+                end_idx = min(frame_range[1] + offset, len(index_dataset) - 1)
+                # The shift only holds for a contiguous slice. Otherwise,
+                # use the range only if it matches the episode at its
+                # bounds.
+                if index_dataset.is_contiguous or self._is_episode_bounds(
+                    index_dataset, cur_episode_idx, index, start_idx, end_idx
+                ):
+                    return start_idx, end_idx
+
         # 1. Search forward to find the start boundary of the episode
         start_idx = index
         while start_idx > 0:
@@ -142,14 +228,30 @@ class EpisodeSampler(MultiRowSampler):
             if next_row["episode_index"] != cur_episode_idx:
                 break
             end_idx += 1
+        return start_idx, end_idx
 
-        # 3. Generate all row indices for this episode
-        episode_indices: list[int | None] = list(range(start_idx, end_idx + 1))
-
-        ret = {}
-        for column in self.cfg.target_columns:
-            ret[column] = episode_indices
-        return ret
+    @staticmethod
+    def _is_episode_bounds(
+        index_dataset: CachedIndexDataset,
+        episode_idx: int,
+        index: int,
+        start_idx: int,
+        end_idx: int,
+    ) -> bool:
+        """Whether the rows at and just outside the bounds match."""
+        if not start_idx <= index <= end_idx:
+            return False
+        for row, inside in (
+            (start_idx, True),
+            (end_idx, True),
+            (start_idx - 1, False),
+            (end_idx + 1, False),
+        ):
+            if not 0 <= row < len(index_dataset):
+                continue
+            if (index_dataset[row]["episode_index"] == episode_idx) != inside:
+                return False
+        return True
 
 
 class EpisodeSamplerConfig(MultiRowSamplerConfig[EpisodeSampler]):
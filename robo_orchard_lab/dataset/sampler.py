@@ -14,7 +14,7 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
-from typing import Iterator, Protocol, runtime_checkable
+from typing import Any, Iterator, Protocol, runtime_checkable
 
 import numpy as np
 import pyarrow as pa
@@ -23,6 +23,7 @@ from datasets.arrow_dataset import InMemoryTable, MemoryMappedTable, Table
 from torch.utils.data.sampler import Sampler
 
 __all__ = [
+    "ResumableSamplerMixin",
     "IndiceTableSampler",
     "ShardedIndiceSampler",
 ]
@@ -35,7 +36,99 @@ class Sized(Protocol):
     def __len__(self) -> int: ...
 
 
-class IndiceTableSampler(Sampler[int]):
+class ResumableSamplerMixin:
+    """Mixin class for samplers with epoch seeding and resumable state.
+
+    If :attr:`seed` is set, the order of each epoch is determined by the
+    seed and the epoch set by :meth:`set_epoch`, so that all processes and
+    all restarts of a job see the same order for the same epoch.
+
+    The sampler records the number of indices consumed in the current
+    epoch. :meth:`state_dict` returns the epoch, the seed and this cursor,
+    and after :meth:`load_state_dict` the next iteration of the same
+    epoch starts from the cursor directly, without iterating over the
+    skipped indices.
+
+    Subclasses should call :meth:`_init_resumable_state` in `__init__`,
+    and iterate with :meth:`_iter_from_cursor`.
+    """
+
+    seed: int | None
+    epoch: int
+    generator: torch.Generator | None
+
+    def _init_resumable_state(
+        self, seed: int | None, generator: torch.Generator | None
+    ) -> None:
+        self.seed = seed
+        self.generator = generator
+        self.epoch = 0
+        self._num_consumed = 0
+        self._resume_index = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """Set the epoch for the next iteration.
+
+        The cursor loaded by :meth:`load_state_dict` is kept if the epoch
+        is not changed, and reset otherwise.
+
+        Args:
+            epoch (int): The epoch number.
+        """
+        if epoch != self.epoch:
+            self._resume_index = 0
+            self._num_consumed = 0
+        self.epoch = epoch
+
+    def state_dict(self) -> dict[str, Any]:
+        """Return the state of the sampler.
+
+        Returns:
+            dict[str, Any]: The state with the current `epoch`, the `seed`
+            and `num_consumed`, the number of indices consumed in the
+            current epoch.
+        """
+        return {
+            "epoch": self.epoch,
+            "seed": self.seed,
+            "num_consumed": max(self._num_consumed, self._resume_index),
+        }
+
+    def load_state_dict(self, state: dict[str, Any]) -> None:
+        """Load the state returned by :meth:`state_dict`.
+
+        Args:
+            state (dict[str, Any]): The state to load.
+        """
+        self.epoch = state["epoch"]
+        self.seed = state["seed"]
+        self._resume_index = state["num_consumed"]
+        self._num_consumed = 0
+
+    def _epoch_generator(self) -> torch.Generator:
+        """Return the generator to sample the current epoch with."""
+        if self.seed is not None:
+            generator = torch.Generator()
+            generator.manual_seed(self.seed + self.epoch)
+            return generator
+        if self.generator is not None:
+            return self.generator
+        seed = int(torch.empty((), dtype=torch.int64).random_().item())
+        generator = torch.Generator()
+        generator.manual_seed(seed)
+        return generator
+
+    def _iter_from_cursor(self, indices: np.ndarray) -> Iterator[int]:
+        """Iterate over the order of the epoch from the loaded cursor."""
+        begin = self._resume_index
+        self._resume_index = 0
+        self._num_consumed = begin
+        for index in _iter_numpy(indices[begin:]):
+            self._num_consumed += 1
+            yield index
+
+
+class IndiceTableSampler(ResumableSamplerMixin, Sampler[int]):
     """Sampler that samples elements from a given list of indices.
 
     Args:
@@ -48,6 +141,10 @@ class IndiceTableSampler(Sampler[int]):
             before being returned. Default: False.
         generator (torch.Generator, optional): Generator used in sampling.
             Default: None.
+        seed (int, optional): If set, the shuffled order of each epoch is
+            generated from `seed + epoch` and `generator` is ignored. It is
+            required to reproduce the order when resuming from
+            :meth:`state_dict`. Default: None.
 
     """
 
@@ -56,8 +153,9 @@ class IndiceTableSampler(Sampler[int]):
         indices: Table | list[int] | str | torch.Tensor | np.ndarray,
         shuffle: bool = False,
         generator: torch.Generator | None = None,
+        seed: int | None = None,
     ) -> None:
-        self.generator = generator
+        self._init_resumable_state(seed=seed, generator=generator)
         self.shuffle = shuffle
         if isinstance(indices, Table):
             self.table = indices
@@ -82,20 +180,20 @@ class IndiceTableSampler(Sampler[int]):
             )
 
     def __iter__(self) -> Iterator[int]:
+        indices = self.indices_numpy()
         if self.shuffle:
-            if self.generator is None:
-                seed = int(torch.empty((), dtype=torch.int64).random_().item())
-                generator = torch.Generator()
-                generator.manual_seed(seed)
-            else:
-                generator = self.generator
+            generator = self._epoch_generator()
+            perm = torch.randperm(len(self), generator=generator).numpy()
+            indices = indices[perm]
+        yield from self._iter_from_cursor(indices)
 
-            indices = torch.randperm(len(self), generator=generator)
-            for i in indices:
-                yield self.table.column(0)[i.item()].as_py()
-        else:
-            for i in range(len(self)):
-                yield self.table.column(0)[i].as_py()
+    def indices_numpy(self) -> np.ndarray:
+        """Return all indices as a contiguous uint64 numpy array.
+
+        The array is mapped from the indices table without copy if the
+        table has only one chunk.
+        """
+        return _indices_to_numpy(self.table)
 
     def _list2memtable(
         self, indices: list[int] | np.ndarray | torch.Tensor
@@ -148,6 +246,9 @@ class ShardedIndiceSampler(IndiceTableSampler):
             before being returned. Default: False.
         generator (torch.Generator, optional): Generator used in sampling.
             Default: None.
+        seed (int, optional): If set, the shuffled order of each epoch is
+            generated from `seed + epoch` and `generator` is ignored.
+            Default: None.
 
     """
 
@@ -159,6 +260,7 @@ class ShardedIndiceSampler(IndiceTableSampler):
         contiguous: bool = True,
         shuffle: bool = False,
         generator: torch.Generator | None = None,
+        seed: int | None = None,
     ) -> None:
         if isinstance(indices, str):
             indices = MemoryMappedTable.from_file(indices)
@@ -173,19 +275,16 @@ class ShardedIndiceSampler(IndiceTableSampler):
             mod = dataset_len % num_shards
             start = div * shard_id + min(shard_id, mod)
             end = start + div + (1 if shard_id < mod else 0)
-            sliced_indices = (
-                indices[start:end]
-                if not isinstance(indices, int)
-                else np.arange(start, end, dtype=np.uint64)
-            )
+            if isinstance(indices, int):
+                sliced_indices = np.arange(start, end, dtype=np.uint64)
+            elif isinstance(indices, Table):
+                # zero-copy slice that keeps the datasets table type.
+                sliced_indices = indices.slice(start, end - start)
+            else:
+                sliced_indices = indices[start:end]
         else:
             sliced_indices = (
-                [
-                    indices[i]
-                    for i in np.arange(
-                        shard_id, len(indices), num_shards, dtype=np.uint64
-                    )
-                ]
+                _indices_to_numpy(indices)[shard_id::num_shards].copy()
                 if not isinstance(indices, int)
                 else np.arange(
                     shard_id, dataset_len, num_shards, dtype=np.uint64
@@ -195,4 +294,30 @@ class ShardedIndiceSampler(IndiceTableSampler):
             sliced_indices,  # type: ignore
             shuffle=shuffle,
             generator=generator,
+            seed=seed,
         )
+
+
+def _indices_to_numpy(
+    indices: Table | list[int] | torch.Tensor | np.ndarray,
+) -> np.ndarray:
+    """Convert the indices of any supported type to a uint64 numpy array."""
+    if isinstance(indices, Table):
+        column = indices.column(0)
+        if column.num_chunks == 0:
+            return np.empty((0,), dtype=np.uint64)
+        return column.to_numpy()
+    if isinstance(indices, torch.Tensor):
+        indices = indices.numpy()
+    return np.asarray(indices, dtype=np.uint64)
+
+
+def _iter_numpy(indices: np.ndarray, chunk_size: int = 65536) -> Iterator[int]:
+    """Iterate over a numpy array as python integers.
+
+    The array is converted to python integers chunk by chunk, so that the
+    per-item overhead is constant without converting the whole array at
+    once.
+    """
+    for begin in range(0, len(indices), chunk_size):
+        yield from indices[begin : begin + chunk_size].tolist()
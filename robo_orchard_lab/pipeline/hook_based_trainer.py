@@ -25,6 +25,7 @@ from accelerate.scheduler import AcceleratedScheduler
 from robo_orchard_core.utils.config import Config
 from torch.utils.data import DataLoader
 
+from robo_orchard_lab.dataset.sampler import ResumableSamplerMixin
 from robo_orchard_lab.models.torch_model import TorchModelMixin
 from robo_orchard_lab.pipeline.batch_processor.mixin import BatchProcessorMixin
 from robo_orchard_lab.pipeline.hooks.grad_clip import (
@@ -68,6 +69,11 @@ class TrainerProgressState(AcceleratorState):
     """The current step. Starts from 0."""
     global_step_id: int = 0
     """The total number of steps taken across all epochs. Starts from 0."""
+    sampler_state: dict[str, Any] | None = None
+    """The state of the data loader sampler if it is resumable.
+
+    See :class:`~robo_orchard_lab.dataset.sampler.ResumableSamplerMixin`.
+    """
 
     def update_step(self) -> None:
         """Increments the step and global_step by 1."""
@@ -221,7 +227,10 @@ class HookBasedTrainer:
             performed.
         resume_from (ResumeCheckpointConfig | None): The configuration
             for resuming from checkpoints. If not specified, training
-            will start from scratch.
+            will start from scratch. If the sampler of the data loader
+            is a :class:`ResumableSamplerMixin`, its state is saved with
+            the checkpoints and the resumed epoch continues from the next
+            unseen sample.
     """
 
     hooks: PipelineHooks
@@ -292,6 +301,8 @@ class HookBasedTrainer:
 
         self.trainer_progress_state = TrainerProgressState()
         accelerator.register_for_checkpointing(self.trainer_progress_state)
+        self._sampler = _get_resumable_sampler(self.dataloader)
+        self._resume_num_consumed = 0
 
         self.batch_processor = batch_processor
 
@@ -315,6 +326,11 @@ class HookBasedTrainer:
             resume_from.load_state(accelerator=self.accelerator)
             self._start_epoch = self.trainer_progress_state.epoch_id
             self._start_step = self.trainer_progress_state.step_id
+            sampler_state = self.trainer_progress_state.sampler_state
+            if self._sampler is not None and sampler_state is not None:
+                self._sampler.load_state_dict(sampler_state)
+                if sampler_state["epoch"] == self._start_epoch:
+                    self._resume_num_consumed = sampler_state["num_consumed"]
 
     def _get_hook_args(self, **kwargs) -> PipelineHookArgs:
         """Get Hook args.
@@ -347,6 +363,38 @@ class HookBasedTrainer:
             setattr(hookargs, k, v)
         return hookargs
 
+    def _set_epoch(self, epoch: int) -> None:
+        """Set the epoch of the data loader before iterating over it.
+
+        Accelerate data loaders pass the epoch to their sampler, which
+        determines the order of resumable samplers.
+        """
+        if hasattr(self.dataloader, "set_epoch"):
+            self.dataloader.set_epoch(epoch)
+        elif self._sampler is not None:
+            self._sampler.set_epoch(epoch)
+
+    def _update_sampler_state(self, num_batches: int) -> None:
+        """Record the sampler state after `num_batches` in this epoch.
+
+        The sampler itself runs ahead of the training loop because the
+        data loader prefetches batches. The cursor is therefore computed
+        from the batches that are actually consumed by the training loop.
+        """
+        if self._sampler is None:
+            return
+        state = self._sampler.state_dict()
+        num_consumed = (
+            self._resume_num_consumed
+            + num_batches * self.dataloader.total_batch_size  # type: ignore
+        )
+        # the last batch may be smaller than the batch size.
+        state["num_consumed"] = min(
+            num_consumed,
+            len(self._sampler),  # type: ignore
+        )
+        self.trainer_progress_state.sampler_state = state
+
     def __call__(self):
         logger.info(
             "\n" + "=" * 50 + "BEGIN TRAINING" + "=" * 50,
@@ -399,10 +447,13 @@ class HookBasedTrainer:
                 #
                 # Consider using Accelerator.join_uneven_inputs?
                 #
+                self._set_epoch(self.trainer_progress_state.epoch_id)
+                self._update_sampler_state(num_batches=0)
                 with self.hooks.begin(
                     "on_epoch", self._get_hook_args()
                 ) as on_epoch_hook_args:
-                    for _i, batch in enumerate(self.dataloader):
+                    for batch_idx, batch in enumerate(self.dataloader):
+                        self._update_sampler_state(num_batches=batch_idx + 1)
                         # TODO: Support Accelerator.accumulate?
                         step(batch=batch, batch_processor=self.batch_processor)
                         self.trainer_progress_state.update_step()
@@ -415,6 +466,7 @@ class HookBasedTrainer:
                             end_loop_flag = True
                             break
 
+                self._resume_num_consumed = 0
                 self.trainer_progress_state.update_epoch()
                 self.trainer_progress_state.sync_pipeline_hook_arg(
                     on_loop_hook_args
@@ -428,3 +480,26 @@ class HookBasedTrainer:
             "\n" + "=" * 50 + "FINISH TRAINING" + "=" * 50,
             main_process_only=True,
         )
+
+
+def _get_resumable_sampler(
+    dataloader: DataLoader | Iterable,
+) -> ResumableSamplerMixin | None:
+    """Find the resumable sampler of a data loader prepared by Accelerate.
+
+    The sampler is looked up in the same places as Accelerate does when
+    setting the epoch. Data loaders without a known total batch size are
+    not supported, since the cursor can not be computed.
+    """
+    if not hasattr(dataloader, "total_batch_size"):
+        return None
+    batch_sampler = getattr(dataloader, "batch_sampler", None)
+    for sampler in (
+        getattr(batch_sampler, "sampler", None),
+        getattr(
+            getattr(batch_sampler, "batch_sampler", None), "sampler", None
+        ),
+    ):
+        if isinstance(sampler, ResumableSamplerMixin):
+            return sampler
+    return None
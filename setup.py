@@ -237,7 +237,7 @@ if __name__ == "__main__":
         "sem": [
             "robo_orchard_lab[bip3d]",
             "diffusers",
-            "lmdb",
+            "lmdb>=1.3",
             "pytorch-kinematics",
             "h5py",
         ],
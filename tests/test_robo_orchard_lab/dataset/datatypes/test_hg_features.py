@@ -25,6 +25,9 @@ from datasets.features.features import (
     encode_nested_example,
 )
 
+from robo_orchard_lab.dataset.datatypes.hg_features import (
+    decode_arrow_column,
+)
 from robo_orchard_lab.dataset.datatypes.hg_features.tensor import (
     AnyTensorFeature,
     TypedTensorFeature,
@@ -104,6 +107,66 @@ class TestTypedTensorFeature:
 
             assert np.array_equal(original, recovered)
 
+    @pytest.mark.parametrize("as_torch_tensor", [True, False])
+    def test_decode_batch(self, as_torch_tensor: bool):
+        feature = TypedTensorFeature(
+            dtype="float32", as_torch_tensor=as_torch_tensor
+        )
+        data = [
+            np.array([1, 2, 3], dtype=np.float32),
+            None,
+            np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32),
+            np.zeros((0, 2), dtype=np.float32),
+            np.array([[[5.0], [6.0]]], dtype=np.float32),
+        ]
+        typed_seq = TypedSequence(
+            data=[encode_nested_example(feature, item) for item in data],
+            type=feature,  # type: ignore
+        )
+        pa_arr = pa.array(typed_seq)
+        # sliced and chunked arrays should be decoded the same way.
+        for values, expected in [
+            (pa_arr, data),
+            (pa_arr.slice(1, 3), data[1:4]),
+            (pa.chunked_array([pa_arr[:2], pa_arr[2:]]), data),
+        ]:
+            recovered_data = feature.decode_batch(values)
+            assert len(recovered_data) == len(expected)
+            for original, recovered in zip(
+                expected, recovered_data, strict=True
+            ):
+                if original is None:
+                    assert recovered is None
+                    continue
+                if as_torch_tensor:
+                    assert isinstance(recovered, torch.Tensor)
+                    recovered = recovered.numpy()
+                assert original.shape == recovered.shape
+                assert np.array_equal(original, recovered)
+
+        # decode a row of the arrow column directly
+        recovered = feature.decode_example(pa_arr[2])
+        if as_torch_tensor:
+            recovered = recovered.numpy()
+        assert np.array_equal(data[2], recovered)
+        assert feature.decode_example(pa_arr[1]) is None
+
+    def test_decode_batch_writable(self):
+        feature = TypedTensorFeature(dtype="float32", as_torch_tensor=False)
+        features = Features({"x": feature})
+        ds = Dataset.from_dict(
+            {"x": [np.arange(3, dtype=np.float32) + i for i in range(2)]},
+            features=features,
+        )
+        assert ds[0]["x"].flags.writeable
+        assert feature.decode_example(ds.data.column("x")[0]).flags.writeable
+        column = ds.data.column("x")
+        for decoded in decode_arrow_column(feature, column):
+            assert decoded.flags.writeable
+        # only the opt-in zero-copy path returns views of the arrow buffer.
+        for decoded in decode_arrow_column(feature, column, zero_copy=True):
+            assert not decoded.flags.writeable
+
 
 class TestAnyTensorFeature:
     def test_datasets(self):
@@ -23,6 +23,9 @@ from datasets.features.features import (
     Features,
 )
 
+from robo_orchard_lab.dataset.datatypes.hg_features import (
+    decode_arrow_column,
+)
 from robo_orchard_lab.dataset.datatypes.joint_state import (
     BatchJointsState,
 )
@@ -113,6 +116,30 @@ class TestBatchJointsState:
                     f"{dataset_item.timestamps} != {origin_item.timestamps}"
                 )
 
+    def test_decode_batch(self):
+        data: list[BatchJointsState | None] = [
+            BatchJointsState(
+                position=torch.tensor([[1.0, 2.0, 3.0]], dtype=torch.float32),
+                velocity=torch.tensor([[4.0, 5.0, 6.0]], dtype=torch.float32),
+                names=["joint1", "joint2", "joint3"],
+                timestamps=[1],
+            ),
+            None,
+            BatchJointsState(
+                position=torch.tensor([[10.0, 11.0]], dtype=torch.float32),
+                effort=torch.tensor([[14.0, 15.0]], dtype=torch.float32),
+            ),
+        ]
+        feature = BatchJointsState.dataset_feature()
+        dataset = Dataset.from_dict(
+            {"data": data}, features=Features({"data": feature})
+        )
+        expected = dataset["data"][:]
+        recovered = decode_arrow_column(feature, dataset.data.column("data"))
+        assert recovered[1] is None
+        for origin_item, dataset_item in zip(expected, recovered, strict=True):
+            assert origin_item == dataset_item
+
 
 if __name__ == "__main__":
     pytest.main(["-v", "-s", __file__])
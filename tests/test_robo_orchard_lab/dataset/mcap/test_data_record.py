@@ -19,6 +19,7 @@ from typing import Type
 
 import fsspec
 import pytest
+from mcap.writer import CompressionType, Writer
 
 from robo_orchard_lab.dataset.experimental.mcap.batch_split import (
     SplitBatchByTopicArgs,
@@ -29,7 +30,11 @@ from robo_orchard_lab.dataset.experimental.mcap.data_record import (
     McapDataRecordChunk,
     McapDataRecordChunks,
 )
+from robo_orchard_lab.dataset.experimental.mcap.message_index import (
+    McapMessageIndex,
+)
 from robo_orchard_lab.dataset.experimental.mcap.reader import (
+    MakeIterMsgArgs,
     McapReader,
 )
 
@@ -51,6 +56,123 @@ def example_reader(ROBO_ORCHARD_TEST_WORKSPACE: str):
         yield reader
 
 
+@pytest.fixture(scope="module")
+def synthetic_mcap_path(tmp_path_factory) -> str:
+    """An MCAP file with 3 topics of different rates in many chunks."""
+    path = str(tmp_path_factory.mktemp("mcap") / "synthetic.mcap")
+    with open(path, "wb") as f:
+        writer = Writer(f, chunk_size=512, compression=CompressionType.ZSTD)
+        writer.start()
+        schema_id = writer.register_schema(
+            name="raw", encoding="jsonschema", data=b"{}"
+        )
+        channels = {
+            topic: writer.register_channel(
+                topic=topic, message_encoding="json", schema_id=schema_id
+            )
+            for topic in ["/fast", "/slow", "/static"]
+        }
+        for i in range(200):
+            log_time = 1000 + i * 10
+            writer.add_message(
+                channels["/fast"], log_time, b"f%d" % i, log_time, i
+            )
+            if i % 5 == 0:
+                writer.add_message(
+                    channels["/slow"], log_time, b"s%d" % i, log_time, i
+                )
+        writer.add_message(channels["/static"], 1000, b"static", 1000, 0)
+        writer.finish()
+    return path
+
+
+def _read_all(reader: McapReader, **kwargs) -> list:
+    return list(reader.iter_messages(MakeIterMsgArgs(**kwargs)))
+
+
+class TestMessageIndex:
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            dict(),
+            dict(topics=["/slow", "/static"]),
+            dict(topics=["/fast"], start_time=1205, end_time=1500),
+            dict(start_time=1000, end_time=1001),
+            dict(start_time=1200, reverse=True),
+            dict(topics=["/fast", "/slow"], log_time_order=False),
+            dict(topics=["/not_exist"]),
+        ],
+    )
+    def test_same_as_iter_messages(self, synthetic_mcap_path: str, kwargs):
+        with open(synthetic_mcap_path, "rb") as f:
+            reader = McapReader.make_reader(f)
+            assert len(reader.get_summary().chunk_indexes) > 4  # type: ignore
+            expected = _read_all(reader, **kwargs)
+            reader.enable_message_index(chunk_cache_size=2)
+            assert _read_all(reader, **kwargs) == expected
+            assert len(reader.chunk_cache) <= 2  # type: ignore
+
+    def test_reverse_without_log_time_order(self, synthetic_mcap_path: str):
+        kwargs = dict(log_time_order=False, reverse=True)
+        with open(synthetic_mcap_path, "rb") as f:
+            reader = McapReader.make_reader(f)
+            with pytest.raises(ValueError):
+                _read_all(reader, **kwargs)
+            index = reader.enable_message_index()
+            with pytest.raises(ValueError):
+                index.query(**kwargs)
+            with pytest.raises(ValueError):
+                _read_all(reader, **kwargs)
+
+    def test_data_record_chunk(self, synthetic_mcap_path: str):
+        with open(synthetic_mcap_path, "rb") as f:
+            reader = McapReader.make_reader(f)
+            record = McapDataRecordChunks(
+                [
+                    McapDataRecordChunk(["/fast"], 1500, 1550),
+                    McapDataRecordChunk(["/slow", "/static"], 1000, 1600),
+                ]
+            )
+            expected = record.read(reader)
+            reader.enable_message_index()
+            batch = record.read(reader)
+            assert batch.topics == expected.topics
+            for topic in expected.topics:
+                assert batch[topic].messages == expected[topic].messages
+            # only the chunks with matching messages are read.
+            num_chunks = len(reader.get_summary().chunk_indexes)  # type: ignore
+            assert len(reader.chunk_cache) < num_chunks  # type: ignore
+
+    def test_sidecar(self, synthetic_mcap_path: str, tmp_path, mocker):
+        index_path = os.path.join(str(tmp_path), "synthetic.mcap.idx.npz")
+        with open(synthetic_mcap_path, "rb") as f:
+            reader = McapReader.make_reader(f)
+            index = reader.enable_message_index(index_path=index_path)
+            assert len(index) == 241
+            assert os.path.exists(index_path)
+
+            build = mocker.patch.object(
+                McapMessageIndex,
+                "build",
+                side_effect=AssertionError("sidecar index is not used"),
+            )
+            f.seek(0)
+            reader = McapReader.make_reader(f)
+            loaded = reader.enable_message_index(index_path=index_path)
+            assert build.call_count == 0
+            assert (loaded.entries == index.entries).all()
+
+            # outdated sidecar is rebuilt.
+            build.side_effect = None
+            build.return_value = index
+            loaded.chunk_start_offsets = loaded.chunk_start_offsets[1:]
+            loaded.save(index_path)
+            f.seek(0)
+            reader = McapReader.make_reader(f)
+            reader.enable_message_index(index_path=index_path)
+            assert build.call_count == 1
+
+
 class TestDataChunks:
     @pytest.mark.parametrize(
         "rec_chunk_type",
@@ -0,0 +1,178 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import os
+import pickle
+
+import pytest
+import torch
+from google.protobuf.timestamp import from_nanoseconds
+from mcap_protobuf.writer import Writer
+from robo_orchard_schemas.sensor_msgs.JointState_pb2 import (
+    JointState as PbJointState,
+    MultiJointStateStamped as PbMultiJointStateStamped,
+)
+from torch.utils.data import DataLoader
+
+from robo_orchard_lab.dataset.experimental.mcap.batch_decoder import (
+    McapBatch2BatchJointStateConfig,
+)
+from robo_orchard_lab.dataset.experimental.mcap.batch_split import (
+    SplitBatchByTopicArgs,
+    SplitBatchByTopics,
+)
+from robo_orchard_lab.dataset.experimental.mcap.dataset import McapDataset
+from robo_orchard_lab.dataset.experimental.mcap.parallel_decoder import (
+    McapDecodeTask,
+    iter_decoded_batches,
+)
+
+
+def _joint_state(log_time: int, position: float) -> PbMultiJointStateStamped:
+    return PbMultiJointStateStamped(
+        timestamp=from_nanoseconds(log_time),
+        states=[
+            PbJointState(name=f"j{k}", position=position) for k in range(2)
+        ],
+    )
+
+
+@pytest.fixture(scope="module")
+def mcap_folder(tmp_path_factory) -> str:
+    """A folder of 2 MCAP files, with 10 and 6 joint states.
+
+    Each file has a static `/robot` message at the beginning.
+    """
+    folder = str(tmp_path_factory.mktemp("mcap"))
+    for file_id, num_msgs in enumerate([10, 6]):
+        path = os.path.join(folder, f"episode_{file_id}.mcap")
+        with open(path, "wb") as f:
+            writer = Writer(f, chunk_size=256)
+            writer.write_message(
+                "/robot", _joint_state(0, -1), log_time=0, publish_time=0
+            )
+            for i in range(num_msgs):
+                log_time = 1000 + i * 10
+                writer.write_message(
+                    "/joints",
+                    _joint_state(log_time, file_id * 100 + i),
+                    log_time=log_time,
+                    publish_time=log_time,
+                )
+            writer.finish()
+    return folder
+
+
+BATCH_SPLIT = SplitBatchByTopics(
+    SplitBatchByTopicArgs(monitor_topic="/joints", min_messages_per_topic=4)
+)
+BATCH_DECODER = McapBatch2BatchJointStateConfig(source_topic="/joints")
+
+
+def _no_collate(sample):
+    return sample
+
+
+class TestMcapDataset:
+    def test_frames(self, mcap_folder: str):
+        dataset = McapDataset(mcap_folder, batch_split=BATCH_SPLIT)
+        assert len(dataset) == 5
+        assert [file_index for file_index, _ in dataset.frame_index] == [
+            0,
+            0,
+            0,
+            1,
+            1,
+        ]
+        frame = dataset[1]
+        assert [msg.log_time for msg in frame["/joints"]] == [
+            1040,
+            1050,
+            1060,
+            1070,
+        ]
+        # static topic is filled with its last message.
+        assert [msg.log_time for msg in frame["/robot"]] == [0]
+        dataset.close()
+
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_same_as_iter_decoded_batches(self, mcap_folder: str, prefetch):
+        dataset = McapDataset(
+            mcap_folder,
+            batch_split=BATCH_SPLIT,
+            batch_decoder=BATCH_DECODER,
+            topics=["/joints"],
+            max_open_files=1,
+            prefetch=prefetch,
+            num_prefetch_threads=2,
+        )
+        expected = list(
+            iter_decoded_batches(
+                [McapDecodeTask(path) for path in dataset.paths],
+                batch_split=BATCH_SPLIT,
+                batch_decoder=BATCH_DECODER,
+                topics=["/joints"],
+            )
+        )
+        assert len(dataset) == len(expected)
+        for index in [0, 1, 2, 3, 4, 2, -1]:
+            assert torch.equal(
+                dataset[index].position, expected[index].decoded.position
+            )
+        with pytest.raises(IndexError):
+            dataset[len(dataset)]
+        dataset.close()
+
+    def test_pickle(self, mcap_folder: str, tmp_path):
+        index_dir = os.path.join(str(tmp_path), "index")
+        dataset = McapDataset(
+            mcap_folder,
+            batch_split=BATCH_SPLIT,
+            batch_decoder=BATCH_DECODER,
+            message_index_dir=index_dir,
+            prefetch=1,
+        )
+        dataset[0]
+        expected = dataset[3].position
+        assert len(os.listdir(index_dir)) == 2
+        restored = pickle.loads(pickle.dumps(dataset))
+        assert torch.equal(restored[3].position, expected)
+        dataset.close()
+        restored.close()
+
+    def test_dataloader_after_use(self, mcap_folder: str):
+        dataset = McapDataset(
+            mcap_folder,
+            batch_split=BATCH_SPLIT,
+            batch_decoder=BATCH_DECODER,
+            topics=["/joints"],
+            prefetch=2,
+        )
+        # open files and start prefetch threads before forking workers.
+        expected = [dataset[i].position for i in range(len(dataset))]
+        loader = DataLoader(
+            dataset,
+            batch_size=None,
+            num_workers=2,
+            collate_fn=_no_collate,
+            multiprocessing_context="fork",
+            timeout=20,
+        )
+        positions = [frame.position for frame in loader]
+        assert len(positions) == len(expected)
+        for position, target in zip(positions, expected, strict=True):
+            assert torch.equal(position, target)
+        dataset.close()
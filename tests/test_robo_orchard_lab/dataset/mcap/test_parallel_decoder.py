@@ -0,0 +1,172 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import multiprocessing as mp
+import os
+
+import pytest
+import torch
+from google.protobuf.timestamp import from_nanoseconds
+from mcap_protobuf.writer import Writer
+from robo_orchard_schemas.sensor_msgs.JointState_pb2 import (
+    JointState as PbJointState,
+    MultiJointStateStamped as PbMultiJointStateStamped,
+)
+
+from robo_orchard_lab.dataset.experimental.mcap.batch_decoder import (
+    McapBatch2BatchJointStateConfig,
+    McapBatchDecoder,
+)
+from robo_orchard_lab.dataset.experimental.mcap.batch_split import (
+    SplitBatchByTopicArgs,
+    SplitBatchByTopics,
+)
+from robo_orchard_lab.dataset.experimental.mcap.parallel_decoder import (
+    McapDecodeTask,
+    iter_decoded_batches,
+    split_mcap_by_time,
+)
+
+
+@pytest.fixture(scope="module")
+def joint_mcap_paths(tmp_path_factory) -> list[str]:
+    """MCAP files with 3 joints, 10 messages each."""
+    folder = tmp_path_factory.mktemp("mcap")
+    paths = []
+    for file_id in range(3):
+        path = os.path.join(str(folder), f"joints_{file_id}.mcap")
+        with open(path, "wb") as f:
+            writer = Writer(f)
+            for i in range(10):
+                log_time = 1000 + i * 10
+                writer.write_message(
+                    "/joints",
+                    PbMultiJointStateStamped(
+                        timestamp=from_nanoseconds(log_time),
+                        states=[
+                            PbJointState(
+                                name=f"j{k}", position=file_id * 100 + i + k
+                            )
+                            for k in range(3)
+                        ],
+                    ),
+                    log_time=log_time,
+                    publish_time=log_time,
+                )
+            writer.finish()
+        paths.append(path)
+    return paths
+
+
+BATCH_SPLIT = SplitBatchByTopics(
+    SplitBatchByTopicArgs(monitor_topic="/joints", min_messages_per_topic=4)
+)
+BATCH_DECODER = McapBatch2BatchJointStateConfig(source_topic="/joints")
+
+
+class _PidDecoder(McapBatchDecoder[int]):
+    """A decoder that records the process id decoding each batch."""
+
+    def __init__(self, pids):
+        super().__init__()
+        self.pids = pids
+
+    def require_topics(self) -> set[str]:
+        return {"/joints"}
+
+    def format_batch(self, decoded_msgs: dict[str, list]) -> int:
+        self.pids.append(os.getpid())
+        return decoded_msgs["/joints"][0].states[0].position
+
+
+class TestIterDecodedBatches:
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    def test_files(self, joint_mcap_paths: list[str], num_workers: int):
+        batches = list(
+            iter_decoded_batches(
+                [McapDecodeTask(path) for path in joint_mcap_paths],
+                batch_split=BATCH_SPLIT,
+                batch_decoder=BATCH_DECODER,
+                num_workers=num_workers,
+                queue_size=1,
+            )
+        )
+        assert [(b.task_index, b.batch_index) for b in batches] == [
+            (task_index, batch_index)
+            for task_index in range(3)
+            for batch_index in range(3)
+        ]
+        for task_index in range(3):
+            position = torch.cat(
+                [
+                    b.decoded.position
+                    for b in batches
+                    if b.task_index == task_index
+                ]
+            )
+            assert torch.equal(
+                position[:, 0],
+                torch.arange(10, dtype=position.dtype) + task_index * 100,
+            )
+
+    def test_split_by_time(self, joint_mcap_paths: list[str]):
+        tasks = split_mcap_by_time(joint_mcap_paths[0], num_parts=3)
+        assert len(tasks) == 3
+        assert tasks[0].start_time == 1000
+        assert tasks[-1].end_time == 1091
+        batches = list(
+            iter_decoded_batches(
+                tasks,
+                batch_split=BATCH_SPLIT,
+                batch_decoder=BATCH_DECODER,
+                num_workers=2,
+                keep_message_batch=True,
+            )
+        )
+        timestamps = sum((b.decoded.timestamps for b in batches), [])
+        assert timestamps == [1000 + i * 10 for i in range(10)]
+        assert all(b.batch is not None for b in batches)
+
+    def test_batches_of_task_overlap(self, joint_mcap_paths: list[str]):
+        # the batches of one task are decoded by different workers.
+        with mp.Manager() as manager:
+            pids = manager.list()
+            batches = list(
+                iter_decoded_batches(
+                    [McapDecodeTask(joint_mcap_paths[1])],
+                    batch_split=BATCH_SPLIT,
+                    batch_decoder=_PidDecoder(pids),
+                    num_workers=3,
+                    queue_size=1,
+                )
+            )
+            pids = list(pids)
+        assert [b.decoded for b in batches] == [100, 104, 108]
+        assert [b.batch_index for b in batches] == [0, 1, 2]
+        assert len(set(pids)) == 3
+        assert os.getpid() not in pids
+
+    def test_worker_error(self, joint_mcap_paths: list[str], tmp_path):
+        tasks = [
+            McapDecodeTask(joint_mcap_paths[0]),
+            McapDecodeTask(os.path.join(str(tmp_path), "not_exist.mcap")),
+        ]
+        with pytest.raises(RuntimeError, match="not_exist.mcap"):
+            list(
+                iter_decoded_batches(
+                    tasks, batch_split=BATCH_SPLIT, num_workers=2
+                )
+            )
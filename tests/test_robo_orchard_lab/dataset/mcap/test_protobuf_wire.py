@@ -0,0 +1,285 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import io
+import pickle
+
+import numpy as np
+import pytest
+import torch
+from foxglove_schemas_protobuf.CameraCalibration_pb2 import (
+    CameraCalibration as FgCameraCalibration,
+)
+from foxglove_schemas_protobuf.FrameTransform_pb2 import (
+    FrameTransform as FgFrameTransform,
+)
+from google.protobuf.timestamp import from_nanoseconds
+from mcap_protobuf.writer import Writer
+from robo_orchard_schemas.sensor_msgs.JointState_pb2 import (
+    JointState as PbJointState,
+    JointStateStamped as PbJointStateStamped,
+    MultiJointStateStamped as PbMultiJointStateStamped,
+)
+
+from robo_orchard_lab.dataset.experimental.mcap.batch_decoder import (
+    McapBatch2BatchFrameTransformConfig,
+    McapBatch2BatchJointStateConfig,
+    McapBatchDecoders,
+)
+from robo_orchard_lab.dataset.experimental.mcap.batch_split import (
+    SplitBatchByTopicArgs,
+    SplitBatchByTopics,
+    iter_messages_batch,
+)
+from robo_orchard_lab.dataset.experimental.mcap.msg_converter import (
+    ToBatchFrameTransformConfig,
+)
+from robo_orchard_lab.dataset.experimental.mcap.msg_converter.joint_state import (  # noqa: E501
+    ToBatchJointsStateConfig,
+)
+from robo_orchard_lab.dataset.experimental.mcap.msg_converter.protobuf_wire import (  # noqa: E501
+    PbFixedFieldDecoder,
+)
+from robo_orchard_lab.dataset.experimental.mcap.msg_decoder import (
+    McapDecoderContext,
+)
+from robo_orchard_lab.dataset.experimental.mcap.reader import McapReader
+
+
+def _multi_joint_states(num: int) -> list[PbMultiJointStateStamped]:
+    return [
+        PbMultiJointStateStamped(
+            timestamp=from_nanoseconds(1_000_000_000 * i + 7 * i),
+            states=[
+                PbJointState(
+                    name=f"j{k}",
+                    position=i + 0.25 * k,
+                    effort=None if k == 1 else -float(i),
+                )
+                for k in range(3)
+            ],
+        )
+        for i in range(num)
+    ]
+
+
+def _frame_transforms(num: int) -> list[FgFrameTransform]:
+    return [
+        FgFrameTransform(
+            timestamp=from_nanoseconds(100 + i),
+            parent_frame_id="world",
+            child_frame_id="camera",
+            translation=dict(x=1.0 + i, y=2.0, z=-3.0),
+            rotation=dict(w=0.5, x=0.5, y=-0.5, z=0.1 * (i + 1)),
+        )
+        for i in range(num)
+    ]
+
+
+def _serialize(msgs) -> list[bytes]:
+    return [msg.SerializeToString() for msg in msgs]
+
+
+class TestPbFixedFieldDecoder:
+    def test_repeated_message(self):
+        msgs = _multi_joint_states(5)
+        decoder = PbFixedFieldDecoder(
+            PbMultiJointStateStamped.DESCRIPTOR,
+            fields=["states.position", "states.velocity", "states.effort"],
+            timestamp_field="timestamp",
+        )
+        batch = decoder.decode(_serialize(msgs))
+        assert batch is not None
+        assert batch.timestamps == [
+            msg.timestamp.ToNanoseconds() for msg in msgs
+        ]
+        assert batch.values["states.position"].dtype == np.float32
+        np.testing.assert_array_equal(
+            batch.values["states.position"],
+            [[s.position for s in msg.states] for msg in msgs],
+        )
+        assert np.isnan(batch.values["states.velocity"]).all()
+        np.testing.assert_array_equal(
+            batch.present["states.effort"], [True, False, True]
+        )
+        assert np.isnan(batch.values["states.effort"][:, 1]).all()
+
+    def test_packed_repeated(self):
+        msgs = [
+            FgCameraCalibration(
+                frame_id="camera",
+                width=640,
+                height=480,
+                D=[0.1 * i, 0.2, 0.3],
+                K=[float(i * 9 + k) for k in range(9)],
+            )
+            for i in range(4)
+        ]
+        decoder = PbFixedFieldDecoder(
+            FgCameraCalibration.DESCRIPTOR, fields=["K", "D", "P"]
+        )
+        batch = decoder.decode(_serialize(msgs))
+        assert batch is not None
+        assert batch.timestamps is None
+        np.testing.assert_array_equal(
+            batch.values["K"], [list(msg.K) for msg in msgs]
+        )
+        np.testing.assert_array_equal(
+            batch.values["D"], [list(msg.D) for msg in msgs]
+        )
+        assert batch.values["P"].shape == (4, 0)
+
+    def test_different_layout(self):
+        msgs = _frame_transforms(3)
+        msgs[1].rotation.x = 0.0
+        decoder = PbFixedFieldDecoder(
+            FgFrameTransform.DESCRIPTOR,
+            fields=["rotation.x"],
+            timestamp_field="timestamp",
+        )
+        assert decoder.decode(_serialize(msgs)) is None
+        # the varint field `width` is compared as layout.
+        msgs = [FgCameraCalibration(width=i) for i in range(2)]
+        decoder = PbFixedFieldDecoder(
+            FgCameraCalibration.DESCRIPTOR, fields=["K"]
+        )
+        assert decoder.decode(_serialize(msgs)) is None
+
+    def test_invalid_field(self):
+        with pytest.raises(ValueError):
+            PbFixedFieldDecoder(
+                PbJointState.DESCRIPTOR, fields=["name"], timestamp_field=None
+            )
+        with pytest.raises(ValueError):
+            PbFixedFieldDecoder(
+                PbJointState.DESCRIPTOR,
+                fields=["position"],
+                timestamp_field="frame_id",
+            )
+
+
+class TestConvertSerialized:
+    @pytest.mark.parametrize("dtype", ["float32", "float64"])
+    def test_multi_joint_states(self, dtype: str):
+        msgs = _multi_joint_states(4)
+        cvt = ToBatchJointsStateConfig(dtype=dtype)()
+        expected = cvt.convert(msgs)
+        ret = cvt.convert_serialized(_serialize(msgs), msgs[0])
+        assert ret is not None
+        assert ret.velocity is None and expected.velocity is None
+        assert torch.equal(ret.position, expected.position)
+        assert torch.equal(ret.effort.isnan(), expected.effort.isnan())
+        assert torch.equal(
+            ret.effort.nan_to_num(), expected.effort.nan_to_num()
+        )
+        assert ret.names == expected.names
+        assert ret.timestamps == expected.timestamps
+
+    def test_joint_state_stamped(self):
+        msgs = [
+            PbJointStateStamped(
+                timestamp=from_nanoseconds(i),
+                state=PbJointState(name="gripper", velocity=0.5 * i),
+            )
+            for i in range(3)
+        ]
+        cvt = ToBatchJointsStateConfig()()
+        expected = cvt.convert(msgs)
+        ret = cvt.convert_serialized(_serialize(msgs), msgs[0])
+        assert ret is not None
+        assert ret.position is None and ret.effort is None
+        assert torch.equal(ret.velocity, expected.velocity)
+        assert ret.names == expected.names == ["gripper"]
+        assert ret.timestamps == expected.timestamps
+
+    def test_frame_transforms(self):
+        msgs = _frame_transforms(4)
+        cvt = ToBatchFrameTransformConfig()()
+        expected = cvt.convert(msgs)
+        ret = cvt.convert_serialized(_serialize(msgs), msgs[0])
+        assert ret is not None
+        assert torch.equal(ret.xyz, expected.xyz)
+        assert torch.equal(ret.quat, expected.quat)
+        assert ret.parent_frame_id == "world"
+        assert ret.child_frame_id == "camera"
+        assert ret.timestamps == expected.timestamps
+        # the decoders are cached, but not pickled.
+        restored = pickle.loads(pickle.dumps(cvt))
+        assert restored.convert_serialized(_serialize(msgs), msgs[0])
+
+    def test_unsupported(self):
+        msgs = _frame_transforms(2)
+        cvt = ToBatchJointsStateConfig()()
+        assert cvt.convert_serialized(_serialize(msgs), msgs[0]) is None
+
+
+class TestBatchDecoder:
+    @pytest.fixture()
+    def reader(self):
+        stream = io.BytesIO()
+        writer = Writer(stream)
+        joint_states = _multi_joint_states(8)
+        transforms = _frame_transforms(8)
+        # a zero component is not serialized, so the layout is different.
+        transforms[5].rotation.y = 0.0
+        for i in range(8):
+            for topic, msg in (
+                ("/joints", joint_states[i]),
+                ("/tf", transforms[i]),
+            ):
+                writer.write_message(
+                    topic, msg, log_time=1000 + i, publish_time=1000 + i
+                )
+        writer.finish()
+        stream.seek(0)
+        return McapReader.make_reader(stream)
+
+    def test_same_as_decoded(self, reader: McapReader):
+        decoders = {
+            name: McapBatchDecoders(
+                {
+                    "joints": McapBatch2BatchJointStateConfig(
+                        source_topic="/joints", decode_serialized=serialized
+                    ),
+                    "tf": McapBatch2BatchFrameTransformConfig(
+                        source_topic="/tf", decode_serialized=serialized
+                    ),
+                }
+            )
+            for name, serialized in (("serialized", True), ("decoded", False))
+        }
+        batches = list(
+            iter_messages_batch(
+                reader,
+                batch_split=SplitBatchByTopics(
+                    SplitBatchByTopicArgs(
+                        monitor_topic="/joints", min_messages_per_topic=4
+                    )
+                ),
+            )
+        )
+        assert len(batches) == 2
+        ctx = McapDecoderContext()
+        for batch in batches:
+            ret = decoders["serialized"](batch, msg_decoder_ctx=ctx)
+            expected = decoders["decoded"](batch, msg_decoder_ctx=ctx)
+            assert list(ret.keys()) == ["joints", "tf"]
+            assert torch.equal(
+                ret["joints"].position, expected["joints"].position
+            )
+            assert ret["joints"].timestamps == expected["joints"].timestamps
+            assert torch.equal(ret["tf"].quat, expected["tf"].quat)
+            assert ret["tf"].timestamps == expected["tf"].timestamps
@@ -13,20 +13,27 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
+import json
 import os
 import random
 import string
 from typing import Generator
 
 import datasets as hg_datasets
+import numpy as np
 import pytest
 import torch
+from sqlalchemy.orm import Session
 
 from robo_orchard_lab.dataset.datatypes import (
     BatchJointsState,
     BatchJointsStateFeature,
 )
+from robo_orchard_lab.dataset.datatypes.hg_features import (
+    decode_arrow_column,
+)
 from robo_orchard_lab.dataset.robot.dataset import (
+    ColumnarBatch,
     ConcatRODataset,
     RODataset,
     ROMultiRowDataset,
@@ -37,19 +44,26 @@ from robo_orchard_lab.dataset.robot.db_orm import (
     Robot,
     Task,
 )
+from robo_orchard_lab.dataset.robot.episode_sampler import (
+    EpisodeBlockShuffleSampler,
+    EpisodeWeightedSampler,
+)
 from robo_orchard_lab.dataset.robot.packaging import (
     DataFrame,
+    DatasetIndexState,
     DatasetPackaging,
     EpisodeData,
     EpisodeMeta,
     EpisodePackaging,
     InstructionData,
+    MetaRegistry,
     RobotData,
     TaskData,
 )
 from robo_orchard_lab.dataset.robot.re_packing import repack_dataset
 from robo_orchard_lab.dataset.robot.row_sampler import (
     DeltaTimestampSamplerConfig,
+    EpisodeBoundaryTable,
 )
 
 
@@ -304,6 +318,220 @@ class TestDatasetPackaging:
             dataset_path=dataset_dir,
         )
 
+    def test_meta_registry(
+        self,
+        example_dataset_path_no_shard: str,
+        example_robots: list[RobotData],
+        example_instructions: list[InstructionData],
+    ):
+        dataset = RODataset(dataset_path=example_dataset_path_no_shard)
+        registry = MetaRegistry()
+        with Session(dataset.db_engine) as session:
+            registry.load(session)
+        index_state = DatasetIndexState(
+            last_robot_idx=0, last_task_idx=1, last_instruction_idx=0
+        )
+        # registered in the database
+        robot = registry.get_or_create(example_robots[0], index_state)
+        assert robot.index == 0
+        instruction = registry.get_or_create(
+            example_instructions[0], index_state
+        )
+        assert instruction.index == 0
+        assert index_state.last_robot_idx == 0
+        # new content gets the next index
+        robot = registry.get_or_create(example_robots[1], index_state)
+        assert robot.index == 1
+        assert index_state.last_robot_idx == 1
+        assert registry.get_or_create(example_robots[1], index_state) is robot
+        instruction = registry.get_or_create(
+            InstructionData(
+                name=example_instructions[0].name,
+                json_content={"instruction": "another content"},
+            ),
+            index_state,
+        )
+        assert instruction.index == 1
+        assert index_state.last_instruction_idx == 1
+        assert len(registry._pending) == 2
+
+    @pytest.mark.parametrize("database_driver", ["duckdb", "sqlite"])
+    def test_episode_packaging_num_proc(
+        self,
+        tmp_local_folder: str,
+        example_robots: list[RobotData],
+        example_tasks: list[TaskData],
+        example_instructions: list[InstructionData],
+        database_driver: str,
+        mocker,
+    ):
+        dataset_dir = os.path.join(
+            tmp_local_folder,
+            "test_episode_packaging_num_proc"
+            + "".join(random.choices(string.ascii_lowercase, k=8)),
+        )
+        frame_nums = [5, 3, 4, 2, 6]
+        episodes = [
+            DummyEpisodePackaging(
+                gen_frame_num=frame_num,
+                robots=example_robots[i % 2 : i % 2 + 1],
+                tasks=example_tasks[0:1] if i < 3 else example_tasks[1:2],
+                instructions=example_instructions[i % 2 : i % 2 + 1],
+            )
+            for i, frame_num in enumerate(frame_nums)
+        ]
+        dataset_packaging = DatasetPackaging(
+            features=episodes[0].features, database_driver=database_driver
+        )
+        # the shards are written once without re-saving the merged dataset.
+        save_to_disk = mocker.patch.object(hg_datasets.Dataset, "save_to_disk")
+        dataset_packaging.packaging(
+            episodes=episodes,
+            dataset_path=dataset_dir,
+            num_proc=3,
+            writer_batch_size=2,
+            max_shard_size=1,
+        )
+        assert save_to_disk.call_count == 0
+        dataset = RODataset(dataset_path=dataset_dir)
+        assert dataset.frame_dataset.features == dataset_packaging.features
+        assert len(dataset.frame_dataset.cache_files) > 3
+        assert len(dataset) == sum(frame_nums)
+        assert dataset.dataset_format_version is not None
+        assert dataset.index_dataset["index"][:] == list(range(len(dataset)))
+
+        # same content in different shards should be de-duplicated.
+        assert len(list(dataset.iterate_meta(Robot))) == 2
+        assert len(list(dataset.iterate_meta(Task))) == 2
+        assert len(list(dataset.iterate_meta(Instruction))) == 2
+
+        episode_metas = list(dataset.iterate_meta(Episode, ordered=True))
+        assert [ep.frame_num for ep in episode_metas] == frame_nums
+        for i, episode in enumerate(episode_metas):
+            assert episode.index == i
+            rows = dataset.index_dataset[
+                episode.dataset_begin_index : episode.dataset_begin_index
+                + episode.frame_num
+            ]
+            assert rows["episode_index"] == [i] * episode.frame_num
+            assert rows["frame_index"] == list(range(episode.frame_num))
+            robot = dataset.get_meta(Robot, episode.robot_index)
+            assert robot.name == example_robots[i % 2].name
+            task = dataset.get_meta(Task, episode.task_index)
+            assert task.name == example_tasks[0 if i < 3 else 1].name
+            instructions = dataset.get_meta(
+                Instruction, rows["instruction_index"]
+            )
+            assert all(
+                inst.name == example_instructions[i % 2].name
+                for inst in instructions
+            )
+
+    def test_append(
+        self,
+        tmp_local_folder: str,
+        example_robots: list[RobotData],
+        example_tasks: list[TaskData],
+        example_instructions: list[InstructionData],
+        mocker,
+    ):
+        dataset_dir = os.path.join(
+            tmp_local_folder,
+            "test_append"
+            + "".join(random.choices(string.ascii_lowercase, k=8)),
+        )
+        frame_nums = [5, 3, 4, 2, 6]
+        episodes = [
+            DummyEpisodePackaging(
+                gen_frame_num=frame_num,
+                robots=example_robots[i % 2 : i % 2 + 1],
+                tasks=example_tasks[0:1] if i < 3 else example_tasks[1:2],
+                instructions=example_instructions[i % 2 : i % 2 + 1],
+            )
+            for i, frame_num in enumerate(frame_nums)
+        ]
+        features = episodes[0].features
+        DatasetPackaging(features=features).packaging(
+            episodes=episodes[:2], dataset_path=dataset_dir
+        )
+        old_dataset = RODataset(dataset_path=dataset_dir)
+        old_rows = old_dataset[0:2]
+
+        DatasetPackaging(features=features).append(
+            episodes=episodes[2:3], dataset_path=dataset_dir
+        )
+        DatasetPackaging(features=features).append(
+            episodes=episodes[3:], dataset_path=dataset_dir, num_proc=2
+        )
+        dataset = RODataset(dataset_path=dataset_dir)
+        assert len(dataset) == sum(frame_nums)
+        assert dataset.index_dataset["index"][:] == list(range(len(dataset)))
+        assert dataset[0:2]["data"] == old_rows["data"]
+
+        assert len(list(dataset.iterate_meta(Robot))) == 2
+        assert len(list(dataset.iterate_meta(Task))) == 2
+        assert len(list(dataset.iterate_meta(Instruction))) == 2
+        episode_metas = list(dataset.iterate_meta(Episode, ordered=True))
+        assert [ep.frame_num for ep in episode_metas] == frame_nums
+        for i, episode in enumerate(episode_metas):
+            rows = dataset.index_dataset[
+                episode.dataset_begin_index : episode.dataset_begin_index
+                + episode.frame_num
+            ]
+            assert rows["episode_index"] == [i] * episode.frame_num
+            robot = dataset.get_meta(Robot, episode.robot_index)
+            assert robot.name == example_robots[i % 2].name
+
+        # features must match the dataset
+        with pytest.raises(ValueError):
+            DatasetPackaging(
+                features=hg_datasets.Features(
+                    {"data": hg_datasets.Value("string")}
+                )
+            ).append(episodes=episodes[:1], dataset_path=dataset_dir)
+
+        # an append interrupted before `state.json` is replaced.
+        os_replace = os.replace
+
+        def replace(src, dst):
+            if src.endswith(".tmp"):
+                raise OSError("interrupted")
+            os_replace(src, dst)
+
+        mocker.patch.object(os, "replace", side_effect=replace)
+        with pytest.raises(OSError, match="interrupted"):
+            DatasetPackaging(features=features).append(
+                episodes=episodes[:1], dataset_path=dataset_dir
+            )
+        assert len(RODataset(dataset_path=dataset_dir)) == sum(frame_nums)
+        # the process is killed before the append is rolled back.
+        mocker.patch.object(
+            DatasetPackaging, "recover_append", return_value=False
+        )
+        with pytest.raises(OSError, match="interrupted"):
+            DatasetPackaging(features=features).append(
+                episodes=episodes[:1], dataset_path=dataset_dir
+            )
+        mocker.stopall()
+        with pytest.raises(ValueError, match="interrupted"):
+            RODataset(dataset_path=dataset_dir)
+        assert DatasetPackaging.recover_append(dataset_dir)
+        dataset = RODataset(dataset_path=dataset_dir)
+        assert len(dataset) == sum(frame_nums)
+        assert len(list(dataset.iterate_meta(Episode))) == len(frame_nums)
+        with open(os.path.join(dataset_dir, "state.json")) as f:
+            data_files = [d["filename"] for d in json.load(f)["_data_files"]]
+        for filename in os.listdir(dataset_dir):
+            assert not filename.endswith((".bak", ".tmp"))
+            if filename.startswith("append-"):
+                assert filename in data_files
+        assert not os.path.exists(dataset_dir + "_append")
+        DatasetPackaging(features=features).append(
+            episodes=episodes[:1], dataset_path=dataset_dir
+        )
+        dataset = RODataset(dataset_path=dataset_dir)
+        assert len(dataset) == sum(frame_nums) + frame_nums[0]
+
 
 class TestDataset:
     def test_load_dataset(self, example_dataset_path: str):
@@ -385,6 +613,35 @@ class TestDataset:
             assert isinstance(ret, Episode)
             assert ret.index == idx
 
+    @pytest.mark.parametrize("preload_meta", [True, False])
+    def test_meta_cache(self, example_dataset_path: str, preload_meta: bool):
+        dataset = RODataset(
+            dataset_path=example_dataset_path,
+            meta_index2meta=True,
+            meta_cache_size=2,
+            preload_meta=preload_meta,
+        )
+        episodes = dataset.get_meta(Episode, [0, 1, None, 0])
+        assert [e.index if e else None for e in episodes] == [0, 1, None, 0]
+        assert episodes[0] is episodes[3]
+        # cached object is returned without querying the database
+        assert dataset.get_meta(Episode, 1) is episodes[1]
+        assert dataset.get_meta(Episode, 100) is None
+        rows = dataset.__getitems__([0, 1, 2])
+        assert rows[0]["episode"] is rows[1]["episode"]
+        if preload_meta:
+            assert len(dataset._meta_cache) > 2
+        else:
+            assert len(dataset._meta_cache) <= 2
+
+        import pickle
+
+        unpickled_dataset = pickle.loads(pickle.dumps(dataset))
+        assert len(unpickled_dataset._meta_cache) == 0
+        assert (
+            unpickled_dataset[0]["episode"].index == rows[0]["episode"].index
+        )
+
     @pytest.mark.parametrize("index2meta", [True, False])
     def test_get_item_by_slice(
         self, example_dataset_path: str, index2meta: bool
@@ -458,6 +715,66 @@ class TestDataset:
             assert isinstance(multi_row["episode_index"], list)
             assert isinstance(multi_row["episode_index"][0], int)
 
+    @pytest.mark.parametrize("index2meta", [True, False])
+    def test_getitems_columnar(
+        self, example_dataset_path: str, index2meta: bool, mocker
+    ):
+        dataset = RODataset(
+            dataset_path=example_dataset_path, meta_index2meta=index2meta
+        )
+        idx_list = [4, 0, 2]
+        expected = dataset.__getitems__(idx_list)
+
+        accessed_columns = []
+
+        def batch_transform(batch: ColumnarBatch):
+            assert isinstance(batch, ColumnarBatch)
+            assert len(batch) == len(idx_list)
+            accessed_columns.append(batch["data"])
+            return batch
+
+        dataset.set_batch_transform(batch_transform)
+        assert dataset.batch_transform is not None
+        multi_row = dataset.__getitems__(idx_list)
+        assert accessed_columns[0] == [row["data"] for row in expected]
+        assert len(multi_row) == len(expected)
+        for row, expected_row in zip(multi_row, expected, strict=True):
+            assert list(row.keys()) == list(expected_row.keys())
+            for k in row:
+                assert row[k] == expected_row[k]
+
+        # drop a column without decoding it and collate the batch.
+        def collate_transform(batch: ColumnarBatch):
+            batch.discard("joints")
+            assert "joints" not in batch
+            return {"index": torch.tensor(batch["index"])}
+
+        decode = mocker.patch(
+            "robo_orchard_lab.dataset.robot.dataset.decode_arrow_column",
+            wraps=decode_arrow_column,
+        )
+        dataset.set_batch_transform(collate_transform)
+        collated = dataset.__getitems__(idx_list)
+        assert collated["index"].tolist() == [row["index"] for row in expected]
+        # only the `index` column is decoded.
+        assert decode.call_count == 1
+        assert (
+            decode.call_args.args[0] == dataset.frame_dataset.features["index"]
+        )
+
+        # the row transform is applied after the batch transform.
+        def transform(data: dict):
+            data["data"] = None
+            return data
+
+        dataset.set_batch_transform(lambda batch: batch)
+        dataset.set_transform(transform)
+        multi_row = dataset.__getitems__(idx_list)
+        assert all(row["data"] is None for row in multi_row)
+
+        dataset.set_batch_transform(None)
+        assert dataset.batch_transform is None
+
     @pytest.mark.parametrize("index2meta", [True, False])
     def test_get_item_by_int(
         self, example_dataset_path: str, index2meta: bool
@@ -595,6 +912,102 @@ class TestDataset:
         assert len(new_dataset) == len(dataset)
         assert new_dataset[0]["joints"] == dataset[0]["joints"]
 
+    @pytest.mark.parametrize("columns", [None, ["data"]])
+    def test_repack_arrow(
+        self,
+        example_dataset_path: str,
+        tmp_local_folder: str,
+        columns: list[str] | None,
+    ):
+        dataset = RODataset(dataset_path=example_dataset_path)
+        repack_idx_list = [6, 5, 0, 2, 1]
+        repacked = {}
+        for mode in ["decode", "arrow"]:
+            new_dataset_dir = os.path.join(
+                tmp_local_folder,
+                f"test_repack_{mode}_"
+                + "".join(random.choices(string.ascii_lowercase, k=8)),
+            )
+            repack_dataset(
+                source_dataset=dataset,
+                target_path=new_dataset_dir,
+                frame_indices=repack_idx_list,
+                columns=columns,
+                mode=mode,
+            )
+            repacked[mode] = RODataset(
+                dataset_path=new_dataset_dir, meta_index2meta=True
+            )
+        decode_dataset, arrow_dataset = repacked["decode"], repacked["arrow"]
+        assert (
+            arrow_dataset.frame_dataset.features
+            == decode_dataset.frame_dataset.features
+        )
+        assert len(arrow_dataset) == len(decode_dataset)
+        for i in range(len(arrow_dataset)):
+            arrow_row = arrow_dataset[i]
+            decode_row = decode_dataset[i]
+            assert arrow_row.keys() == decode_row.keys()
+            for k in ["index", "frame_index", "data"]:
+                assert arrow_row[k] == decode_row[k]
+            if columns is None:
+                assert arrow_row["joints"] == decode_row["joints"]
+            assert arrow_row["episode"].index == decode_row["episode"].index
+            for k in ["robot", "task", "instruction"]:
+                if decode_row[k] is None:
+                    assert arrow_row[k] is None
+                else:
+                    assert arrow_row[k].md5 == decode_row[k].md5
+
+        with pytest.raises(ValueError):
+            repack_dataset(
+                source_dataset=dataset,
+                target_path=new_dataset_dir,
+                frame_indices=repack_idx_list,
+                mode="unknown",  # type: ignore
+                force_overwrite=True,
+            )
+
+    def test_episode_boundary_table(self, example_dataset_path: str):
+        dataset = RODataset(dataset_path=example_dataset_path)
+        table = EpisodeBoundaryTable.from_db(dataset.db_engine)
+        for episode in dataset.iterate_meta(meta_type=Episode):
+            assert table.get_range(episode.index) == (
+                episode.dataset_begin_index,
+                episode.dataset_begin_index + episode.frame_num - 1,
+            )
+        assert table.get_range(len(table)) is None
+
+    def test_episode_block_shuffle_sampler(self, example_dataset_path: str):
+        dataset = RODataset(dataset_path=example_dataset_path)
+        sampler = EpisodeBlockShuffleSampler.from_dataset(
+            dataset, block_size=2, buffer_size=2, seed=0
+        )
+        assert len(sampler) == len(dataset)
+        assert sorted(sampler) == list(range(len(dataset)))
+
+        with pytest.raises(ValueError):
+            EpisodeBlockShuffleSampler.from_dataset(
+                dataset.select([1, 0]), block_size=2
+            )
+
+    def test_episode_weighted_sampler(self, example_dataset_path: str):
+        dataset = RODataset(dataset_path=example_dataset_path)
+        sampler = EpisodeWeightedSampler.from_dataset(dataset, seed=0)
+        assert len(sampler) == len(dataset)
+
+        # episode 0 of task_0 has 5 frames, and episode 1 of task_1 has 3.
+        sampler = EpisodeWeightedSampler.from_dataset(
+            dataset, task_weights="balanced", num_samples=4000, seed=0
+        )
+        counts = np.bincount(list(sampler), minlength=len(dataset))
+        assert abs(counts[:5].sum() - 2000) < 200
+
+        sampler = EpisodeWeightedSampler.from_dataset(
+            dataset, task_weights={"task_1": 0.0}, seed=0
+        )
+        assert all(i < 5 for i in sampler)
+
     def test_make_iter(self, example_dataset_path: str):
         dataset = RODataset(dataset_path=example_dataset_path)
         # test make_iter
@@ -15,12 +15,18 @@
 # permissions and limitations under the License.
 
 import os
+import random
 
+import numpy as np
 import pytest
+from datasets import Dataset as HFDataset
 
 from robo_orchard_lab.dataset.robot.dataset import ROMultiRowDataset
 from robo_orchard_lab.dataset.robot.row_sampler import (
+    CachedIndexDataset,
     DeltaTimestampSamplerConfig,
+    EpisodeBoundaryTable,
+    EpisodeTimestampIndex,
     IndexFrameCache,
     time_range_match_frame,
 )
@@ -64,6 +70,101 @@ class TestIndexFrameCache:
                     )
 
 
+def make_index_dataset(
+    episode_frame_nums: list[int], fps: int = 25
+) -> HFDataset:
+    episode_index = []
+    timestamp_min = []
+    timestamp_max = []
+    for episode_idx, frame_num in enumerate(episode_frame_nums):
+        for frame_idx in range(frame_num):
+            ts = frame_idx * 1000000000 // fps + random.randint(0, 1000000)
+            episode_index.append(episode_idx)
+            timestamp_min.append(ts)
+            timestamp_max.append(ts + random.randint(0, 2000000))
+    return HFDataset.from_dict(
+        {
+            "index": list(range(len(episode_index))),
+            "episode_index": episode_index,
+            "timestamp_min": timestamp_min,
+            "timestamp_max": timestamp_max,
+        }
+    )
+
+
+class TestEpisodeTimestampIndex:
+    def test_episode_range(self):
+        dataset = make_index_dataset([3, 1, 4])
+        index = EpisodeTimestampIndex.from_index_dataset(dataset)
+        assert len(index) == 8
+        _, begin, end = index.episode_range(np.arange(8))
+        assert begin.tolist() == [0, 0, 0, 3, 4, 4, 4, 4]
+        assert end.tolist() == [3, 3, 3, 4, 8, 8, 8, 8]
+
+    @pytest.mark.parametrize(
+        "column_delta_ts",
+        [
+            {"joints": [-0.08, -0.04, 0, 0.04, 0.08]},
+            {"joints": [-1.0, 0.5], "actions": [0.02, 0.04, 0.06]},
+        ],
+    )
+    def test_consistent_with_frame_cache(
+        self, column_delta_ts: dict[str, list[float]]
+    ):
+        dataset = make_index_dataset([10, 1, 30, 7])
+        sampler = DeltaTimestampSamplerConfig(
+            column_delta_ts=column_delta_ts, tolerance=0.01
+        )()
+        cached_dataset = CachedIndexDataset(
+            dataset,
+            timestamp_index=EpisodeTimestampIndex.from_index_dataset(dataset),
+        )
+        for i in range(len(dataset)):
+            assert sampler.sample_row_idx(
+                cached_dataset, i
+            ) == sampler.sample_row_idx(dataset, i)
+
+    @pytest.mark.parametrize("with_timestamp_index", [True, False])
+    def test_sample_row_idx_batch(self, with_timestamp_index: bool):
+        dataset = make_index_dataset([10, 1, 30, 7])
+        sampler = DeltaTimestampSamplerConfig(
+            column_delta_ts={"joints": [-0.04, 0, 0.04], "actions": [0.08]},
+            tolerance=0.01,
+        )()
+        cached_dataset = CachedIndexDataset(
+            dataset,
+            timestamp_index=EpisodeTimestampIndex.from_index_dataset(dataset)
+            if with_timestamp_index
+            else None,
+        )
+        indices = random.choices(range(len(dataset)), k=32)
+        batch = sampler.sample_row_idx_batch(cached_dataset, indices)
+        for k, index in enumerate(indices):
+            for column, rows in sampler.sample_row_idx(dataset, index).items():
+                assert batch[column][k] == rows
+
+    def test_load_or_build(self, tmp_local_folder: str):
+        path = os.path.join(tmp_local_folder, "test_episode_timestamp_index")
+        make_index_dataset([5, 6]).save_to_disk(path)
+        dataset = HFDataset.load_from_disk(path)
+        cache_path = EpisodeTimestampIndex.get_cache_path(dataset)
+        assert cache_path is not None
+        assert not os.path.exists(cache_path)
+        built = EpisodeTimestampIndex.load_or_build(dataset)
+        assert os.path.exists(cache_path)
+        loaded = EpisodeTimestampIndex.load_or_build(dataset)
+        assert isinstance(loaded.timestamp_min, np.memmap)
+        np.testing.assert_array_equal(
+            built.timestamp_max, loaded.timestamp_max
+        )
+        np.testing.assert_array_equal(built.block_begin, loaded.block_begin)
+        # dataset with indices mapping is never persisted
+        assert (
+            EpisodeTimestampIndex.get_cache_path(dataset.select([1, 0]))
+            is None
+        )
+
+
 class TestDeltaTimestampSampler:
     @pytest.mark.parametrize(
         "cfg, is_none_expected",
@@ -139,6 +240,31 @@ class TestDeltaTimestampSampler:
 
 
 class TestEpisodeSampler:
+    @pytest.mark.parametrize(
+        "rows, expected",
+        [
+            # contiguous slice: frames 5..14, the boundary table is used.
+            (range(5, 15), [0, 1, 2, 3, 4]),
+            # stride 2: frames 0, 2, 4 are episode 0, 6, 8 are episode 1.
+            (range(0, 15, 2), [0, 1, 2]),
+            # shuffled rows of episode 0 and 1.
+            ([3, 1, 0, 6, 2, 4, 5], [0, 1, 2]),
+        ],
+    )
+    def test_episode_boundaries_of_selected_rows(
+        self, rows, expected: list[int]
+    ):
+        dataset = make_index_dataset([5, 5, 5]).select(rows)
+        index_dataset = CachedIndexDataset(
+            dataset,
+            episode_boundaries=EpisodeBoundaryTable(
+                begin=np.array([0, 5, 10]), frame_num=np.array([5, 5, 5])
+            ),
+        )
+        sampler = EpisodeSamplerConfig(target_columns=["joints"])()
+        ret = sampler.sample_row_idx(index_dataset, 0)
+        assert ret["joints"] == expected
+
     @pytest.mark.parametrize(
         "cfg, is_true_expected",
         [
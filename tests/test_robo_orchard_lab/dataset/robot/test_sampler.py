@@ -14,8 +14,17 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
+import numpy as np
+import pyarrow as pa
+import pytest
 import torch
+from datasets.arrow_dataset import InMemoryTable
 
+from robo_orchard_lab.dataset.robot.episode_sampler import (
+    EpisodeBlockShuffleSampler,
+    EpisodeWeightedSampler,
+)
+from robo_orchard_lab.dataset.robot.row_sampler import EpisodeBoundaryTable
 from robo_orchard_lab.dataset.sampler import (
     IndiceTableSampler,
     ShardedIndiceSampler,
@@ -175,3 +184,198 @@ class TestShardedIndiceSampler:
         )
         indices = list(sampler)
         assert indices == [0, 3, 6, 9]
+
+    def test_iter_shuffle_deterministic(self):
+        indices = list(range(100, 200))
+        sampler = ShardedIndiceSampler(
+            indices,
+            num_shards=3,
+            shard_id=1,
+            contiguous=False,
+            shuffle=True,
+            generator=torch.Generator().manual_seed(42),
+        )
+        perm = torch.randperm(
+            len(sampler), generator=torch.Generator().manual_seed(42)
+        ).tolist()
+        expected = indices[1::3]
+        assert list(sampler) == [expected[i] for i in perm]
+
+    def test_iter_table(self):
+        table = InMemoryTable.from_arrays(
+            [
+                pa.chunked_array(
+                    [
+                        pa.array([1, 2, 3], type=pa.uint64()),
+                        pa.array([4, 5], type=pa.uint64()),
+                    ]
+                )
+            ],
+            names=["indices"],
+        )
+        sampler = ShardedIndiceSampler(table, num_shards=2, shard_id=1)
+        assert list(sampler) == [4, 5]
+
+        sampler = ShardedIndiceSampler(
+            table, num_shards=2, shard_id=0, contiguous=False
+        )
+        assert list(sampler) == [1, 3, 5]
+        assert all(isinstance(i, int) for i in sampler)
+
+
+class TestResumableSampler:
+    def test_set_epoch(self):
+        sampler = IndiceTableSampler(list(range(20)), shuffle=True, seed=7)
+        epoch_0 = list(sampler)
+        assert list(sampler) == epoch_0
+        sampler.set_epoch(1)
+        epoch_1 = list(sampler)
+        assert epoch_1 != epoch_0
+        assert sorted(epoch_1) == list(range(20))
+
+        other = IndiceTableSampler(list(range(20)), shuffle=True, seed=7)
+        other.set_epoch(1)
+        assert list(other) == epoch_1
+
+    def test_state_dict(self):
+        sampler = ShardedIndiceSampler(
+            list(range(30)), num_shards=2, shard_id=1, shuffle=True, seed=3
+        )
+        sampler.set_epoch(2)
+        expected = list(sampler)
+
+        it = iter(sampler)
+        consumed = [next(it) for _ in range(4)]
+        state = sampler.state_dict()
+        assert state == {"epoch": 2, "seed": 3, "num_consumed": 4}
+
+        resumed = ShardedIndiceSampler(
+            list(range(30)), num_shards=2, shard_id=1, shuffle=True
+        )
+        resumed.load_state_dict(state)
+        assert resumed.state_dict() == state
+        # the same epoch keeps the cursor.
+        resumed.set_epoch(2)
+        assert consumed + list(resumed) == expected
+        # the next iteration starts from the beginning.
+        assert list(resumed) == expected
+        resumed.set_epoch(3)
+        assert resumed.state_dict()["num_consumed"] == 0
+
+
+class TestEpisodeBlockShuffleSampler:
+    @pytest.fixture
+    def boundaries(self) -> EpisodeBoundaryTable:
+        # episode 2 is missing.
+        return EpisodeBoundaryTable(
+            begin=np.array([0, 5, -1, 8]), frame_num=np.array([5, 3, 0, 10])
+        )
+
+    def test_no_shuffle(self, boundaries: EpisodeBoundaryTable):
+        sampler = EpisodeBlockShuffleSampler(
+            boundaries, block_size=4, shuffle=False
+        )
+        assert len(sampler) == 18
+        assert list(sampler) == list(range(18))
+        assert sampler.block_begin.tolist() == [0, 4, 5, 8, 12, 16]
+        assert sampler.block_len.tolist() == [4, 1, 3, 4, 4, 2]
+
+    def test_block_shuffle(self, boundaries: EpisodeBoundaryTable):
+        sampler = EpisodeBlockShuffleSampler(boundaries, block_size=4, seed=0)
+        indices = list(sampler)
+        assert sorted(indices) == list(range(18))
+        # each block is iterated in order without a shuffle buffer.
+        pos = 0
+        while pos < len(indices):
+            block = sampler.block_begin.tolist().index(indices[pos])
+            block_len = int(sampler.block_len[block])
+            assert indices[pos : pos + block_len] == list(
+                range(indices[pos], indices[pos] + block_len)
+            )
+            pos += block_len
+
+    def test_buffer_shuffle(self, boundaries: EpisodeBoundaryTable):
+        block_order = list(
+            EpisodeBlockShuffleSampler(boundaries, block_size=4, seed=0)
+        )
+        sampler = EpisodeBlockShuffleSampler(
+            boundaries, block_size=4, buffer_size=5, seed=0
+        )
+        indices = list(sampler)
+        assert indices != block_order
+        for begin in range(0, 18, 5):
+            assert sorted(indices[begin : begin + 5]) == sorted(
+                block_order[begin : begin + 5]
+            )
+
+    def test_resume(self, boundaries: EpisodeBoundaryTable):
+        sampler = EpisodeBlockShuffleSampler(
+            boundaries, block_size=3, buffer_size=4, seed=1
+        )
+        sampler.set_epoch(3)
+        expected = list(sampler)
+        it = iter(sampler)
+        consumed = [next(it) for _ in range(7)]
+
+        resumed = EpisodeBlockShuffleSampler(
+            boundaries, block_size=3, buffer_size=4
+        )
+        resumed.load_state_dict(sampler.state_dict())
+        assert consumed + list(resumed) == expected
+
+
+class TestEpisodeWeightedSampler:
+    def test_distribution(self):
+        sampler = EpisodeWeightedSampler(
+            episode_begin=np.array([0, 5, 8]),
+            episode_frame_num=np.array([5, 3, 10]),
+            episode_weights=np.array([1.0, 0.0, 3.0]),
+            num_samples=40000,
+            seed=0,
+        )
+        indices = list(sampler)
+        assert len(indices) == 40000
+        counts = np.bincount(indices, minlength=18)
+        # episode 1 has zero weight.
+        assert counts[5:8].sum() == 0
+        # frames of an episode share the weight of the episode.
+        np.testing.assert_allclose(counts[0:5], 2000, rtol=0.1)
+        np.testing.assert_allclose(counts[8:18], 3000, rtol=0.1)
+
+    def test_shard(self):
+        kwargs = dict(
+            episode_begin=np.array([0, 10]),
+            episode_frame_num=np.array([10, 10]),
+            episode_weights=np.array([1.0, 1.0]),
+            num_samples=10,
+            num_shards=3,
+            seed=0,
+        )
+        samplers = [
+            EpisodeWeightedSampler(shard_id=i, **kwargs) for i in range(3)
+        ]
+        assert [len(sampler) for sampler in samplers] == [4, 3, 3]
+        assert list(samplers[0]) != list(samplers[1])[:3]
+        with pytest.raises(ValueError):
+            EpisodeWeightedSampler(shard_id=3, **kwargs)
+
+    def test_resume(self):
+        sampler = EpisodeWeightedSampler(
+            episode_begin=np.array([0, 10]),
+            episode_frame_num=np.array([10, 20]),
+            episode_weights=np.array([2.0, 1.0]),
+            seed=5,
+        )
+        sampler.set_epoch(1)
+        expected = list(sampler)
+        assert list(sampler) == expected
+        it = iter(sampler)
+        consumed = [next(it) for _ in range(11)]
+
+        resumed = EpisodeWeightedSampler(
+            episode_begin=np.array([0, 10]),
+            episode_frame_num=np.array([10, 20]),
+            episode_weights=np.array([2.0, 1.0]),
+        )
+        resumed.load_state_dict(sampler.state_dict())
+        assert consumed + list(resumed) == expected
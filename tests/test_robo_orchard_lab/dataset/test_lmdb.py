@@ -0,0 +1,324 @@
+# Project RoboOrchard
+#
+# Copyright (c) 2024-2025 Horizon Robotics. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+import gc
+import os
+import pickle
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from robo_orchard_lab.dataset.lmdb.base_lmdb_dataset import (
+    BaseLmdbManipulationDataPacker,
+)
+from robo_orchard_lab.dataset.lmdb.codec import (
+    decode_value,
+    encode_value,
+    is_typed_value,
+)
+from robo_orchard_lab.dataset.lmdb.lmdb_wrapper import Lmdb, ReadWatchdog
+from robo_orchard_lab.dataset.robot.dataset import RODataset
+from robo_orchard_lab.dataset.robot.db_orm import Episode, Instruction, Task
+from robo_orchard_lab.dataset.robotwin.lmdb_to_rodataset import (
+    convert_robotwin_lmdb_to_rodataset,
+)
+from robo_orchard_lab.dataset.robotwin.robotwin_lmdb_dataset import (
+    RoboTwinLmdbDataset,
+)
+
+
+@pytest.fixture(params=["pickle", "typed"])
+def lmdb_path(tmp_path, request) -> str:
+    path = os.path.join(str(tmp_path), "meta")
+    lmdb = Lmdb(
+        path, writable=True, commit_step=10, value_format=request.param
+    )
+    for i in range(16):
+        lmdb.write(f"key_{i}", {"value": i, "array": np.arange(i)})
+    lmdb.close()
+    return path
+
+
+class TestLmdb:
+    def test_read(self, lmdb_path: str):
+        lmdb = Lmdb(lmdb_path, writable=False)
+        assert len(lmdb) == 16
+        data = lmdb.read("key_3")
+        assert data["value"] == 3
+        assert np.array_equal(data["array"], np.arange(3))
+        assert lmdb["key_15"]["value"] == 15
+        assert lmdb.get("not_exist") is None
+
+    @pytest.mark.parametrize("use_getmulti", [True, False])
+    def test_get_multi(self, lmdb_path: str, use_getmulti: bool):
+        lmdb = Lmdb(lmdb_path, writable=False)
+        keys = ["key_5", "not_exist", "key_1", b"key_5"]
+        data = lmdb.get_multi(keys, use_getmulti=use_getmulti)
+        assert len(data) == 4
+        assert data[0]["value"] == 5
+        assert data[1] is None
+        assert data[2]["value"] == 1
+        assert data[3]["value"] == 5
+
+    def test_zero_copy(self, lmdb_path: str):
+        lmdb = Lmdb(lmdb_path, writable=False, zero_copy=True)
+        assert sorted(lmdb.keys()) == sorted(f"key_{i}" for i in range(16))
+        data = lmdb.get_multi(["key_7"])[0]
+        assert np.array_equal(data["array"], np.arange(7))
+        data = lmdb.get("key_7")
+        assert np.array_equal(data["array"], np.arange(7))
+
+
+class TestCodec:
+    def test_round_trip(self):
+        value = {
+            "array": np.arange(12, dtype=np.float32).reshape(3, 4),
+            "strided": np.arange(10)[::3],
+            "empty": np.zeros((0, 3)),
+            "big_endian": np.arange(3, dtype=">i4"),
+            "scalar": np.float64(1.5),
+            "list": [1, "a", None, True, 2.5, b"bytes"],
+            "tuple": (1, (2, 3)),
+            "nested": {"image": np.ones((2, 2, 3), dtype=np.uint8)},
+            "int_keys": {1: "one"},
+            "big_int": 2**80,
+            "object": np.array([1, "a"], dtype=object),
+        }
+        buffer = encode_value(value)
+        assert is_typed_value(buffer)
+        assert not is_typed_value(b"\x80\x04K\x01.")
+        for copy in [True, False]:
+            decoded = decode_value(buffer, copy=copy)
+            assert decoded.keys() == value.keys()
+            for k in ["array", "strided", "empty", "big_endian", "object"]:
+                assert decoded[k].dtype == value[k].dtype
+                assert np.array_equal(decoded[k], value[k])
+            assert decoded["array"].flags.writeable == copy
+            assert isinstance(decoded["scalar"], np.float64)
+            assert decoded["scalar"] == 1.5
+            assert decoded["list"] == value["list"]
+            assert decoded["tuple"] == value["tuple"]
+            assert np.array_equal(
+                decoded["nested"]["image"], value["nested"]["image"]
+            )
+            assert decoded["int_keys"] == {1: "one"}
+            assert decoded["big_int"] == 2**80
+
+
+CAM_NAMES = ["head_camera", "left_camera"]
+
+
+@pytest.fixture(params=["pickle", "typed"])
+def robotwin_lmdb_path(tmp_path, request) -> str:
+    """Pack a tiny RoboTwin LMDB dataset with 2 episodes."""
+    path = os.path.join(str(tmp_path), "robotwin")
+    packer = BaseLmdbManipulationDataPacker(
+        input_path=None, output_path=path, value_format=request.param
+    )
+    packer._init_lmdbs()
+    for ep_id, num_steps in enumerate([3, 4]):
+        uuid = f"task_{ep_id}"
+        for cam_id, cam in enumerate(CAM_NAMES):
+            for i in range(num_steps):
+                image = np.full((4, 6, 3), ep_id * 10 + i, dtype=np.uint8)
+                depth = np.full((4, 6), cam_id * 1000 + i, dtype=np.uint16)
+                packer.image_pack_file.write(
+                    f"{uuid}/{cam}/{i}", cv2.imencode(".png", image)[1]
+                )
+                packer.depth_pack_file.write(
+                    f"{uuid}/{cam}/{i}", cv2.imencode(".png", depth)[1]
+                )
+        packer.meta_pack_file.write(
+            f"{uuid}/extrinsic",
+            {
+                CAM_NAMES[0]: np.tile(np.eye(4), (num_steps, 1, 1)),
+                CAM_NAMES[1]: np.eye(4)[:3],
+            },
+        )
+        packer.meta_pack_file.write(
+            f"{uuid}/intrinsic", {cam: np.eye(3) for cam in CAM_NAMES}
+        )
+        packer.meta_pack_file.write(
+            f"{uuid}/observation/robot_state/joint_positions",
+            np.arange(num_steps * 14).reshape(num_steps, 14),
+        )
+        packer.meta_pack_file.write(
+            f"{uuid}/observation/robot_state/cartesian_position",
+            np.zeros((num_steps, 2, 7)),
+        )
+        packer.meta_pack_file.write(f"{uuid}/camera_names", CAM_NAMES)
+        index_data = dict(
+            uuid=uuid, task_name="bottle_adjust", num_steps=num_steps
+        )
+        packer.meta_pack_file.write(f"{uuid}/meta_data", index_data)
+        packer.write_index(ep_id, index_data)
+    packer.index_pack_file.write("__len__", 2, commit=True)
+    packer.close()
+    return path
+
+
+class TestRoboTwinLmdbDataset:
+    def test_getitem(self, robotwin_lmdb_path: str):
+        dataset = RoboTwinLmdbDataset(paths=robotwin_lmdb_path)
+        assert len(dataset) == 7
+        data = dataset[4]
+        assert data["uuid"] == "task_1"
+        assert data["step_index"] == 1
+        assert data["imgs"].shape == (2, 4, 6, 3)
+        assert np.all(data["imgs"] == 11)
+        assert np.allclose(data["depths"][1], 1.001)
+        assert data["T_world2cam"].shape == (2, 4, 4)
+        assert data["intrinsic"].shape == (2, 4, 4)
+        assert data["joint_state"].shape == (4, 14)
+        assert data["ee_state"].shape == (4, 14)
+        assert (
+            data["text"]
+            == RoboTwinLmdbDataset.DEFAULT_INSTRUCTIONS["bottle_adjust"]
+        )
+
+    def test_getitem_without_frames(self, robotwin_lmdb_path: str):
+        dataset = RoboTwinLmdbDataset(
+            paths=robotwin_lmdb_path,
+            load_image=False,
+            load_depth=False,
+            cam_names=CAM_NAMES[:1],
+            read_timeout=60,
+            zero_copy=True,
+        )
+        data = dataset[0]
+        assert "imgs" not in data
+        assert "depths" not in data
+        assert data["T_world2cam"].shape == (1, 4, 4)
+
+    def test_episode_cache(self, robotwin_lmdb_path: str):
+        dataset = RoboTwinLmdbDataset(
+            paths=robotwin_lmdb_path, episode_cache_size=1, zero_copy=True
+        )
+        data0 = dataset[0]
+        data1 = dataset[1]
+        assert len(dataset._episode_cache) == 1
+        assert not np.shares_memory(data0["joint_state"], data1["joint_state"])
+        data0["joint_state"][:] = -1
+        assert np.all(dataset[0]["joint_state"] >= 0)
+
+        assert dataset[5]["uuid"] == "task_1"
+        assert list(dataset._episode_cache.keys()) == [(0, "1")]
+
+        dataset = pickle.loads(pickle.dumps(dataset))
+        assert len(dataset._episode_cache) == 0
+        assert np.array_equal(dataset[1]["joint_state"], data1["joint_state"])
+
+    def test_index_cache(self, robotwin_lmdb_path: str, tmp_path, mocker):
+        cache_dir = os.path.join(str(tmp_path), "index_cache")
+        dataset = RoboTwinLmdbDataset(
+            paths=robotwin_lmdb_path, index_cache_dir=cache_dir
+        )
+        expected = [dataset[i]["step_index"] for i in range(len(dataset))]
+        assert len(os.listdir(cache_dir)) == 1
+        del dataset
+        gc.collect()
+
+        mocker.patch.object(
+            RoboTwinLmdbDataset,
+            "_compile_index",
+            side_effect=AssertionError("index cache is not used"),
+        )
+        dataset = RoboTwinLmdbDataset(
+            paths=robotwin_lmdb_path, index_cache_dir=cache_dir
+        )
+        assert dataset.episode_indices == ["0", "1"]
+        assert [dataset[i]["step_index"] for i in range(len(dataset))] == (
+            expected
+        )
+        del dataset
+        gc.collect()
+
+        dataset = RoboTwinLmdbDataset(
+            paths=robotwin_lmdb_path,
+            index_cache_dir=cache_dir,
+            task_names=["other_task"],
+        )
+        assert len(dataset) == 0
+        del dataset
+        gc.collect()
+
+        dataset = RoboTwinLmdbDataset(
+            paths=robotwin_lmdb_path, index_cache_dir=cache_dir, num_episode=1
+        )
+        assert len(dataset) == 3
+
+    @pytest.mark.parametrize("num_proc", [None, 2])
+    def test_convert_to_rodataset(
+        self, robotwin_lmdb_path: str, tmp_path, num_proc
+    ):
+        dataset = RoboTwinLmdbDataset(paths=robotwin_lmdb_path)
+        dataset_path = os.path.join(str(tmp_path), "rodataset")
+        convert_robotwin_lmdb_to_rodataset(
+            dataset, dataset_path, num_proc=num_proc
+        )
+        image_lmdb = dataset.img_lmdbs[0]
+        expected_image = bytes(image_lmdb["task_1/left_camera/2"])
+        del dataset, image_lmdb
+        gc.collect()
+
+        ro_dataset = RODataset(dataset_path=dataset_path)
+        assert len(ro_dataset) == 7
+        episodes = list(ro_dataset.iterate_meta(Episode, ordered=True))
+        assert [ep.frame_num for ep in episodes] == [3, 4]
+        task = ro_dataset.get_meta(Task, episodes[0].task_index)
+        assert task.name == "bottle_adjust"
+
+        frame = ro_dataset.frame_dataset[5]
+        assert frame["frame_index"] == 2
+        # encoded images are carried over without re-encoding.
+        assert frame["left_camera"].sensor_data[0] == expected_image
+        assert frame["left_camera"].format == "png"
+        assert frame["left_camera"].intrinsic_matrices.shape == (1, 3, 3)
+        assert frame["left_camera"].pose.child_frame_id == "left_camera"
+        depth = cv2.imdecode(
+            np.frombuffer(frame["head_camera_depth"].sensor_data[0], np.uint8),
+            cv2.IMREAD_UNCHANGED,
+        )
+        assert np.all(depth == 2)
+        assert frame["joints"].position.shape == (1, 14)
+        assert frame["joints"].position[0, 0] == 28
+        assert len(frame["ee_state"]) == 14
+        instruction = ro_dataset.get_meta(
+            Instruction, frame["instruction_index"]
+        )
+        assert (
+            instruction.json_content["description"]
+            == (RoboTwinLmdbDataset.DEFAULT_INSTRUCTIONS["bottle_adjust"])
+        )
+
+
+class TestReadWatchdog:
+    def test_no_timeout(self):
+        watchdog = ReadWatchdog(seconds=10)
+        with watchdog.watch("reading"):
+            pass
+
+    def test_timeout(self):
+        watchdog = ReadWatchdog(seconds=0.05)
+        with pytest.raises(TimeoutError):
+            with watchdog.watch("reading"):
+                time.sleep(1)
+        # the timer is disarmed after leaving the context.
+        with watchdog.watch("reading"):
+            pass
+        time.sleep(0.1)
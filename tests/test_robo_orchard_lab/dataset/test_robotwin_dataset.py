@@ -14,12 +14,94 @@
 # implied. See the License for the specific language governing
 # permissions and limitations under the License.
 
+import json
 import os
 import subprocess
 import tempfile
 
+import cv2
+import h5py
+import numpy as np
 import pytest
 
+from robo_orchard_lab.dataset.lmdb.lmdb_wrapper import Lmdb
+from robo_orchard_lab.dataset.robotwin.robotwin_packer import (
+    RobotwinDataPacker,
+)
+
+
+def _make_robotwin_raw_data(root: str, num_episodes: int = 3):
+    """Make raw RoboTwin hdf5 episodes with random data."""
+    config_dir = os.path.join(root, "place_empty_cup", "demo_clean")
+    os.makedirs(os.path.join(config_dir, "data"))
+    os.makedirs(os.path.join(config_dir, "instructions"))
+    seeds = [str(10 + i) for i in range(num_episodes)]
+    with open(os.path.join(config_dir, "seed.txt"), "w") as f:
+        f.write(" ".join(seeds))
+    rng = np.random.default_rng(0)
+    for ep_id in range(num_episodes):
+        num_steps = 3 + ep_id
+        ep_path = os.path.join(config_dir, "data", f"episode{ep_id}.hdf5")
+        with h5py.File(ep_path, "w") as f:
+            f["endpose"] = rng.random((num_steps, 14))
+            f["joint_action/vector"] = rng.random((num_steps, 14))
+            for cam in ["head_camera", "left_camera"]:
+                rgb = [
+                    cv2.imencode(
+                        ".jpg", rng.integers(0, 255, (8, 8, 3), np.uint8)
+                    )[1].tobytes()
+                    for _ in range(num_steps)
+                ]
+                f[f"observation/{cam}/rgb"] = np.array(rgb)
+                f[f"observation/{cam}/depth"] = (
+                    rng.random((num_steps, 8, 8)) * 1000
+                )
+                f[f"observation/{cam}/intrinsic_cv"] = rng.random(
+                    (num_steps, 3, 3)
+                )
+                f[f"observation/{cam}/extrinsic_cv"] = rng.random(
+                    (num_steps, 3, 4)
+                )
+        if ep_id != 1:
+            instruction_file = os.path.join(
+                config_dir, "instructions", f"episode{ep_id}.json"
+            )
+            with open(instruction_file, "w") as f:
+                json.dump({"seen": ["a"], "unseen": ["b"]}, f)
+
+
+def _read_all(path: str) -> dict:
+    ret = {}
+    for name in ["index", "meta", "image", "depth"]:
+        lmdb = Lmdb(os.path.join(path, name), writable=False)
+        ret[name] = {
+            bytes(k): bytes(v) for k, v in lmdb.txn.cursor().iternext()
+        }
+        lmdb.close()
+    return ret
+
+
+def test_robotwin_data_packer_num_proc(tmp_path):
+    """Test that packing in parallel gives the same databases."""
+    input_path = os.path.join(str(tmp_path), "raw")
+    _make_robotwin_raw_data(input_path)
+    outputs = []
+    for num_proc in [1, 2]:
+        output_path = os.path.join(str(tmp_path), f"lmdb_{num_proc}")
+        RobotwinDataPacker(
+            input_path=input_path,
+            output_path=output_path,
+            num_proc=num_proc,
+        )()
+        outputs.append(_read_all(output_path))
+    assert len(outputs[0]["index"]) == 4
+    assert len(outputs[0]["image"]) == 2 * (3 + 4 + 5)
+    assert (
+        b"place_empty_cup_demo_clean_seed11/instructions"
+        not in (outputs[0]["meta"])
+    )
+    assert outputs[0] == outputs[1]
+
 
 def test_robotwin_lmdb_data_packer(
     PROJECT_ROOT: str, ROBO_ORCHARD_TEST_WORKSPACE: str
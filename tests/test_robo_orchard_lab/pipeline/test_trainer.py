@@ -25,8 +25,13 @@ from torch.optim import SGD
 from torch.optim.lr_scheduler import StepLR
 from torchmetrics import Metric
 
+from robo_orchard_lab.dataset.sampler import IndiceTableSampler
 from robo_orchard_lab.pipeline import SimpleTrainer
 from robo_orchard_lab.pipeline.batch_processor import SimpleBatchProcessor
+from robo_orchard_lab.pipeline.hook_based_trainer import (
+    HookBasedTrainer,
+    ResumeCheckpointConfig,
+)
 from robo_orchard_lab.pipeline.hooks.mixin import (
     HookContext,
     PipelineHookArgs,
@@ -261,5 +266,63 @@ def test_metric_computation(dummy_trainer):
         dummy_trainer.metric.compute()
 
 
+def test_resume_sampler_state(tmp_path):
+    """Test resuming in the middle of an epoch with a resumable sampler."""
+    data = [torch.tensor([float(i), 0.0]) for i in range(10)]
+    checkpoint_dir = str(tmp_path / "checkpoint")
+
+    def run(
+        resume_from: ResumeCheckpointConfig | None = None,
+        save_at_step: int | None = None,
+    ) -> list[list[int]]:
+        seen: list[list[int]] = []
+        hooks = PipelineHooks()
+
+        def on_batch_begin(args: PipelineHookArgs):
+            seen.append(args.batch[:, 0].long().tolist())
+
+        def on_step_end(args: PipelineHookArgs):
+            if args.global_step_id == save_at_step:
+                args.accelerator.save_state(checkpoint_dir)
+
+        hooks.register_hook(
+            "on_batch", HookContext.from_callable(before=on_batch_begin)
+        )
+        hooks.register_hook(
+            "on_step", HookContext.from_callable(after=on_step_end)
+        )
+        model = SimpleModel()
+        optimizer = SGD(params=model.parameters(), lr=0.01)
+        dataloader = torch.utils.data.DataLoader(
+            data,  # type: ignore
+            batch_size=2,
+            sampler=IndiceTableSampler(
+                list(range(len(data))), shuffle=True, seed=0
+            ),
+        )
+        trainer = HookBasedTrainer(
+            model=model,
+            dataloader=dataloader,
+            optimizer=optimizer,
+            lr_scheduler=StepLR(optimizer, step_size=1),
+            accelerator=Accelerator(cpu=True),
+            batch_processor=DummyBatchProcessor(),
+            hooks=hooks,
+            max_epoch=2,
+            resume_from=resume_from,
+        )
+        trainer()
+        return seen
+
+    expected = run()
+    assert expected[:5] != expected[5:]
+    assert run(save_at_step=2) == expected
+    resumed = run(
+        resume_from=ResumeCheckpointConfig(resume_from=checkpoint_dir)
+    )
+    # 3 steps are done before the checkpoint is saved.
+    assert resumed == expected[3:]
+
+
 if __name__ == "__main__":
     pytest.main(["-s", __file__])